@@ -1,8 +1,54 @@
+import logging
 from flask import Flask
 from routes import home_route
+from example_tests_objects import generate_nested_terms_agg_object_order
+from transformer import Transformer, QueryExecutor
+from transformer.async_search import AsyncSearchManager
+from transformer.cancellation import SearchTracker
+from transformer.fusion import FusionPlanner
+from transformer.limiter import ConcurrencyLimiter
+from transformer.mappings import FieldMappings
+from transformer.panel_store import PanelScheduler, PanelStore
+from transformer.stored import StoredScriptRegistry
+from validator import RequestValidator
+
+logging.basicConfig(level=logging.DEBUG)
 
 app = Flask(__name__)
 app.register_blueprint(home_route)
 
+# ✅ One limiter for every executor, so all workers' searches count against the same cluster budget
+app.extensions["search_limiter"] = ConcurrencyLimiter()
+# ✅ Searches nobody waits for any more (cancelled, superseded, past the deadline) are cancelled on the cluster
+app.extensions["search_tracker"] = SearchTracker()
+app.config["SEARCH_DEADLINE"] = 30
+app.extensions["search_executor"] = QueryExecutor(
+    limiter=app.extensions["search_limiter"], tracker=app.extensions["search_tracker"]
+)
+# ✅ Mappings route nested fields to nested queries (and inner_hits), and pick per-field-type defaults
+mappings = FieldMappings.load()
+app.extensions["transformer"] = Transformer("my_events", mappings=mappings, fuse_metrics=True)
+# ✅ Client request models are checked against the same mappings and rejected with every error at once
+app.extensions["request_validator"] = RequestValidator(mappings)
+# ✅ Long analyst searches run as async searches polled by the client, not inside a request worker
+app.extensions["async_searches"] = AsyncSearchManager(QueryExecutor(
+    limiter=app.extensions["search_limiter"], tracker=app.extensions["search_tracker"]
+))
+
+PANELS = {"nested_terms": generate_nested_terms_agg_object_order()}
+
+# ✅ Hot dashboard panels are computed in the background and served from the store
+panel_executor = QueryExecutor(limiter=app.extensions["search_limiter"], priority="batch")
+stored_scripts = StoredScriptRegistry(panel_executor.es)
+# ✅ The scheduler stores the panels as search templates when it starts (on the first request), not at import
+panel_transformer = Transformer("my_events", mappings=mappings, registry=stored_scripts, fuse_metrics=True)
+app.extensions["stored_scripts"] = stored_scripts
+app.extensions["panel_scheduler"] = PanelScheduler(
+    panel_transformer, panel_executor, PanelStore(),
+    planner=FusionPlanner(panel_transformer)  # ✅ Panels sharing their filters refresh with one search
+)
+for name, model in PANELS.items():
+    app.extensions["panel_scheduler"].register(name, model, interval=60)
+
 if __name__ == "__main__":
     app.run(debug=True)  # debug=True for development (auto-reloads)
@@ -0,0 +1,48 @@
+"""Cold-start benchmark: import the transformer package and build one query in a fresh interpreter.
+
+Usage: python benchmarks/bench_import_time.py [--runs N] [--target-ms MS]
+Exits non-zero when the median cold start exceeds the target.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+start = time.perf_counter()
+from transformer import Transformer
+Transformer("my_events").transform({"filters": [{"client_id": 1}], "aggs": {"url.domain": ["terms", 10]}})
+elapsed = time.perf_counter() - start
+import sys
+assert "elasticsearch" not in sys.modules, "transform-only import pulled in elasticsearch"
+print(elapsed)
+"""
+
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, check=True, capture_output=True, text=True)
+        samples.append(float(output.stdout) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    median = statistics.median(samples)
+    print(f"cold start: median {median:.2f} ms, min {min(samples):.2f} ms, max {max(samples):.2f} ms "
+          f"over {args.runs} runs (target {args.target_ms:.0f} ms)")
+    return 0 if median <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Memory/throughput benchmark: mutable filter trees vs. interned FrozenNode trees.
+
+Builds many large bool trees with heavily repeated clauses (as dashboards produce), then compares
+retained memory and repeated `to_elasticsearch()` throughput (frozen nodes hand out a copy of their memoized
+output) and `to_json_bytes()` throughput (the memoized bytes themselves).
+
+Usage: python benchmarks/bench_nodes.py [--trees N] [--clauses N]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformer.filter import BoolFilter, RangeFilter, TermFilter, TermsFilter  # noqa: E402
+from transformer.nodes import NodeInterner, freeze  # noqa: E402
+
+
+def build_tree(i, clauses):
+    must = [TermFilter("client_id", i % 10), RangeFilter("@timestamp", gte="now-15m")]
+    should = [
+        BoolFilter(must=[TermFilter("event.provider", f"provider-{j % 20}"), TermsFilter("url.domain", ["a.com", "b.com"])])
+        for j in range(clauses)
+    ]
+    return BoolFilter(must=must, should=should, minimum_should_match=1)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    trees = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return trees, retained, elapsed
+
+
+def emit_throughput(trees, rounds, emit=lambda tree: tree.to_elasticsearch()):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for tree in trees:
+            emit(tree)
+    return rounds * len(trees) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--clauses", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    mutable, mutable_bytes, mutable_build = measure(lambda: [build_tree(i, args.clauses) for i in range(args.trees)])
+
+    # ✅ Each mutable tree is dropped as soon as it is frozen; only interned nodes are retained
+    interner = NodeInterner(maxsize=1_000_000)
+    frozen, frozen_bytes, freeze_time = measure(
+        lambda: [freeze(build_tree(i, args.clauses), interner) for i in range(args.trees)]
+    )
+
+    print(f"{args.trees} trees x {args.clauses} should-clauses")
+    print(f"retained memory: mutable {mutable_bytes / 1e6:.1f} MB, frozen {frozen_bytes / 1e6:.2f} MB "
+          f"({len(interner)} distinct nodes, {interner.hits} interning hits)")
+    print(f"build: mutable {mutable_build * 1000:.0f} ms, build + freeze {freeze_time * 1000:.0f} ms")
+    print(f"to_elasticsearch(): mutable {emit_throughput(mutable, args.rounds):,.0f} trees/s, "
+          f"frozen {emit_throughput(frozen, args.rounds):,.0f} trees/s")
+    print(f"to_json_bytes(): frozen {emit_throughput(frozen, args.rounds, lambda tree: tree.to_json_bytes()):,.0f} trees/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: cost of validating a request model compared to compiling it.
+
+Validates and transforms the dashboard request from `example_tests_objects` (with its unmapped
+aggregation replaced) and a failing variant, and reports microseconds per request for each.
+
+Usage: python benchmarks/bench_validator.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from example_tests_objects import generate_nested_terms_agg_object_order  # noqa: E402
+from transformer.mappings import FieldMappings  # noqa: E402
+from transformer.transform import Transformer  # noqa: E402
+from validator import RequestValidator  # noqa: E402
+
+
+def dashboard_request():
+    data = generate_nested_terms_agg_object_order()
+    formula_aggs = data["aggs"]["client_id"]["aggs"]["formula_matches_id"]["aggs"]
+    formula_aggs["url.domain"] = {"terms": {"field": "url.domain", "size": 10}}
+    del formula_aggs["http.request.method"]  # ✅ Not in mappings.json
+    return data
+
+
+def failing_request():
+    data = dashboard_request()
+    data["filters"] += [{"action_count": "many"}, {"@timestamp": {"after": "now-1d"}}, {"nope": 1}]
+    data["size"] = -1
+    return data
+
+
+def per_call_us(fn, iterations):
+    return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    mappings = FieldMappings.load()
+    validator = RequestValidator(mappings)
+    transformer = Transformer("my_events", mappings=mappings)
+
+    for label, data in (("valid", dashboard_request()), ("invalid", failing_request())):
+        errors = validator.validate(data)
+        validate_us = per_call_us(lambda: validator.validate(data), args.iterations)
+        line = f"{label:>8} request ({len(errors)} errors): validate {validate_us:7.1f} us"
+        if not errors:
+            transform_us = per_call_us(lambda: transformer.transform(data), args.iterations // 10 or 1)
+            line += f" | transform {transform_us:8.1f} us"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Serialization benchmark: dict body + json.dumps vs. direct JSON byte emission.
+
+Compares, for a large dashboard-style request:
+  * dict:            mutable filter objects → to_elasticsearch() dicts → json.dumps (what the client did before)
+  * compile + bytes: compile_request (freeze/intern) → JsonBytesWriter
+  * body + dumps:    CompiledRequest.body() of an already compiled request → json.dumps
+  * bytes only:      JsonBytesWriter over an already compiled request, reusing cached node fragments
+
+Bytes only pay off for requests compiled once and sent many times (e.g. dashboard panels); a request
+compiled for a single send is cheaper as a dict.
+
+Usage: python benchmarks/bench_writer.py [--clauses N] [--iterations N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformer import aggregation, ir  # noqa: E402
+from transformer.filter import BoolFilter  # noqa: E402
+from transformer.writer import JsonBytesWriter  # noqa: E402
+
+
+def build_request(clauses):
+    return {
+        "filters": [
+            {"event.provider": "pfm"},
+            {"@timestamp": {"gte": "2025-01-01T00:00:00.000Z", "lte": "2025-01-02T00:00:00.000Z"}},
+            *[[{"url.domain": f"domain-{i}.com"}, {"formula_metadata.tags.value": ["security", "critical"]}] for i in range(clauses)],
+        ],
+        "aggs": {"client_id": {"size": 50, "aggs": {"url.domain": ["terms", 500]}}},
+    }
+
+
+def dict_path(data):
+    filters = ir.compile_filters(data["filters"])
+    body = {
+        "query": BoolFilter(must=filters).to_elasticsearch(),
+        "size": 0,
+        "aggs": aggregation.build_aggregation_query_class(data["aggs"]),
+    }
+    return json.dumps(body).encode("utf-8")
+
+
+def bytes_path(data):
+    return JsonBytesWriter().emit(ir.compile_request(data))
+
+
+def body_path(request):
+    return json.dumps(request.body()).encode("utf-8")
+
+
+def write_path(request):
+    return JsonBytesWriter().emit(request)
+
+
+def bench(fn, data, iterations):
+    fn(data)  # ✅ Warm caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / iterations * 1000, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clauses", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    data = build_request(args.clauses)
+    assert json.loads(dict_path(data)) == json.loads(bytes_path(data))
+
+    compiled = ir.compile_request(data)
+    runs = (
+        ("dict + json.dumps", dict_path, data),
+        ("compile + bytes", bytes_path, data),
+        ("body + dumps", body_path, compiled),
+        ("bytes only", write_path, compiled),
+    )
+    for name, fn, arg in runs:
+        per_call, peak = bench(fn, arg, args.iterations)
+        print(f"{name:>18}: {per_call:7.2f} ms/request, peak memory per request {peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,190 @@
-from flask import Blueprint
+from flask import Blueprint, Response, current_app, request
 from example_tests_objects import generate_avg_agg_object, generate_bool_filter_object, generate_cardinality_agg_object, generate_composite_agg_object, generate_date_histogram_agg_object, generate_histogram_agg_object, generate_ids_filter_object, generate_match_filter_object, generate_max_agg_object, generate_nested_terms_agg_object, generate_nested_terms_agg_object_order, generate_range_agg_object, generate_range_filter_object, generate_sort_object, generate_sum_agg_object, generate_term_filter_object, generate_terms_agg_object, generate_terms_filter_object, generate_wildcard_filter_object
+from elasticsearch import NotFoundError
 from transformer import transform, QueryExecutor
+from transformer.async_search import DEFAULT_STREAM_DURATION
+from transformer.cancellation import DuplicateSearchError, SearchCancelledError
+from transformer.limiter import OverloadedError
+from transformer.panel_store import StalePanelError
+from transformer.patterns import PatternPolicyError
+from validator import RequestValidationError, RequestValidator
 import json
+import uuid
 
 home_route = Blueprint('home_route', __name__)
 
+
+def search_transformer():
+    """The app's Transformer (built with the field mappings), or one without mappings outside the app."""
+    return current_app.extensions.get("transformer") or transform.Transformer("my_events", fuse_metrics=True)
+
+
+def search_executor():
+    """The app's QueryExecutor (sharing its limiter and tracker), or a new one outside the app."""
+    return current_app.extensions.get("search_executor") or QueryExecutor(
+        limiter=current_app.extensions.get("search_limiter"), tracker=current_app.extensions.get("search_tracker")
+    )
+
+
+def session_search_id(session, search_id):
+    """The tracker id of a session's search: client ids are namespaced so sessions can't reach each other's."""
+    return f"{session}:{search_id}"
+
+
+def request_validator():
+    """The app's RequestValidator (built with the field mappings), or one without mappings outside the app."""
+    return current_app.extensions.get("request_validator") or RequestValidator()
+
+
+@home_route.before_app_request
+def start_panel_scheduler():
+    """Starts the panel scheduler in the serving process on its first request (a no-op once it runs)."""
+    scheduler = current_app.extensions.get("panel_scheduler")
+    if scheduler is not None:
+        scheduler.start()
+
+
 @home_route.route("/", methods=["GET"])
 def home():
-    transformer = transform.Transformer("my_events")
-    query = transformer.transform(
+    compiled = search_transformer().compile(
         generate_nested_terms_agg_object_order()
     )
-    query_executor = QueryExecutor()
-    response = query_executor.execute_query(query)
-    return prettify(response.body)  # Return the results
+    # ✅ The client picks the search id (`X-Opaque-Id`) so it can `DELETE /searches/<id>` while the search runs;
+    # ids are namespaced by `X-Session-Id`, so only that session can cancel it, and its newer search for the
+    # same panel supersedes it
+    session = request.headers.get("X-Session-Id")
+    search_id = request.headers.get("X-Opaque-Id", "").replace("/", "-").replace(":", "-") or uuid.uuid4().hex
+    panel = request.args.get("panel")
+    response = search_executor().execute_query(
+        compiled.body(), timeout=current_app.config.get("SEARCH_DEADLINE"),
+        opaque_id=session_search_id(session, search_id) if session else None,
+        cancel_key=(session, panel) if session and panel else None, owner=session
+    )
+    # ✅ Merged aggregations are put back under the names the request used
+    return prettify(compiled.reshape_response(response).body), 200, {"X-Opaque-Id": search_id}
+
+
+@home_route.route("/panels/<name>", methods=["GET"])
+def panel(name):
+    """Serves a precomputed dashboard panel without touching Elasticsearch."""
+    scheduler = current_app.extensions["panel_scheduler"]
+    try:
+        entry = scheduler.serve(name)
+    except KeyError:
+        return prettify({"error": f"Unknown panel '{name}'"}), 404
+    except StalePanelError as e:
+        retry_after = str(int(scheduler.panels[name]["interval"]))
+        return prettify({"error": str(e)}), 503, {"Retry-After": retry_after}
+
+    headers = {"X-Panel-Version": str(entry.version), "X-Panel-Computed-At": str(entry.computed_at)}
+    return prettify(entry.result), 200, headers
+
+
+@home_route.route("/async-searches", methods=["POST"])
+def submit_async_search():
+    """Submits a long search model (JSON body); returns its results if quick, else a handle to poll."""
+    data = request_validator().check(request.get_json(silent=True))  # ✅ Every error is reported in one 400
+    # ✅ Submitting the CompiledRequest lets the manager reshape every poll of its results
+    compiled = search_transformer().compile(data)
+    handle = current_app.extensions["async_searches"].submit(compiled)
+    return prettify(handle.to_json()), 202 if handle.is_running else 200
+
+
+@home_route.route("/async-searches/<search_id>", methods=["GET"])
+def poll_async_search(search_id):
+    """Current, possibly partial, results of an async search."""
+    return prettify(current_app.extensions["async_searches"].poll(search_id).to_json())
+
+
+@home_route.route("/async-searches/<search_id>/status", methods=["GET"])
+def async_search_status(search_id):
+    """Whether an async search is still running, without its results."""
+    return prettify(current_app.extensions["async_searches"].status(search_id).to_json())
+
+
+@home_route.route("/async-searches/<search_id>/stream", methods=["GET"])
+def stream_async_search(search_id):
+    """
+    Streams partial aggregation results as NDJSON lines until the async search completes, for at most
+    `SEARCH_DEADLINE` seconds so no worker is held for the whole search; a last line that is still
+    running tells the client to poll or stream again.
+    """
+    handles = current_app.extensions["async_searches"].stream(
+        search_id, max_duration=current_app.config.get("SEARCH_DEADLINE", DEFAULT_STREAM_DURATION))
+
+    def lines():
+        for handle in handles:
+            partial = {"is_running": handle.is_running, "is_partial": handle.is_partial,
+                       "aggregations": (handle.response or {}).get("aggregations")}
+            yield json.dumps(partial) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson")
+
+
+@home_route.route("/async-searches/<search_id>", methods=["DELETE"])
+def delete_async_search(search_id):
+    """Cancels an async search and deletes its results."""
+    current_app.extensions["async_searches"].delete(search_id)
+    return prettify({"deleted": search_id})
+
+
+@home_route.errorhandler(NotFoundError)
+def async_search_not_found(e):
+    """The async search expired, was deleted or never existed."""
+    return prettify({"error": "Async search not found or expired"}), 404
+
+
+@home_route.errorhandler(RequestValidationError)
+def invalid_request(e):
+    """The request model is invalid; every error found is listed with its path."""
+    return prettify({"errors": [error.to_json() for error in e.errors]}), 400
+
+
+@home_route.errorhandler(PatternPolicyError)
+def pattern_rejected(e):
+    """A leading wildcard on a field without a `wildcard` twin would scan every term of the field."""
+    return prettify({"errors": [{"path": "filters", "message": str(e)}]}), 400
+
+
+@home_route.errorhandler(OverloadedError)
+def overloaded(e):
+    """Sheds load: the cluster is saturated, so the client should come back later instead of waiting."""
+    return prettify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
+
+@home_route.errorhandler(DuplicateSearchError)
+def duplicate_search(e):
+    """The session already has a search in flight under this id."""
+    return prettify({"error": str(e)}), 409
+
+
+@home_route.errorhandler(SearchCancelledError)
+def cancelled(e):
+    """The search was cancelled on purpose; nobody is waiting for this response."""
+    return prettify({"error": str(e)}), 409
+
+
+@home_route.route("/searches/<opaque_id>", methods=["DELETE"])
+def cancel_search(opaque_id):
+    """
+    Cancels a search in flight, e.g. when the user navigates away, freeing its work on the cluster. The id is
+    the `X-Opaque-Id` the search was sent with; only the session (`X-Session-Id`) that started the search may
+    cancel it, other sessions get a 404.
+    """
+    tracker = current_app.extensions.get("search_tracker")
+    session = request.headers.get("X-Session-Id")
+    if tracker is None or not session or not tracker.cancel_owned(session_search_id(session, opaque_id), session):
+        return prettify({"error": f"No search '{opaque_id}' in flight"}), 404
+    return prettify({"cancelled": opaque_id}), 202
+
+
+@home_route.route("/limiter", methods=["GET"])
+def limiter_stats():
+    """Current concurrency limit, queue depth and rejection counts of the search limiter."""
+    limiter = current_app.extensions.get("search_limiter")
+    if limiter is None:
+        return prettify({"error": "No search limiter configured"}), 404
+    return prettify(limiter.stats())
 
 
 def prettify(query):
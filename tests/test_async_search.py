@@ -0,0 +1,208 @@
+import inspect
+import json
+import unittest
+
+from elasticsearch import Elasticsearch
+from flask import Flask
+from routes import home_route
+from transformer.aggregation import AvgAggregation, MaxAggregation
+from transformer.async_search import AsyncSearchManager, async_filter_path
+from transformer.limiter import ConcurrencyLimiter, OverloadedError
+from transformer.mappings import FieldMappings
+from transformer.query_executor import QueryExecutor
+from transformer.stored import TemplateRequest
+from transformer.transform import Transformer
+
+
+class FakeAsyncSearch:
+    """
+    An async search that completes after `polls` polls, with one more shard reduced into `count` each time.
+    Every call is checked against the real client's signature, so unsupported arguments fail here too.
+    """
+
+    def __init__(self, polls=2):
+        self.polls = polls
+        self.calls = []
+        self.deleted = []
+        self.real = Elasticsearch("http://localhost:9200").async_search
+
+    def _check(self, method, kwargs):
+        inspect.signature(getattr(self.real, method)).bind(**kwargs)
+
+    def _body(self, count, running):
+        return {"id": "search-1", "is_running": running, "is_partial": running, "expiration_time_in_millis": 10000000,
+                "response": {"aggregations": {"count": {"value": count}}}}
+
+    def submit(self, **kwargs):
+        self._check("submit", kwargs)
+        self.calls.append(("submit", kwargs))
+        return self._body(0, True)
+
+    def get(self, **kwargs):
+        self._check("get", kwargs)
+        self.calls.append(("get", kwargs))
+        self.polls -= 1
+        return self._body(2 - self.polls, self.polls > 0)
+
+    def status(self, **kwargs):
+        self._check("status", kwargs)
+        return {"id": kwargs["id"], "is_running": self.polls > 0, "is_partial": self.polls > 0}
+
+    def delete(self, **kwargs):
+        self._check("delete", kwargs)
+        self.deleted.append(kwargs["id"])
+        return {"acknowledged": True}
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.async_search = FakeAsyncSearch()
+
+
+class TestAsyncSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.client = FakeElasticsearch()
+        self.manager = AsyncSearchManager(QueryExecutor(index_name="events", client=self.client),
+                                          abandon_after=60, clock=lambda: self.now)
+        self.query = {"size": 0, "aggs": {"count": {"value_count": {"field": "id"}}}}
+
+    def test_submit_returns_a_handle(self):
+        handle = self.manager.submit(self.query)
+        self.assertEqual((handle.id, handle.is_running), ("search-1", True))
+        _, params = self.client.async_search.calls[0]
+        self.assertEqual(params["index"], "events")
+        self.assertEqual((params["wait_for_completion_timeout"], params["keep_on_completion"]), ("1s", False))
+        self.assertNotIn("keep_alive", params)
+        self.assertTrue(params["request_cache"])
+        self.assertEqual(params["filter_path"], async_filter_path(
+            ["timed_out", "_shards.failed", "_shards.failures", "hits.total", "aggregations"]))
+        self.assertIn("response.aggregations", params["filter_path"])
+        self.assertEqual(self.manager.tracked(), ["search-1"])
+
+    def test_polls_use_the_submitted_filter_path(self):
+        self.manager.submit(self.query)
+        handle = self.manager.poll("search-1")
+        self.assertEqual(handle.response["aggregations"]["count"]["value"], 1)
+        self.assertEqual(self.client.async_search.calls[1][1]["keep_alive"], "5m")
+        self.assertEqual(self.client.async_search.calls[1][1]["filter_path"],
+                         self.client.async_search.calls[0][1]["filter_path"])
+
+    def test_stream_yields_partial_results_until_done(self):
+        self.manager.submit(self.query)
+        handles = list(self.manager.stream("search-1"))
+        self.assertEqual([(h.is_partial, h.response["aggregations"]["count"]["value"]) for h in handles],
+                         [(True, 1), (False, 2)])
+
+    def test_stream_is_bounded(self):
+        self.manager.submit(self.query)
+
+        def clock():
+            self.now += 10
+            return self.now
+
+        self.manager.clock = clock
+        handles = list(self.manager.stream("search-1", max_duration=5))
+        self.assertEqual([handle.is_running for handle in handles], [True])
+
+    def test_submits_take_a_limiter_slot(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_timeout=0.01)
+        manager = AsyncSearchManager(QueryExecutor(client=self.client, limiter=limiter), clock=lambda: self.now)
+        manager.submit(self.query)
+        self.assertEqual(limiter.stats()["admitted"]["batch"], 1)
+        limiter.acquire()
+        with self.assertRaises(OverloadedError):
+            manager.submit(self.query)
+
+    def test_abandoned_searches_are_deleted(self):
+        self.manager.submit(self.query)
+        self.now += 30
+        self.assertEqual(self.manager.cleanup(), [])
+        self.now += 30
+        self.assertEqual(self.manager.cleanup(), ["search-1"])
+        self.assertEqual(self.client.async_search.deleted, ["search-1"])
+        self.assertEqual(self.manager.tracked(), [])
+
+    def test_expired_searches_are_forgotten(self):
+        self.manager.submit(self.query)
+        self.now = 10001
+        self.assertEqual(self.manager.cleanup(), [])
+        self.assertEqual((self.manager.tracked(), self.client.async_search.deleted), ([], []))
+
+    def test_kept_completed_searches_are_cleaned_up(self):
+        self.client.async_search.polls = 0
+        self.client.async_search.submit = lambda **kwargs: self.client.async_search._body(0, False)
+        manager = AsyncSearchManager(QueryExecutor(client=self.client), keep_on_completion=True, abandon_after=60,
+                                     clock=lambda: self.now)
+        manager.submit(self.query)
+        self.assertEqual(manager.tracked(), ["search-1"])
+        self.now += 60
+        self.assertEqual(manager.cleanup(), ["search-1"])
+
+    def test_compiled_requests_are_reshaped_on_every_poll(self):
+        request = Transformer("my_events").compile({"aggs": {
+            "avg_formula": AvgAggregation("analyst_notes.formula_id", name="avg_formula", nested_path="analyst_notes"),
+            "last_created": MaxAggregation("analyst_notes.created", name="last_created", nested_path="analyst_notes"),
+        }})
+        self.client.async_search._body = lambda count, running: {
+            "id": "search-1", "is_running": running, "is_partial": running,
+            "response": {"aggregations": {"analyst_notes__nested": {
+                "doc_count": 9, "avg_formula": {"value": count}, "last_created": {"value": 3.0}}}}}
+        handle = self.manager.submit(request)
+        self.assertEqual(handle.response["aggregations"]["avg_formula"], {"doc_count": 9, "avg_formula": {"value": 0}})
+        self.assertEqual(self.client.async_search.calls[0][1]["body"], request.body())
+        handle = self.manager.poll("search-1")
+        self.assertEqual(handle.response["aggregations"], {
+            "avg_formula": {"doc_count": 9, "avg_formula": {"value": 1}},
+            "last_created": {"doc_count": 9, "last_created": {"value": 3.0}}})
+
+    def test_templates_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.manager.submit(TemplateRequest("t", {}, {}))
+
+    def test_routes(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["async_searches"] = self.manager
+        client = app.test_client()
+
+        response = client.post("/async-searches", json={"aggs": {"status": {"terms": {"field": "status"}}}})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)["id"], "search-1")
+        self.assertTrue(json.loads(client.get("/async-searches/search-1/status").data)["is_running"])
+
+        lines = [json.loads(line) for line in client.get("/async-searches/search-1/stream").data.splitlines()]
+        self.assertEqual([line["aggregations"]["count"]["value"] for line in lines], [1, 2])
+        self.assertFalse(lines[-1]["is_running"])
+
+        self.assertEqual(client.delete("/async-searches/search-1").status_code, 200)
+        self.assertEqual(self.client.async_search.deleted, ["search-1"])
+
+    def test_routes_reject_invalid_models(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["async_searches"] = self.manager
+        client = app.test_client()
+
+        response = client.post("/async-searches", json={"aggs": {"status": {"terms": {"field": "status"}}}, "size": -1,
+                                                          "colour": "red"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(error["path"] for error in json.loads(response.data)["errors"]), ["colour", "size"])
+        self.assertEqual(client.post("/async-searches", data="not json").status_code, 400)
+        self.assertEqual(self.client.async_search.calls, [])
+
+    def test_routes_reject_leading_wildcards_on_mapped_fields(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["async_searches"] = self.manager
+        app.extensions["transformer"] = Transformer("my_events", mappings=FieldMappings.load())  # ✅ As in app.py
+        response = app.test_client().post("/async-searches", json={
+            "filters": [{"url.domain": {"wildcard": "*.example.com"}}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("url.domain", json.loads(response.data)["errors"][0]["message"])
+        self.assertEqual(self.client.async_search.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
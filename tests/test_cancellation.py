@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+import unittest
+
+from elasticsearch import ConnectionTimeout
+from flask import Flask
+from routes import home_route
+from transformer.cancellation import SearchCancelledError, SearchTracker
+from transformer.limiter import ConcurrencyLimiter
+from transformer.query_executor import QueryExecutor
+from transformer.resilience import HedgePolicy
+
+
+class FakeCluster:
+    """Running search tasks, each tagged with the `X-Opaque-Id` it was sent with."""
+
+    def __init__(self):
+        self.running = {}
+        self.sent = []
+        self.cancelled = []
+        self.lock = threading.Lock()
+
+    def wait_for(self, count):
+        while len(self.running) < count:
+            time.sleep(0.001)
+
+
+class FakeTasks:
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def list(self, actions, detailed, group_by):
+        with self.cluster.lock:
+            return {"tasks": {task_id: {"headers": {"X-Opaque-Id": opaque_id}}
+                              for task_id, (opaque_id, _) in self.cluster.running.items()}}
+
+    def cancel(self, task_id):
+        with self.cluster.lock:
+            opaque_id, event = self.cluster.running[task_id]
+            self.cluster.cancelled.append(opaque_id)
+        event.set()
+
+
+class FakeElasticsearch:
+    """
+    Searches run until cancelled or for `duration` seconds (a number, or a function of the opaque id);
+    `request_timeout` abandons them earlier.
+    """
+
+    def __init__(self, cluster, duration=5.0, opaque_id=None, request_timeout=None):
+        self.cluster = cluster
+        self.duration = duration
+        self.opaque_id = opaque_id
+        self.request_timeout = request_timeout
+        self.tasks = FakeTasks(cluster)
+
+    def options(self, opaque_id=None, request_timeout=None):
+        return FakeElasticsearch(self.cluster, self.duration, opaque_id, request_timeout)
+
+    def search(self, **kwargs):
+        event = threading.Event()
+        with self.cluster.lock:
+            task_id = f"node:{len(self.cluster.sent)}"
+            self.cluster.sent.append(self.opaque_id)
+            self.cluster.running[task_id] = (self.opaque_id, event)
+        duration = self.duration(self.opaque_id) if callable(self.duration) else self.duration
+        timed_out = self.request_timeout is not None and self.request_timeout < duration
+        cancelled = event.wait(self.request_timeout if timed_out else duration)
+        if timed_out and not cancelled:
+            raise ConnectionTimeout("timed out")  # ✅ The client gives up; the task keeps running
+        with self.cluster.lock:
+            del self.cluster.running[task_id]
+        if cancelled:
+            raise RuntimeError("task cancelled")
+        return {"timed_out": False}
+
+
+class TestSearchCancellation(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = FakeCluster()
+        self.tracker = SearchTracker()
+        self.executor = QueryExecutor(client=FakeElasticsearch(self.cluster), trim_response=False,
+                                      tracker=self.tracker)
+
+    def run_in_background(self, **kwargs):
+        outcome = {}
+
+        def search():
+            try:
+                outcome["response"] = self.executor.execute_query({"size": 0}, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        return thread, outcome
+
+    def test_client_cancellation(self):
+        thread, outcome = self.run_in_background(opaque_id="search-1")
+        self.cluster.wait_for(1)
+        self.assertEqual(self.tracker.in_flight(), ["search-1"])
+        self.assertTrue(self.tracker.cancel("search-1"))
+        thread.join()
+        self.assertIsInstance(outcome["error"], SearchCancelledError)
+        self.assertEqual(outcome["error"].reason, "client")
+        self.assertEqual(self.cluster.cancelled, ["search-1"])
+        self.assertEqual(self.tracker.in_flight(), [])
+        self.assertFalse(self.tracker.cancel("search-1"))
+
+    def test_newer_search_supersedes_older_one(self):
+        thread, outcome = self.run_in_background(opaque_id="old", cancel_key=("session-1", "panel"))
+        self.cluster.wait_for(1)
+        self.executor.es.duration = 0
+        self.executor.execute_query({"size": 0}, opaque_id="new", cancel_key=("session-1", "panel"))
+        thread.join()
+        self.assertEqual(outcome["error"].reason, "superseded")
+        self.assertEqual(self.cluster.cancelled, ["old"])
+        self.assertEqual(self.tracker.stats()["cancelled"]["superseded"], 1)
+
+    def test_other_keys_are_not_superseded(self):
+        thread, outcome = self.run_in_background(opaque_id="a", cancel_key=("session-1", "panel"))
+        self.cluster.wait_for(1)
+        self.executor.es.duration = 0
+        self.executor.execute_query({"size": 0}, cancel_key=("session-2", "panel"))
+        self.tracker.cancel("a")
+        thread.join()
+        self.assertEqual(self.cluster.cancelled, ["a"])
+
+    def test_timed_out_search_is_cancelled_on_the_cluster(self):
+        with self.assertRaises(ConnectionTimeout):
+            self.executor.execute_query({"size": 0}, timeout=0.01, opaque_id="slow")
+        self.assertEqual(self.cluster.cancelled, ["slow"])
+        self.assertEqual(self.tracker.stats(), {"in_flight": 0, "cancelled": {
+            "client": 0, "deadline": 1, "superseded": 0, "hedge_lost": 0}})
+
+    def test_losing_hedge_is_cancelled_without_a_tracker(self):
+        client = FakeElasticsearch(self.cluster, duration=lambda opaque_id: 0.01 if opaque_id.endswith("/hedge") else 5.0)
+        executor = QueryExecutor(client=client, trim_response=False, hedging=HedgePolicy(initial_delay=0.02))
+        executor.execute_query({"size": 0}, opaque_id="search-1")
+        self.assertEqual(executor.metrics.hedges_won, 1)
+        self.assertEqual(self.cluster.cancelled, ["search-1"])  # ✅ Only the losing attempt
+
+    def test_hedges_take_their_own_limiter_slot(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1)
+        client = FakeElasticsearch(self.cluster, duration=0.1)
+        executor = QueryExecutor(client=client, trim_response=False, hedging=HedgePolicy(initial_delay=0.02),
+                                 limiter=limiter)
+        executor.execute_query({"size": 0})
+        self.assertEqual((executor.metrics.hedges_fired, executor.metrics.hedges_skipped), (0, 1))
+        self.assertEqual(len(self.cluster.sent), 1)
+        self.assertEqual(limiter.stats()["in_flight"], {"interactive": 0, "batch": 0})
+
+    def test_search_cancelled_before_it_is_sent(self):
+        self.tracker.begin(self.executor.es, "early")
+        self.tracker.cancel("early")
+        with self.assertRaises(SearchCancelledError):
+            self.executor._send("search", {}, None, "early")
+        self.assertEqual(self.cluster.sent, [])
+
+    def test_attempt_ids_are_reserved(self):
+        with self.assertRaises(ValueError):
+            self.tracker.begin(self.executor.es, "a/b")
+
+    def test_ids_in_flight_are_not_overwritten(self):
+        self.tracker.begin(self.executor.es, "search-1", owner="session-1")
+        with self.assertRaises(ValueError):
+            self.tracker.begin(self.executor.es, "search-1", owner="session-2")
+        self.assertFalse(self.tracker.cancel_owned("search-1", "session-2"))
+        self.assertTrue(self.tracker.cancel_owned("search-1", "session-1"))
+
+    def test_routes_cancel_searches(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["search_tracker"] = self.tracker
+        self.tracker.begin(self.executor.es, "session-1:search-1", owner="session-1")
+        client = app.test_client()
+        self.assertEqual(client.delete("/searches/unknown", headers={"X-Session-Id": "session-1"}).status_code, 404)
+        self.assertEqual(client.delete("/searches/search-1").status_code, 404)
+        self.assertEqual(client.delete("/searches/search-1", headers={"X-Session-Id": "session-2"}).status_code, 404)
+        response = client.delete("/searches/search-1", headers={"X-Session-Id": "session-1"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data), {"cancelled": "search-1"})
+
+
+    def test_routes_cancel_a_search_while_it_runs(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["search_tracker"] = self.tracker
+        app.extensions["search_executor"] = self.executor
+        headers = {"X-Session-Id": "session-1", "X-Opaque-Id": "load-1"}
+        outcome = {}
+
+        def load():
+            outcome["response"] = app.test_client().get("/?panel=domains", headers=headers)
+
+        thread = threading.Thread(target=load)
+        thread.start()
+        self.cluster.wait_for(1)
+        client = app.test_client()
+        self.assertEqual(client.get("/?panel=other", headers=headers).status_code, 409)  # ✅ Id already in flight
+        self.assertEqual(client.delete("/searches/load-1", headers={"X-Session-Id": "session-2"}).status_code, 404)
+        self.assertEqual(client.delete("/searches/load-1", headers={"X-Session-Id": "session-1"}).status_code, 202)
+        thread.join()
+        self.assertEqual(outcome["response"].status_code, 409)
+        self.assertEqual(self.cluster.cancelled, ["session-1:load-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -50,4 +50,17 @@ class TestCardinalityAggregation(unittest.TestCase):
         agg = CardinalityAggregation.from_json(json_data)
         self.assertEqual(agg.field, "user_id")
         self.assertEqual(agg.name, "unique_users")
-        self.assertEqual(agg.precision_threshold, 3000)
\ No newline at end of file
+        self.assertEqual(agg.precision_threshold, 3000)
+
+    def test_cardinality_execution_hint(self):
+        agg = CardinalityAggregation(field="source_address", execution_hint="save_memory_heuristic")
+        expected = {
+            "source_address": {
+                "cardinality": {
+                    "field": "source_address",
+                    "execution_hint": "save_memory_heuristic"
+                }
+            }
+        }
+        self.assertEqual(agg.to_elasticsearch(), expected)
+        self.assertEqual(CardinalityAggregation.from_json(agg.to_json()).execution_hint, "save_memory_heuristic")
@@ -0,0 +1,69 @@
+import io
+import unittest
+from transformer.columnar import HitsDecoder, parse_dates
+from transformer.mappings import FieldMappings
+
+RESPONSE = {
+    "hits": {
+        "hits": [
+            {
+                "_id": "a",
+                "_source": {
+                    "@timestamp": "2025-01-01T00:00:00.000Z",
+                    "client_id": 7,
+                    "url": {"domain": "example.com"},
+                    "trust_initiated": True
+                }
+            },
+            {
+                "_id": "b",
+                "_source": {"@timestamp": "2025-01-01T00:00:01.500Z", "url.domain": "other.org"}
+            },
+            {
+                "_id": "c",
+                "fields": {"@timestamp": ["2025-01-01T00:00:00.000Z"], "client_id": ["9"], "trust_initiated": ["false"]}
+            }
+        ]
+    }
+}
+
+
+class TestHitsDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = HitsDecoder(
+            ["@timestamp", "client_id", "url.domain", "trust_initiated"], mappings=FieldMappings.load()
+        )
+        self.result = self.decoder.decode(RESPONSE)
+
+    def test_typed_columns(self):
+        self.assertEqual(len(self.result), 3)
+        self.assertEqual(self.result.ids, ["a", "b", "c"])
+        self.assertEqual(self.result.column("client_id").typecode, "Q")
+        self.assertEqual(list(self.result.column("client_id")), [7, 0, 9])
+        self.assertEqual(list(self.result.validity["client_id"]), [1, 0, 1])
+        self.assertEqual(list(self.result.column("trust_initiated")), [1, 0, 0])
+
+    def test_dotted_and_nested_source(self):
+        self.assertEqual(self.result.column("url.domain"), ["example.com", "other.org", None])
+
+    def test_dates_as_epoch_millis(self):
+        self.assertEqual(list(self.result.column("@timestamp")), [1735689600000, 1735689601500, 1735689600000])
+
+    def test_parse_dates_passes_epoch_millis(self):
+        self.assertEqual(list(parse_dates([1735689600000, None])), [1735689600000, 0])
+
+    def test_to_csv(self):
+        output = io.StringIO()
+        self.result.to_csv(output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "_id,@timestamp,client_id,url.domain,trust_initiated")
+        self.assertEqual(lines[1], "a,2025-01-01T00:00:00+00:00,7,example.com,1")
+        self.assertEqual(lines[2], "b,2025-01-01T00:00:01.500000+00:00,,other.org,")
+
+    def test_empty_response(self):
+        self.assertEqual(len(self.decoder.decode({})), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from transformer.dates import DateRounder, round_bound
+from transformer.filter import BoolFilter, RangeFilter, TermFilter
+from transformer.mappings import FieldMappings
+from transformer.transform import Transformer
+
+
+class TestDateRounding(unittest.TestCase):
+
+    def test_round_bound(self):
+        self.assertEqual(round_bound("now-15m", "m"), "now-15m/m")
+        self.assertEqual(round_bound("now/d", "m"), "now/d")
+        self.assertEqual(round_bound("2025-01-01T00:00:07.123Z", "m"), "2025-01-01T00:00:07.123Z||/m")
+
+    def test_round_mode(self):
+        rounded = DateRounder("m").round_range(RangeFilter("@timestamp", gte="now-15m", lte="now"))
+        self.assertEqual(rounded.to_elasticsearch(), {"range": {"@timestamp": {"gte": "now-15m/m", "lte": "now/m"}}})
+
+    def test_numeric_ranges_are_unchanged(self):
+        rounder = DateRounder("m")
+        node = RangeFilter("action_count", gte=5)
+        self.assertIs(rounder.round_filter(node), node)
+
+    def test_only_date_fields_with_mappings(self):
+        rounder = DateRounder("h", mappings=FieldMappings.load())
+        url_range = RangeFilter("url.domain", gte="2025-01-01")
+        self.assertIs(rounder.round_filter(url_range), url_range)
+        self.assertEqual(
+            rounder.round_filter(RangeFilter("@timestamp", gte="2025-01-01T10:17:00Z")).conditions,
+            {"gte": "2025-01-01T10:17:00Z||/h"}
+        )
+
+    def test_split_mode_keeps_exact_edges(self):
+        split = DateRounder("m", mode="split").round_range(RangeFilter("@timestamp", gte="now-15m"))
+        self.assertEqual(split.to_elasticsearch(), {"bool": {
+            "should": [
+                {"range": {"@timestamp": {"gt": "now-15m/m"}}},
+                {"range": {"@timestamp": {"gte": "now-15m", "lte": "now-15m/m"}}},
+            ],
+            "minimum_should_match": 1
+        }})
+
+    def test_split_mode_clips_edges_to_the_range(self):
+        split = DateRounder("m", mode="split").round_range(RangeFilter("@timestamp", gte="now-15m", lt="now"))
+        core, head, tail = split.should
+        self.assertEqual(core.conditions, {"gt": "now-15m/m", "lt": "now/m"})
+        self.assertEqual(head.must[0].conditions, {"gte": "now-15m", "lte": "now-15m/m"})
+        self.assertEqual(tail.must[0].conditions, {"gte": "now/m", "lt": "now"})
+        self.assertEqual(tail.must[1].conditions, {"gte": "now-15m", "lt": "now"})
+
+    def test_rounding_reaches_bool_filters(self):
+        rounded = DateRounder("m").round_filter(BoolFilter(must=[TermFilter("event.provider", "pfm"),
+                                                                  RangeFilter("@timestamp", gte="now-1h")]))
+        self.assertEqual(rounded.must[1].conditions, {"gte": "now-1h/m"})
+
+    def test_transformer_rounding(self):
+        transformer = Transformer("my_events", mappings=FieldMappings.load(), date_rounding="m")
+        first = transformer.transform({"filters": [{"@timestamp": {"gte": "now-15m"}}], "aggs": {"client_id": ["terms", 5]}})
+        self.assertEqual(first["query"]["bool"]["must"][0], {"range": {"@timestamp": {"gte": "now-15m/m"}}})
+
+    def test_invalid_unit(self):
+        with self.assertRaises(ValueError):
+            DateRounder("minutes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import threading
+import unittest
+from transformer.fusion import FusionBatcher, FusionPlanner
+from transformer.panel_store import PanelScheduler, PanelStore
+from transformer.query_executor import QueryExecutor
+from transformer.transform import Transformer
+
+FILTERS = [{"client_id": 987654321}]
+
+
+class FakeElasticsearch:
+    """Answers every aggregation with a result naming it, so tests can see which search computed what."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def search(self, index, body, **kwargs):
+        body = json.loads(body) if isinstance(body, bytes) else body  # ✅ Panels send pre-encoded bodies
+        with self.lock:
+            self.calls.append({"index": index, "body": body})
+        if self.fail and len(body.get("aggs", {})) > 1:
+            raise ConnectionError("fused search failed")
+        aggregations = {name: {"value": name} for name in body.get("aggs", {})}
+        return {"timed_out": False, "hits": {"total": {"value": 7, "relation": "eq"}}, "aggregations": aggregations}
+
+
+class TestFusion(unittest.TestCase):
+
+    def setUp(self):
+        self.transformer = Transformer("my_events", fuse_metrics=True)
+        self.planner = FusionPlanner(self.transformer)
+        self.client = FakeElasticsearch()
+        self.executor = QueryExecutor(index_name="events", client=self.client)
+
+    def test_requests_sharing_filters_are_fused(self):
+        requests = [
+            {"filters": FILTERS, "aggs": {"domains": {"terms": {"field": "url.domain"}}}},
+            {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}},
+            {"filters": [{"client_id": 1}], "aggs": {"average": ["avg", "bytes"]}},
+        ]
+        searches = self.planner.plan(requests)
+        self.assertEqual(len(searches), 2)
+        self.assertEqual(sorted(searches[0].body["aggs"]), ["p0__domains", "p1__average"])
+        self.assertEqual(searches[1].body, self.transformer.transform(requests[2]))
+
+        responses = self.planner.execute(self.executor, requests)
+        self.assertEqual(len(self.client.calls), 2)
+        self.assertEqual(responses[0]["aggregations"], {"domains": {"value": "p0__domains"}})
+        self.assertEqual(responses[1]["aggregations"], {"average": {"value": "p1__average"}})
+        self.assertEqual(responses[2]["aggregations"], {"average": {"value": "average"}})
+        self.assertEqual(responses[1]["hits"]["total"]["value"], 7)
+
+    def test_identical_aggregations_are_computed_once(self):
+        request = {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}}
+        search, = self.planner.plan([request, request])
+        self.assertEqual(list(search.body["aggs"]), ["p0__average"])
+        first, second = self.planner.execute(self.executor, [request, request])
+        self.assertEqual(first["aggregations"], second["aggregations"])
+        self.assertIsNot(first["aggregations"]["average"], second["aggregations"]["average"])
+
+    def test_hits_and_other_indices_are_not_fused(self):
+        requests = [
+            {"filters": FILTERS, "size": 5},
+            {"filters": FILTERS, "size": 5},
+            ("other-events", {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}}),
+            {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}},
+        ]
+        self.assertEqual(len(self.planner.plan(requests)), 4)
+        self.planner.execute(self.executor, requests)
+        self.assertEqual([call["index"] for call in self.client.calls], ["events", "events", "other-events", "events"])
+
+    def test_count_requests_join_aggregation_searches(self):
+        requests = [{"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}, "track_total_hits": True},
+                    {"filters": FILTERS, "response_mode": "count"}]
+        count = self.planner.execute(self.executor, requests)[1]
+        self.assertEqual(len(self.client.calls), 1)
+        self.assertEqual(count["hits"]["total"]["value"], 7)
+        self.assertNotIn("aggregations", count)
+
+    def test_fused_metrics_are_reshaped_per_request(self):
+        request = self.transformer.compile({"filters": FILTERS, "aggs": {
+            "low": ["min", "bytes"], "high": ["max", "bytes"]}})
+        other = self.transformer.compile({"filters": FILTERS, "aggs": {"domains": {"terms": {"field": "url.domain"}}}})
+        search, = self.planner.plan([request, other])
+        self.assertEqual(sorted(search.body["aggs"]), ["p0__bytes__stats", "p1__domains"])
+        split = dict(search.split({"aggregations": {
+            "p0__bytes__stats": {"min": 1.0, "max": 9.0, "avg": 5.0, "sum": 10.0, "count": 2},
+            "p1__domains": {"buckets": []}}}))
+        self.assertEqual(request.reshape_response(split[0])["aggregations"], {"low": {"value": 1.0}, "high": {"value": 9.0}})
+
+    def test_scheduler_refreshes_due_panels_together(self):
+        store = PanelStore()
+        scheduler = PanelScheduler(self.transformer, self.executor, store, planner=self.planner)
+        scheduler.register("domains", {"filters": FILTERS, "aggs": {"domains": {"terms": {"field": "url.domain"}}}})
+        scheduler.register("average", {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}})
+        scheduler.refresh_due()
+        self.assertEqual(len(self.client.calls), 1)
+        self.assertEqual(store.get("average").result["aggregations"], {"average": {"value": "p1__average"}})
+
+    def test_scheduler_falls_back_when_the_fused_search_fails(self):
+        client = FakeElasticsearch(fail=True)
+        store = PanelStore()
+        scheduler = PanelScheduler(self.transformer, QueryExecutor(client=client), store, planner=self.planner)
+        scheduler.register("domains", {"filters": FILTERS, "aggs": {"domains": {"terms": {"field": "url.domain"}}}})
+        scheduler.register("average", {"filters": FILTERS, "aggs": {"average": ["avg", "bytes"]}})
+        with self.assertLogs("transformer.panel_store", "ERROR"):
+            scheduler.refresh_due()
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(store.get("average").result["aggregations"], {"average": {"value": "average"}})
+
+    def test_batcher_fuses_concurrent_requests(self):
+        batcher = FusionBatcher(self.planner, self.executor, window=5, max_batch=3)
+        names = ["a", "b", "c"]
+        responses = {}
+
+        def panel(name):
+            responses[name] = batcher.execute({"filters": FILTERS, "aggs": {name: ["avg", f"bytes_{name}"]}})
+
+        threads = [threading.Thread(target=panel, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.client.calls), 1)
+        self.assertEqual({name: list(response["aggregations"]) for name, response in responses.items()},
+                         {name: [name] for name in names})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from transformer.filter import IdsFilter  # Ensure correct import path
+from transformer.filter import IdsFilter, create_filter_object  # Ensure correct import path
 
 class TestIdsFilter(unittest.TestCase):
 
@@ -13,7 +13,7 @@ class TestIdsFilter(unittest.TestCase):
 
     def test_mixed_ids(self):
         ids_filter = IdsFilter([1, "id2", 3])
-        self.assertEqual(ids_filter.to_elasticsearch(), {"ids": {"values": [1, "id2", 3]}})
+        self.assertEqual(ids_filter.to_elasticsearch(), {"ids": {"values": [1, 3, "id2"]}})
 
     def test_empty_ids_list(self):
         ids_filter = IdsFilter([])
@@ -31,5 +31,14 @@ class TestIdsFilter(unittest.TestCase):
         ids_filter = IdsFilter.from_json(json_data)
         self.assertEqual(ids_filter.values, [1, 2, 3])
 
+    def test_duplicate_ids_are_dropped(self):
+        ids_filter = IdsFilter(["b", "a", "b"])
+        self.assertEqual(ids_filter.values, ["a", "b"])
+
+    def test_ids_data_model_builds_ids_filter(self):
+        ids_filter = create_filter_object({"ids": ["2", "1"]})
+        self.assertIsInstance(ids_filter, IdsFilter)
+        self.assertEqual(ids_filter.to_elasticsearch(), {"ids": {"values": ["1", "2"]}})
+
 if __name__ == "__main__":
     unittest.main()
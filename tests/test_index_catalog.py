@@ -0,0 +1,134 @@
+import unittest
+from datetime import datetime, timezone
+from transformer.index_catalog import IndexCatalog, time_window
+from transformer.query_executor import QueryExecutor
+from transformer.stored import TemplateRequest
+from transformer.transform import Transformer
+
+DAY = 86400000
+
+
+def millis(day, hour=0):
+    return int(datetime(2025, 1, day, hour, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class FakeCat:
+    def __init__(self, indices):
+        self.names = indices
+
+    def indices(self, index, format, h):
+        return [{"index": name} for name in self.names]
+
+
+class FakeElasticsearch:
+    """Daily indices `events-2025.01.0N` holding one day of documents each; `events-2025.01.06` is empty."""
+
+    def __init__(self, fail=False):
+        self.spans = {f"events-2025.01.0{day}": (millis(day), millis(day) + DAY - 1) for day in range(1, 6)}
+        self.cat = FakeCat(list(self.spans) + ["events-2025.01.06"])
+        self.fail = fail
+        self.catalog_searches = 0
+        self.searches = []
+
+    def search(self, index, body=None, size=None, aggs=None, **kwargs):
+        if aggs is not None:
+            self.catalog_searches += 1
+            if self.fail:
+                raise ConnectionError("cluster unavailable")
+            buckets = [{"key": name, "min": {"value": first}, "max": {"value": last}}
+                       for name, (first, last) in self.spans.items()]
+            return {"aggregations": {"indices": {"buckets": buckets}}}
+        self.searches.append({"index": index, **kwargs})
+        return {}
+
+
+class TestTimeWindow(unittest.TestCase):
+
+    def test_must_ranges_intersect(self):
+        query = {"bool": {"must": [
+            {"range": {"@timestamp": {"gte": "2025-01-02T00:00:00Z"}}},
+            {"range": {"@timestamp": {"lt": "2025-01-03T00:00:00Z"}}},
+        ]}}
+        self.assertEqual(time_window(query, "@timestamp", None), (millis(2), millis(3)))
+
+    def test_optional_should_does_not_restrict(self):
+        query = {"bool": {"filter": [{"term": {"a": 1}}], "should": [{"range": {"@timestamp": {"gte": "now-1d"}}}]}}
+        self.assertIsNone(time_window(query, "@timestamp", datetime(2025, 1, 4, tzinfo=timezone.utc)))
+
+    def test_split_ranges_use_the_hull(self):
+        query = {"bool": {"should": [
+            {"range": {"@timestamp": {"gt": "now-15m/m"}}},
+            {"range": {"@timestamp": {"gte": "now-15m", "lte": "now-15m/m"}}},
+        ], "minimum_should_match": 1}}
+        now = datetime(2025, 1, 4, 12, tzinfo=timezone.utc)
+        self.assertEqual(time_window(query, "@timestamp", now), (millis(4, 11) + 45 * 60000, None))
+
+    def test_single_clause_occurrences(self):
+        query = {"bool": {"filter": {"range": {"@timestamp": {"gte": "2025-01-02T00:00:00Z"}}},
+                          "must": {"range": {"@timestamp": {"lt": "2025-01-03T00:00:00Z"}}}}}
+        self.assertEqual(time_window(query, "@timestamp", None), (millis(2), millis(3)))
+
+    def test_time_zone_applies_to_naive_dates_and_rounding(self):
+        naive = {"range": {"@timestamp": {"gte": "2025-01-02T00:00:00", "lt": "2025-01-03T00:00:00",
+                                          "time_zone": "+02:00"}}}
+        self.assertEqual(time_window(naive, "@timestamp", None), (millis(1, 22), millis(2, 22)))
+        now = datetime(2025, 1, 4, 23, tzinfo=timezone.utc)  # ✅ Already Jan 5 in Paris
+        rounded = {"range": {"@timestamp": {"gte": "now/d", "time_zone": "Europe/Paris"}}}
+        self.assertEqual(time_window(rounded, "@timestamp", now), (millis(4, 23), None))
+        unknown = {"range": {"@timestamp": {"gte": "now/d", "time_zone": "Mars/Olympus"}}}
+        self.assertIsNone(time_window(unknown, "@timestamp", now))
+
+
+class TestIndexCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeElasticsearch()
+        self.now = millis(5, 12) / 1000
+        self.catalog = IndexCatalog(self.client, "events-*", clock=lambda: self.now)
+
+    def test_short_window_touches_the_newest_indices(self):
+        body = Transformer("events").transform({"filters": [{"@timestamp": {"gte": "now-15m"}}]})
+        self.assertEqual(self.catalog.resolve(body), ["events-2025.01.05", "events-2025.01.06"])
+
+    def test_absolute_window(self):
+        body = {"query": {"range": {"@timestamp": {"gte": "2025-01-02T06:00:00Z", "lte": "2025-01-02T08:00:00Z"}}}}
+        self.assertEqual(self.catalog.resolve(body), ["events-2025.01.02", "events-2025.01.06"])
+
+    def test_unknown_bounds_fall_back_to_the_pattern(self):
+        for query in ({"query": {"match_all": {}}}, {"query": {"range": {"@timestamp": {"gte": "last tuesday"}}}}):
+            self.assertEqual(self.catalog.resolve(query), "events-*")
+
+    def test_catalog_is_cached_and_refreshed(self):
+        body = {"query": {"range": {"@timestamp": {"gte": "now-1h"}}}}
+        self.catalog.resolve(body)
+        self.catalog.resolve(body)
+        self.assertEqual(self.client.catalog_searches, 1)
+        self.now += 61
+        self.catalog.resolve(body)
+        self.assertEqual(self.client.catalog_searches, 2)
+
+    def test_failed_catalog_load_falls_back(self):
+        catalog = IndexCatalog(FakeElasticsearch(fail=True), "events-*", clock=lambda: self.now)
+        self.assertEqual(catalog.resolve({"query": {"range": {"@timestamp": {"gte": "now-1h"}}}}), "events-*")
+
+    def test_executor_searches_pruned_indices(self):
+        executor = QueryExecutor(client=self.client, catalog=self.catalog)
+        executor.execute_query(Transformer("events").transform_to_bytes({"filters": [{"@timestamp": {"gte": "now-1h"}}]}))
+        self.assertEqual(self.client.searches[0]["index"], ["events-2025.01.05", "events-2025.01.06"])
+        self.assertTrue(self.client.searches[0]["ignore_unavailable"])
+
+    def test_templates_search_the_pattern(self):
+        executor = QueryExecutor(index_name="events-2025.01.06", client=self.client, catalog=self.catalog)
+        method, params = executor.search_request(TemplateRequest("panel", {}, {"size": 0}))
+        self.assertEqual((method, params["index"]), ("search_template", "events-*"))
+
+    def test_explicit_index_is_not_pruned(self):
+        executor = QueryExecutor(client=self.client, catalog=self.catalog)
+        query = {"query": {"range": {"@timestamp": {"gte": "now-1h"}}}}
+        self.assertEqual(executor.search_request(query, index="archive")[1]["index"], "archive")
+        method, params = executor.search_request(TemplateRequest("panel", {}, {"size": 0}), index="archive")
+        self.assertEqual(params["index"], "archive")
+
+
+if __name__ == "__main__":
+    unittest.main()
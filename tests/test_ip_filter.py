@@ -0,0 +1,73 @@
+import unittest
+from transformer.filter import BoolFilter, IpFilter, WildcardFilter, collapse_ip_values, create_filter_object
+from transformer.mappings import FieldMappings
+from transformer.patterns import PatternRewriter
+
+
+class TestIpFilter(unittest.TestCase):
+
+    def test_single_cidr_is_a_term_query(self):
+        ip_filter = IpFilter("source_address", "10.1.0.0/16")
+        self.assertEqual(ip_filter.to_elasticsearch(), {"term": {"source_address": "10.1.0.0/16"}})
+
+    def test_adjacent_blocks_collapse(self):
+        ip_filter = IpFilter("source_address", ["10.0.0.0/25", "10.0.0.128/25", "10.0.0.7"])
+        self.assertEqual(ip_filter.to_elasticsearch(), {"term": {"source_address": "10.0.0.0/24"}})
+
+    def test_separate_addresses_are_a_terms_query(self):
+        ip_filter = IpFilter("source_address", ["10.0.0.9", "192.168.1.0/24", "10.0.0.1", "::1"])
+        self.assertEqual(
+            ip_filter.to_elasticsearch(),
+            {"terms": {"source_address": ["10.0.0.1", "10.0.0.9", "192.168.1.0/24", "::1"]}}
+        )
+
+    def test_range_covered_by_one_block(self):
+        ip_filter = IpFilter("source_address", "10.0.0.0-10.0.0.255")
+        self.assertEqual(ip_filter.to_elasticsearch(), {"term": {"source_address": "10.0.0.0/24"}})
+
+    def test_unaligned_range_stays_a_range(self):
+        ip_filter = IpFilter("source_address", ["10.0.0.1-10.0.0.200", "10.0.0.201", "172.16.0.1"])
+        self.assertEqual(
+            ip_filter.to_elasticsearch(),
+            {
+                "bool": {
+                    "should": [
+                        {"term": {"source_address": "172.16.0.1"}},
+                        {"range": {"source_address": {"gte": "10.0.0.1", "lte": "10.0.0.201"}}}
+                    ],
+                    "minimum_should_match": 1
+                }
+            }
+        )
+
+    def test_max_range_networks(self):
+        networks, ranges = collapse_ip_values(["10.0.0.1-10.0.0.6"], max_range_networks=4)
+        self.assertEqual(networks, ["10.0.0.1", "10.0.0.2/31", "10.0.0.4/31", "10.0.0.6"])
+        self.assertEqual(ranges, [])
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            IpFilter("source_address", "10.0.0.300")
+        with self.assertRaises(ValueError):
+            IpFilter("source_address", "10.0.0.9-10.0.0.1")
+
+    def test_json_round_trip(self):
+        ip_filter = IpFilter("source_address", ["10.0.0.1-10.0.0.200", "10.1.0.0/16"])
+        self.assertEqual(ip_filter.to_json(), {"type": "ip", "field": "source_address",
+                                               "values": ["10.1.0.0/16", "10.0.0.1-10.0.0.200"]})
+        self.assertEqual(IpFilter.from_json(ip_filter.to_json()).to_json(), ip_filter.to_json())
+        restored = BoolFilter.from_json({"type": "bool", "must": [ip_filter.to_json()]})
+        self.assertIsInstance(restored.must[0], IpFilter)
+
+    def test_data_model(self):
+        ip_filter = create_filter_object({"destination_address": {"ip": ["10.2.0.0/16", "10.3.0.0/16"]}})
+        self.assertEqual(ip_filter.to_elasticsearch(), {"term": {"destination_address": "10.2.0.0/15"}})
+
+    def test_octet_wildcard_on_ip_field(self):
+        rewriter = PatternRewriter(FieldMappings.load())
+        rewritten = rewriter.rewrite_filter(WildcardFilter("source_address", "10.1.*"))
+        self.assertEqual(rewritten.to_elasticsearch(), {"term": {"source_address": "10.1.0.0/16"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
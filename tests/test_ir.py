@@ -0,0 +1,91 @@
+import unittest
+from transformer.aggregation import TermsAggregation, build_aggregation_query_class
+from transformer.filter import TermFilter
+from transformer.ir import CompiledRequest, JsonEmitter, RequestEmitter, compile_request
+from transformer.transform import Transformer
+
+REQUEST = {
+    "filters": [{"event.provider": "pfm"}, {"@timestamp": {"gte": "2025-01-01T00:00:00.000Z"}}],
+    "sorts": [{"field": "@timestamp", "order": "desc"}],
+    "aggs": {"client_id": ["terms", 50]},
+    "size": 0
+}
+
+
+class CountingEmitter(RequestEmitter):
+    """Counts how many nodes of each kind a walk visits."""
+
+    def __init__(self):
+        self.visited = []
+
+    def visit_request(self, request):
+        for node in request.filters:
+            self.visit_filter(node)
+        for node in request.sorts:
+            self.visit_sort(node)
+        for name, node in request.aggs:
+            self.visit_aggregation(name, node)
+        return self.visited
+
+    def visit_filter(self, node):
+        self.visited.append("filter")
+
+    def visit_sort(self, node):
+        self.visited.append("sort")
+
+    def visit_aggregation(self, name, node):
+        self.visited.append(name)
+
+
+class TestCompiledRequest(unittest.TestCase):
+
+    def test_compile_builds_nodes(self):
+        request = compile_request(REQUEST)
+        self.assertEqual(len(request.filters), 2)
+        self.assertEqual(len(request.sorts), 1)
+        self.assertEqual(dict(request.aggs)["client_id"].kind, TermsAggregation.__name__)
+
+    def test_immutable(self):
+        request = compile_request(REQUEST)
+        with self.assertRaises(AttributeError):
+            request.size = 10
+
+    def test_body_keeps_terms_size(self):
+        """The aggregation model is compiled once, so the requested size survives."""
+        body = Transformer("my_events").transform(REQUEST)
+        self.assertEqual(body["aggs"]["client_id"]["terms"]["size"], 50)
+        self.assertEqual(body["aggs"], build_aggregation_query_class(REQUEST["aggs"]))
+
+    def test_body_is_emitted_once(self):
+        request = compile_request(REQUEST)
+        body = request.body()
+        body["query"]["bool"]["must"].clear()
+        self.assertIsNot(request.body(), body)
+        self.assertEqual(request.body(), compile_request(REQUEST).body())
+
+    def test_cache_key(self):
+        self.assertEqual(compile_request(REQUEST).cache_key(), compile_request(dict(REQUEST)).cache_key())
+        other = dict(REQUEST, filters=[{"event.provider": "other"}])
+        self.assertNotEqual(compile_request(REQUEST).cache_key(), compile_request(other).cache_key())
+
+    def test_json_emitter(self):
+        json_data = JsonEmitter().emit(compile_request(dict(REQUEST, fields=["client_id"])))
+        self.assertEqual(json_data["filters"][0], {"type": "term", "field": "event.provider", "value": "pfm"})
+        self.assertEqual(json_data["aggs"]["client_id"]["type"], "terms_aggregation")
+        self.assertEqual(json_data["_source"], {"includes": ["client_id"]})
+
+    def test_custom_emitter(self):
+        self.assertEqual(CountingEmitter().emit(compile_request(REQUEST)), ["filter", "filter", "sort", "client_id"])
+
+    def test_paging(self):
+        body = CompiledRequest(filters=[TermFilter("client_id", 1)], from_=40).body()
+        self.assertEqual(body["from"], 40)
+
+    def test_build_elasticsearch_query_accepts_model_aggs(self):
+        body = Transformer("my_events").build_elasticsearch_query([TermFilter("client_id", 1)], [], {"url.domain": ["terms", 5]}, 20)
+        self.assertEqual(body["aggs"]["url.domain"]["terms"]["size"], 5)
+        self.assertEqual(body["query"], {"bool": {"must": [{"term": {"client_id": 1}}]}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from transformer.filter import BoolFilter, IdsFilter, TermFilter, TermsFilter, TermsLookupFilter
+from transformer.large_terms import LargeTermsPlanner, TermsLookupStore, merge_hit_responses, search_large_terms
+from transformer.sort import Sort
+
+
+class FakeIndices:
+    def __init__(self):
+        self.created = []
+
+    def exists(self, index):
+        return index in self.created
+
+    def create(self, index, mappings):
+        self.created.append(index)
+
+
+class FakeElasticsearch:
+    """Records indexed lookup documents instead of writing them to a cluster."""
+
+    def __init__(self):
+        self.indices = FakeIndices()
+        self.documents = {}
+
+    def index(self, index, id, document, refresh=None):
+        self.documents[id] = document
+
+
+class FakeExecutor:
+    """Answers each search with one hit per term value, sorted by value."""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute_query(self, query):
+        self.queries.append(query)
+        values = query["query"]["bool"]["must"][0]["terms"]["client_id"]
+        hits = [{"_id": str(v), "sort": [v]} for v in values][:query["size"]]
+        return {"timed_out": False, "hits": {"total": {"value": len(values), "relation": "eq"}, "hits": hits}}
+
+
+class TestTermsLookupStore(unittest.TestCase):
+
+    def test_identical_lists_are_staged_once(self):
+        client = FakeElasticsearch()
+        store = TermsLookupStore(client)
+        first = store.stage([1, 2, 3])
+        second = store.stage([1, 2, 3])
+        self.assertEqual(first, second)
+        self.assertEqual(client.documents, {first: {"values": [1, 2, 3]}})
+        self.assertEqual(client.indices.created, ["transformer-terms-lookup"])
+
+    def test_lookup_filter_for_ids(self):
+        store = TermsLookupStore(FakeElasticsearch(), index="staging")
+        lookup = store.lookup_filter(IdsFilter(["b", "a"]))
+        self.assertEqual(
+            lookup.to_elasticsearch(),
+            {"terms": {"_id": {"index": "staging", "id": lookup.id, "path": "values"}}}
+        )
+
+
+class TestLargeTermsPlanner(unittest.TestCase):
+
+    def test_small_lists_stay_inline(self):
+        planner = LargeTermsPlanner(store=TermsLookupStore(FakeElasticsearch()), inline_limit=5)
+        terms = TermsFilter("client_id", [1, 2, 3])
+        self.assertEqual(planner.plan([terms]), [[terms]])
+
+    def test_large_lists_become_lookups(self):
+        client = FakeElasticsearch()
+        planner = LargeTermsPlanner(store=TermsLookupStore(client), inline_limit=5, max_terms_count=100)
+        plans = planner.plan([BoolFilter(must=[TermsFilter("client_id", list(range(50)))])])
+        self.assertEqual(len(plans), 1)
+        lookup = plans[0][0].must[0]
+        self.assertIsInstance(lookup, TermsLookupFilter)
+        self.assertEqual(client.documents[lookup.id], {"values": list(range(50))})
+
+    def test_oversized_lists_are_chunked(self):
+        planner = LargeTermsPlanner(inline_limit=4)
+        plans = planner.plan([TermFilter("event.provider", "pfm"), TermsFilter("client_id", list(range(10)))])
+        self.assertEqual([plan[1].terms for plan in plans], [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+        self.assertTrue(all(plan[0].value == "pfm" for plan in plans))
+
+    def test_oversized_lists_inside_bool_are_rejected(self):
+        planner = LargeTermsPlanner(inline_limit=2)
+        with self.assertRaises(ValueError):
+            planner.plan([BoolFilter(should=[TermsFilter("client_id", [1, 2, 3])])])
+
+    def test_only_one_list_can_be_chunked(self):
+        planner = LargeTermsPlanner(inline_limit=2)
+        with self.assertRaises(ValueError):
+            planner.plan([TermsFilter("client_id", [1, 2, 3]), IdsFilter(["a", "b", "c"])])
+
+
+class TestSearchLargeTerms(unittest.TestCase):
+
+    def test_chunked_search_merges_hits(self):
+        executor = FakeExecutor()
+        data = {
+            "filters": [{"client_id": [9, 3, 7, 1, 5, 3]}],
+            "sorts": [{"field": "client_id", "order": "desc"}],
+            "size": 3
+        }
+        response = search_large_terms(data, executor, LargeTermsPlanner(inline_limit=2), max_workers=2)
+        self.assertEqual(len(executor.queries), 3)
+        self.assertEqual([hit["_id"] for hit in response["hits"]["hits"]], ["9", "7", "5"])
+        self.assertEqual(response["hits"]["total"], {"value": 5, "relation": "eq"})
+
+    def test_chunked_search_rejects_aggregations(self):
+        data = {"filters": [{"client_id": [1, 2, 3]}], "aggs": {"client_id": ["terms", 10]}}
+        with self.assertRaises(ValueError):
+            search_large_terms(data, FakeExecutor(), LargeTermsPlanner(inline_limit=2))
+
+    def test_merge_deduplicates_and_pages(self):
+        responses = [
+            {"hits": {"hits": [{"_id": "a", "sort": [1]}, {"_id": "c", "sort": [3]}]}},
+            {"hits": {"hits": [{"_id": "a", "sort": [1]}, {"_id": "b", "sort": [2]}]}},
+        ]
+        merged = merge_hit_responses(responses, [Sort("client_id")], from_=1, size=5)
+        self.assertEqual([hit["_id"] for hit in merged["hits"]["hits"]], ["b", "c"])
+        self.assertNotIn("total", merged["hits"])
+
+    def test_unsorted_merge_orders_by_score_then_id(self):
+        responses = [
+            {"hits": {"hits": [{"_id": "d", "_score": 1.0}, {"_id": "b", "_score": 2.0}]}},
+            {"hits": {"hits": [{"_id": "c", "_score": 2.0}, {"_id": "a", "_score": 1.0}]}},
+        ]
+        merged = merge_hit_responses(responses, size=3)
+        self.assertEqual([hit["_id"] for hit in merged["hits"]["hits"]], ["b", "c", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_child(code):
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_transform_only_import_skips_elasticsearch(self):
+        output = run_child(
+            "import sys, logging\n"
+            "from transformer import Transformer\n"
+            "Transformer('my_events').transform({'filters': [{'client_id': 1}]})\n"
+            "print('elasticsearch' in sys.modules, logging.getLogger().handlers == [])\n"
+        )
+        self.assertEqual(output.split(), ["False", "True"])
+
+    def test_executor_still_importable(self):
+        output = run_child("from transformer import QueryExecutor, transform\nprint(QueryExecutor.__name__, transform.__name__)")
+        self.assertEqual(output.split(), ["QueryExecutor", "transformer.transform"])
+
+    def test_aggregation_import_skips_elasticsearch(self):
+        # ✅ Cold-start time is measured by benchmarks/bench_import_time.py, not asserted here
+        output = run_child(
+            "import sys\n"
+            "from transformer import Transformer\n"
+            "Transformer('my_events').transform({'aggs': {'client_id': ['terms', 10]}})\n"
+            "print('elasticsearch' in sys.modules)\n"
+        )
+        self.assertEqual(output.split(), ["False"])
+
+    def test_unknown_attribute(self):
+        import transformer
+        with self.assertRaises(AttributeError):
+            transformer.DoesNotExist
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+import unittest
+
+from elasticsearch import ConnectionError
+from flask import Flask
+from routes import home_route
+from transformer.limiter import ConcurrencyLimiter, OverloadedError
+from transformer.query_executor import QueryExecutor
+
+
+class FakeElasticsearch:
+    def __init__(self, error=None):
+        self.error = error
+
+    def search(self, **kwargs):
+        if self.error:
+            raise self.error
+        return {"timed_out": False}
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+
+    def test_limit_grows_on_success_and_shrinks_on_overload(self):
+        limiter = ConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5)
+        for _ in range(10):
+            with limiter.slot():
+                pass
+        self.assertEqual(limiter.stats()["limit"], 10)
+        self.assertGreater(limiter.limit, 10.9)
+
+        with self.assertRaises(ConnectionError):
+            with limiter.slot():
+                raise ConnectionError("node gone")
+        self.assertEqual(limiter.stats()["limit"], 5)
+
+    def test_slow_searches_shrink_the_limit(self):
+        now = [0.0]
+        limiter = ConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5, clock=lambda: now[0])
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release("interactive", 0.1)
+        limiter.acquire()
+        limiter.release("interactive", 1.0)
+        self.assertEqual(limiter.stats()["limit"], 5)
+        limiter.acquire()
+        limiter.release("interactive", 1.0)
+        self.assertEqual(limiter.stats()["limit"], 5)  # ✅ Same latency window: no second decrease
+
+    def test_limit_stays_within_bounds(self):
+        limiter = ConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=3, backoff_ratio=0.1)
+        limiter.acquire()
+        limiter.release("interactive", 0, overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release("interactive", 0)
+        self.assertEqual(limiter.limit, 3)
+
+    def test_full_queue_fails_fast(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1, max_queue=0, retry_after=3)
+        limiter.acquire()
+        with self.assertRaises(OverloadedError) as raised:
+            limiter.acquire()
+        self.assertEqual((raised.exception.reason, raised.exception.retry_after), ("queue_full", 3))
+        self.assertEqual(limiter.stats()["rejected"]["interactive"]["queue_full"], 1)
+
+    def test_queue_timeout(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1, queue_timeout=0.05)
+        limiter.acquire()
+        with self.assertRaises(OverloadedError) as raised:
+            limiter.acquire()
+        self.assertEqual(raised.exception.reason, "queue_timeout")
+        self.assertEqual(limiter.stats()["queued"], {"interactive": 0, "batch": 0})
+
+    def test_interactive_searches_go_first(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1, batch_share=1.0)
+        limiter.acquire()
+        order = []
+
+        def search(priority):
+            with limiter.slot(priority):
+                order.append(priority)
+
+        batch = threading.Thread(target=search, args=("batch",))
+        batch.start()
+        while limiter.stats()["queued"]["batch"] == 0:
+            time.sleep(0.001)
+        interactive = threading.Thread(target=search, args=("interactive",))
+        interactive.start()
+        while limiter.stats()["queued"]["interactive"] == 0:
+            time.sleep(0.001)
+
+        limiter.release("interactive", 0)
+        batch.join()
+        interactive.join()
+        self.assertEqual(order, ["interactive", "batch"])
+
+    def test_batch_searches_leave_room_for_interactive(self):
+        limiter = ConcurrencyLimiter(initial_limit=4, batch_share=0.5)
+        limiter.acquire("batch")
+        limiter.acquire("batch")
+        with self.assertRaises(OverloadedError):
+            limiter.acquire("batch", timeout=0)
+        limiter.acquire("interactive", timeout=0)
+        self.assertEqual(limiter.stats()["in_flight"], {"interactive": 1, "batch": 2})
+
+    def test_executors_share_the_limiter(self):
+        limiter = ConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5)
+        healthy = QueryExecutor(client=FakeElasticsearch(), limiter=limiter, priority="batch")
+        failing = QueryExecutor(client=FakeElasticsearch(ConnectionError("overloaded")), limiter=limiter)
+        healthy.execute_query({"size": 0})
+        with self.assertRaises(ConnectionError):
+            failing.execute_query({"size": 0})
+        stats = limiter.stats()
+        self.assertEqual(stats["admitted"], {"interactive": 1, "batch": 1})
+        self.assertEqual(stats["limit"], 5)
+
+    def test_route_sheds_load_with_retry_after(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1, max_queue=0, retry_after=2)
+        app.extensions["search_limiter"] = limiter
+        limiter.acquire()
+        response = app.test_client().get("/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "2")
+        self.assertEqual(json.loads(app.test_client().get("/limiter").data)["rejected"]["interactive"]["queue_full"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from transformer.mappings import FieldMappings
+
+class TestFieldMappings(unittest.TestCase):
+
+    def setUp(self):
+        self.mappings = FieldMappings.load()
+
+    def test_field_types(self):
+        self.assertEqual(self.mappings.field_type("source_address"), "ip")
+        self.assertEqual(self.mappings.field_type("url.domain"), "keyword")
+        self.assertEqual(self.mappings.field_type("client_id.keyword"), "keyword")
+        self.assertIsNone(self.mappings.field_type("does.not.exist"))
+
+    def test_dynamic_false(self):
+        self.assertFalse(self.mappings.dynamic)
+
+    def test_accepts_unmapped_follows_innermost_dynamic_setting(self):
+        self.assertFalse(self.mappings.accepts_unmapped("analyst_notes.mood"))
+        mappings = FieldMappings({"labels": {"dynamic": True, "properties": {}}}, dynamic=False)
+        self.assertTrue(mappings.accepts_unmapped("labels.team"))
+        self.assertFalse(mappings.accepts_unmapped("team"))
+
+    def test_nested_path(self):
+        self.assertEqual(self.mappings.nested_path("analyst_notes.created_by"), "analyst_notes")
+        self.assertIsNone(self.mappings.nested_path("url.domain"))
+
+    def test_from_json_shapes(self):
+        body = {"properties": {"a": {"type": "keyword"}}}
+        for data in (body, {"mappings": body}, {"idx": {"mappings": body}}):
+            self.assertEqual(FieldMappings.from_json(data).field_type("a"), "keyword")
+
+
+if __name__ == "__main__":
+    unittest.main()
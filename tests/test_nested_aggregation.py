@@ -0,0 +1,128 @@
+import unittest
+from transformer.aggregation import (AvgAggregation, MaxAggregation, NestedAggregationGroup, TermsAggregation,
+                                     merge_nested_aggregations)
+from transformer.mappings import FieldMappings
+from transformer.transform import Transformer
+
+
+def evaluation_aggs(nested_filter=None):
+    return {
+        "avg_formula": AvgAggregation("analyst_notes.formula_id", name="avg_formula", nested_path="analyst_notes",
+                                      nested_filter=nested_filter),
+        "max_formula": MaxAggregation("analyst_notes.formula_id", name="max_formula", nested_path="analyst_notes",
+                                      nested_filter=nested_filter),
+        "client_id": TermsAggregation("client_id", name="client_id", size=5),
+    }
+
+
+class TestNestedAggregationMerge(unittest.TestCase):
+
+    def test_single_nested_aggregation_is_unchanged(self):
+        aggs = {"avg_formula": AvgAggregation("analyst_notes.formula_id", name="avg_formula", nested_path="analyst_notes")}
+        self.assertEqual(merge_nested_aggregations(aggs), aggs)
+
+    def test_siblings_share_one_nested_join(self):
+        merged = merge_nested_aggregations(evaluation_aggs())
+        self.assertEqual(list(merged), ["analyst_notes__nested", "client_id"])
+        self.assertEqual(
+            merged["analyst_notes__nested"].to_elasticsearch(),
+            {
+                "analyst_notes__nested": {
+                    "nested": {"path": "analyst_notes"},
+                    "aggs": {
+                        "avg_formula": {"avg": {"field": "analyst_notes.formula_id"}},
+                        "max_formula": {"max": {"field": "analyst_notes.formula_id"}}
+                    }
+                }
+            }
+        )
+
+    def test_input_aggregations_are_not_modified(self):
+        aggs = evaluation_aggs()
+        merge_nested_aggregations(aggs)
+        self.assertEqual(aggs["avg_formula"].nested_path, "analyst_notes")
+
+    def test_different_filters_are_not_merged(self):
+        aggs = evaluation_aggs()
+        aggs["max_formula"].nested_filter = {"term": {"analyst_notes.deleted": False}}
+        merged = merge_nested_aggregations(aggs)
+        self.assertEqual(set(merged), {"avg_formula", "max_formula", "client_id"})
+
+    def test_shared_filter_becomes_one_filter_aggregation(self):
+        merged = merge_nested_aggregations(evaluation_aggs({"term": {"analyst_notes.deleted": False}}))
+        group = merged["analyst_notes__nested"]
+        self.assertIsInstance(group, NestedAggregationGroup)
+        body = group.to_elasticsearch()["analyst_notes__nested"]
+        self.assertEqual(body["aggs"]["analyst_notes__nested_filter"]["filter"], {"term": {"analyst_notes.deleted": False}})
+
+    def test_response_is_reshaped_to_original_names(self):
+        transformer = Transformer("my_events")
+        request = transformer.compile({"aggs": evaluation_aggs()})
+        response = {
+            "aggregations": {
+                "analyst_notes__nested": {"doc_count": 9, "avg_formula": {"value": 1.5}, "max_formula": {"value": 3.0}},
+                "client_id": {"buckets": []}
+            }
+        }
+        request.reshape_response(response)
+        self.assertEqual(
+            response["aggregations"],
+            {
+                "avg_formula": {"doc_count": 9, "avg_formula": {"value": 1.5}},
+                "max_formula": {"doc_count": 9, "max_formula": {"value": 3.0}},
+                "client_id": {"buckets": []}
+            }
+        )
+
+    def test_fused_metrics_answer_the_join_and_reshape_the_same(self):
+        request = Transformer("my_events", fuse_metrics=True).compile({"aggs": evaluation_aggs()})
+        body = request.body()["aggs"]
+        self.assertEqual(list(body), ["analyst_notes.formula_id__stats", "client_id"])
+        self.assertEqual(body["analyst_notes.formula_id__stats"]["nested"], {"path": "analyst_notes"})
+        stats = {"count": 9, "min": 1.0, "max": 3.0, "avg": 1.5, "sum": 13.5}
+        response = {
+            "aggregations": {
+                "analyst_notes.formula_id__stats": {"doc_count": 9, "analyst_notes.formula_id__stats": stats},
+                "client_id": {"buckets": []}
+            }
+        }
+        request.reshape_response(response)
+        self.assertEqual(
+            response["aggregations"],
+            {
+                "avg_formula": {"doc_count": 9, "avg_formula": {"value": 1.5}},
+                "max_formula": {"doc_count": 9, "max_formula": {"value": 3.0}},
+                "client_id": {"buckets": []}
+            }
+        )
+
+
+class TestNestedPathsFromMappings(unittest.TestCase):
+
+    def setUp(self):
+        self.transformer = Transformer("my_events", mappings=FieldMappings.load())
+
+    def test_terms_on_nested_field_steps_back_with_reverse_nested(self):
+        body = self.transformer.transform(
+            {"aggs": {"analyst_notes.created_by": {"size": 5, "aggs": {"client_id": ["terms", 3], "url.domain": ["terms", 2]}}}}
+        )
+        nested = body["aggs"]["analyst_notes.created_by"]
+        self.assertEqual(nested["nested"], {"path": "analyst_notes"})
+        parent = nested["aggs"]["analyst_notes.created_by"]["aggs"]["root__reverse_nested"]
+        self.assertEqual(parent["reverse_nested"], {})
+        self.assertEqual(set(parent["aggs"]), {"client_id", "url.domain"})
+
+    def test_reverse_nested_response_is_reshaped(self):
+        request = self.transformer.compile(
+            {"aggs": {"analyst_notes.created_by": {"aggs": {"client_id": ["terms", 3], "url.domain": ["terms", 2]}}}}
+        )
+        bucket = {"key": "bob", "doc_count": 4,
+                  "root__reverse_nested": {"doc_count": 2, "client_id": {"buckets": []}, "url.domain": {"buckets": []}}}
+        response = {"aggregations": {"analyst_notes.created_by": {"doc_count": 4, "analyst_notes.created_by": {"buckets": [bucket]}}}}
+        request.reshape_response(response)
+        self.assertEqual(bucket["client_id"], {"doc_count": 2, "client_id": {"buckets": []}})
+        self.assertNotIn("root__reverse_nested", bucket)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from transformer.filter import BoolFilter, NestedFilter, TermFilter, filter_from_json
+from transformer.mappings import FieldMappings
+from transformer.nested import NestedGrouper
+from transformer.nodes import freeze
+from transformer.query_executor import QueryExecutor
+from transformer.transform import Transformer
+
+
+def apply_filter_path(value, paths):
+    """Keeps only the parts of a response the dotted `filter_path` entries select, like the cluster does."""
+    if isinstance(value, list):
+        return [apply_filter_path(item, paths) for item in value]
+    kept = {}
+    for key, child in value.items():
+        if key in paths:
+            kept[key] = child
+            continue
+        nested = [path[len(key) + 1:] for path in paths if path.startswith(f"{key}.")]
+        if nested and isinstance(child, (dict, list)):
+            kept[key] = apply_filter_path(child, nested)
+    return kept
+
+
+class FilteringElasticsearch:
+    def __init__(self, response):
+        self.response = response
+
+    def search(self, index, body, filter_path=None, **kwargs):
+        return apply_filter_path(self.response, filter_path) if filter_path else self.response
+
+
+class TestNestedFilter(unittest.TestCase):
+
+    def test_to_elasticsearch(self):
+        nested_filter = NestedFilter("analyst_notes", TermFilter("analyst_notes.action", "close"), inner_hits={})
+        self.assertEqual(
+            nested_filter.to_elasticsearch(),
+            {"nested": {"path": "analyst_notes", "query": {"term": {"analyst_notes.action": "close"}}, "inner_hits": {}}}
+        )
+
+    def test_json_round_trip(self):
+        nested_filter = NestedFilter("analyst_notes", BoolFilter(must=[TermFilter("analyst_notes.action", "close")]),
+                                     score_mode="max")
+        restored = filter_from_json(nested_filter.to_json())
+        self.assertIsInstance(restored, NestedFilter)
+        self.assertEqual(restored.to_elasticsearch(), nested_filter.to_elasticsearch())
+
+    def test_equal_nested_filters_intern_to_one_node(self):
+        first = freeze(NestedFilter("analyst_notes", TermFilter("analyst_notes.action", "close")))
+        second = freeze(NestedFilter("analyst_notes", TermFilter("analyst_notes.action", "close")))
+        self.assertIs(first, second)
+
+
+class TestNestedGrouper(unittest.TestCase):
+
+    def setUp(self):
+        self.grouper = NestedGrouper(FieldMappings.load())
+
+    def test_and_clauses_on_one_path_share_a_nested_query(self):
+        grouped = self.grouper.group_filters([
+            TermFilter("analyst_notes.action", "close"),
+            TermFilter("event.provider", "pfm"),
+            TermFilter("analyst_notes.created_by", "bob"),
+        ])
+        self.assertEqual(len(grouped), 2)
+        self.assertEqual(
+            grouped[0].to_elasticsearch(),
+            {
+                "nested": {
+                    "path": "analyst_notes",
+                    "query": {"bool": {"must": [{"term": {"analyst_notes.action": "close"}},
+                                                {"term": {"analyst_notes.created_by": "bob"}}]}}
+                }
+            }
+        )
+
+    def test_must_not_clauses_exclude_any_matching_object(self):
+        grouped = self.grouper.group_filter(BoolFilter(must_not=[
+            TermFilter("analyst_notes.action", "close"),
+            TermFilter("analyst_notes.deleted", True),
+        ]))
+        self.assertEqual(len(grouped.must_not), 1)
+        self.assertEqual(grouped.must_not[0].query.should[1].field, "analyst_notes.deleted")
+        self.assertIsNone(grouped.must_not[0].inner_hits)
+
+    def test_should_with_minimum_above_one_is_not_merged(self):
+        grouped = self.grouper.group_filter(BoolFilter(should=[
+            TermFilter("analyst_notes.action", "close"),
+            TermFilter("analyst_notes.created_by", "bob"),
+        ], minimum_should_match=2))
+        self.assertEqual([clause.path for clause in grouped.should], ["analyst_notes", "analyst_notes"])
+
+    def test_inner_hits_names_are_unique(self):
+        grouper = NestedGrouper(FieldMappings.load(), inner_hits=True)
+        grouped = grouper.group_filters([
+            TermFilter("analyst_notes.action", "close"),
+            BoolFilter(should=[TermFilter("analyst_notes.created_by", "bob"), TermFilter("event.provider", "pfm")]),
+        ])
+        self.assertEqual(grouped[0].inner_hits, {})
+        self.assertEqual(grouped[1].should[0].inner_hits, {"name": "analyst_notes_1"})
+
+    def test_named_inner_hits_are_unique(self):
+        grouper = NestedGrouper(FieldMappings.load(), inner_hits={"name": "matches", "size": 3})
+        grouped = grouper.group_filters([
+            TermFilter("analyst_notes.action", "close"),
+            TermFilter("analyst_evaluation.action_correct", True),
+        ])
+        self.assertEqual([clause.inner_hits for clause in grouped],
+                         [{"name": "matches", "size": 3}, {"name": "matches_1", "size": 3}])
+
+    def test_transformer_groups_with_mappings(self):
+        transformer = Transformer("my_events", mappings=FieldMappings.load())
+        body = transformer.transform({"filters": [{"analyst_evaluation.action_correct": True}], "inner_hits": {"size": 3}})
+        self.assertEqual(
+            body["query"]["bool"]["must"],
+            [{"nested": {"path": "analyst_evaluation", "query": {"term": {"analyst_evaluation.action_correct": True}},
+                         "inner_hits": {"size": 3}}}]
+        )
+
+    def test_inner_hits_reach_the_caller(self):
+        transformer = Transformer("my_events", mappings=FieldMappings.load())
+        body = transformer.transform({"filters": [{"analyst_notes.action": "close"}], "inner_hits": {}})
+        inner_hits = {"analyst_notes": {"hits": {"hits": [{"_source": {"action": "close"}}]}}}
+        hit = {"_index": "events", "_id": "1", "_score": 1.0, "_source": {}, "inner_hits": inner_hits, "_ignored": []}
+        client = FilteringElasticsearch({"took": 3, "_shards": {"failed": 0}, "hits": {"hits": [hit]}})
+        response = QueryExecutor(client=client).execute_query(body)
+        self.assertEqual(response["hits"]["hits"][0]["inner_hits"], inner_hits)
+        self.assertNotIn("_ignored", response["hits"]["hits"][0])
+
+    def test_inner_hits_without_mappings_are_rejected(self):
+        with self.assertRaises(ValueError):
+            Transformer("my_events").transform({"filters": [{"analyst_notes.action": "close"}], "inner_hits": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
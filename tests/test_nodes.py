@@ -0,0 +1,94 @@
+import unittest
+from transformer.aggregation import TermsAggregation
+from transformer.filter import BoolFilter, MatchFilter, RangeFilter, TermFilter
+from transformer.nodes import FrozenNode, NodeInterner, freeze
+from transformer.sort import Sort
+
+
+class TestFrozenNode(unittest.TestCase):
+
+    def setUp(self):
+        self.interner = NodeInterner()
+
+    def test_structural_equality_and_hash(self):
+        a = freeze(TermFilter("client_id", 1), interner=None)
+        b = freeze(TermFilter("client_id", 1), interner=None)
+        c = freeze(TermFilter("client_id", 2), interner=None)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, c)
+        self.assertEqual(len({a, b, c}), 2)
+
+    def test_interning_shares_subtrees(self):
+        tree_a = BoolFilter(must=[TermFilter("client_id", 1), RangeFilter("action_count", gt=5)])
+        tree_b = BoolFilter(must=[TermFilter("client_id", 1), RangeFilter("action_count", gt=5)])
+        self.assertIs(freeze(tree_a, self.interner), freeze(tree_b, self.interner))
+        self.assertEqual(self.interner.hits, 3)
+
+    def test_immutable(self):
+        node = freeze(TermFilter("client_id", 1), self.interner)
+        with self.assertRaises(AttributeError):
+            node.value = 2
+
+    def test_attribute_reads(self):
+        leaf = freeze(TermFilter("client_id", 1), self.interner)
+        self.assertEqual(leaf.field, "client_id")
+        bool_node = freeze(BoolFilter(should=[MatchFilter("note", "x")], minimum_should_match=1), self.interner)
+        self.assertEqual(bool_node.should, [freeze(MatchFilter("note", "x"), self.interner)])
+
+    def test_output_matches_and_is_memoized(self):
+        tree = BoolFilter(
+            must=[TermFilter("client_id", 1)],
+            should=[MatchFilter("note", "a"), MatchFilter("note", "b")],
+            minimum_should_match=1
+        )
+        node = freeze(tree, self.interner)
+        self.assertEqual(node.to_elasticsearch(), tree.to_elasticsearch())
+        self.assertEqual(node.to_json(), tree.to_json())
+        self.assertIs(node.to_json_bytes(), node.to_json_bytes())
+
+    def test_callers_get_their_own_copy(self):
+        node = freeze(BoolFilter(must=[TermFilter("client_id", 1)]), self.interner)
+        node.to_elasticsearch()["bool"]["must"].append({"match_all": {}})
+        node.to_json()["must"].clear()
+        self.assertEqual(node.to_elasticsearch(), {"bool": {"must": [{"term": {"client_id": 1}}]}})
+        self.assertEqual(len(node.to_json()["must"]), 1)
+
+    def test_nodes_do_not_share_state_with_their_source(self):
+        leaf = TermFilter("client_id", 1)
+        node = freeze(leaf, self.interner)
+        leaf.value = 2
+        self.assertEqual(node.to_elasticsearch(), {"term": {"client_id": 1}})
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_value_types_are_part_of_the_key(self):
+        nodes = {freeze(TermFilter("flag", value), self.interner) for value in (1, True, 1.0)}
+        self.assertEqual(len(nodes), 3)
+        self.assertEqual(sorted(repr(node.to_elasticsearch()) for node in nodes),
+                         ["{'term': {'flag': 1.0}}", "{'term': {'flag': 1}}", "{'term': {'flag': True}}"])
+
+    def test_sort_and_aggregation(self):
+        sort_node = freeze(Sort("@timestamp", order="desc"), self.interner)
+        self.assertEqual(sort_node.to_elasticsearch(), {"@timestamp": {"order": "desc"}})
+        agg = TermsAggregation(field="client_id", size=5, aggs={"url.domain": ["terms", 3]})
+        agg_node = freeze(agg, self.interner)
+        self.assertEqual(agg_node.to_elasticsearch(), agg.to_elasticsearch())
+        # ✅ Sub-aggregations take part in the structural key
+        other = freeze(TermsAggregation(field="client_id", size=5, aggs={"url.domain": ["terms", 4]}), self.interner)
+        self.assertNotEqual(agg_node, other)
+        self.assertEqual(agg_node.reshape_response({"client_id": {"buckets": []}}), ["client_id"])
+
+    def test_frozen_nodes_pass_through(self):
+        node = freeze(TermFilter("client_id", 1), self.interner)
+        self.assertIs(freeze(node, self.interner), node)
+        self.assertIsInstance(node, FrozenNode)
+
+    def test_interner_evicts_least_recently_used(self):
+        interner = NodeInterner(maxsize=2)
+        for value in range(3):
+            freeze(TermFilter("client_id", value), interner)
+        self.assertEqual(len(interner), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+from flask import Flask
+from routes import home_route
+from transformer.panel_store import PanelScheduler, PanelStore, StalePanelError
+from transformer.transform import Transformer
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.queries = []
+
+    def execute_query(self, query):
+        self.queries.append(query)
+        return {"aggregations": {"client_id": {"buckets": [{"key": 1, "doc_count": len(self.queries)}]}}}
+
+
+class FailingExecutor(FakeExecutor):
+    def execute_query(self, query):
+        self.queries.append(query)
+        raise ConnectionError("cluster unavailable")
+
+
+class TestPanelStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.executor = FakeExecutor()
+        self.store = PanelStore(clock=self.clock)
+        self.scheduler = PanelScheduler(Transformer("my_events"), self.executor, self.store, default_interval=60)
+        self.scheduler.register("clients", {"aggs": {"client_id": ["terms", 10]}})
+
+    def test_versions_increase(self):
+        self.assertEqual(self.store.put("a", {}).version, 1)
+        self.assertEqual(self.store.put("a", {}).version, 2)
+
+    def test_refresh_due_only_runs_stale_panels(self):
+        self.scheduler.refresh_due()
+        self.scheduler.refresh_due()
+        self.assertEqual(len(self.executor.queries), 1)
+
+        self.clock.now += 61
+        self.scheduler.refresh_due()
+        self.assertEqual(len(self.executor.queries), 2)
+        self.assertEqual(self.scheduler.serve("clients").version, 2)
+
+    def test_failing_panels_back_off(self):
+        executor = FailingExecutor()
+        scheduler = PanelScheduler(Transformer("my_events"), executor, self.store, default_interval=60, retry_backoff=5)
+        scheduler.register("clients", {"aggs": {"client_id": ["terms", 10]}})
+        attempts = []
+        with self.assertLogs("transformer.panel_store", "ERROR"):
+            for _ in range(40):
+                scheduler.refresh_due()
+                attempts.append(len(executor.queries))
+                self.clock.now += 1
+        self.assertEqual(sorted(set(attempts)), [1, 2, 3, 4])  # ✅ Retried after 5, 10 and 20 seconds
+        self.assertEqual(attempts.index(4), 35)
+
+        scheduler.executor = self.executor
+        self.clock.now += 60
+        scheduler.refresh_due()
+        self.assertEqual(scheduler.panels["clients"]["failures"], 0)
+
+    def test_scheduler_starts_on_the_first_request(self):
+        app = Flask(__name__)
+        app.register_blueprint(home_route)
+        app.extensions["panel_scheduler"] = self.scheduler
+        app.test_client().get("/limiter")
+        try:
+            self.assertTrue(self.scheduler._thread.is_alive())
+        finally:
+            self.scheduler.stop(timeout=5)
+
+    def test_serve_respects_staleness_bound(self):
+        with self.assertRaises(StalePanelError):
+            self.scheduler.serve("clients")
+
+        self.scheduler.refresh("clients")
+        self.clock.now += 119
+        self.assertEqual(self.scheduler.serve("clients").version, 1)
+
+        self.clock.now += 2
+        with self.assertRaises(StalePanelError):
+            self.scheduler.serve("clients")
+
+    def test_serving_never_executes(self):
+        self.scheduler.refresh("clients")
+        for _ in range(10):
+            self.scheduler.serve("clients")
+        self.assertEqual(len(self.executor.queries), 1)
+
+    def test_unknown_panel(self):
+        with self.assertRaises(KeyError):
+            self.scheduler.serve("missing")
+
+    def test_on_disk_store_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            PanelStore(directory, clock=self.clock).put("clients", {"hits": {}})
+            reloaded = PanelStore(directory, clock=self.clock)
+            entry = reloaded.get("clients")
+            self.assertEqual(entry.version, 1)
+            self.assertEqual(entry.result, {"hits": {}})
+            self.assertEqual(reloaded.put("clients", {}).version, 2)
+
+    def test_workers_share_an_on_disk_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = PanelStore(directory, clock=self.clock), PanelStore(directory, clock=self.clock)
+            first.put("clients", {"n": 1})
+            self.assertEqual(second.get("clients").result, {"n": 1})
+            self.assertEqual(second.put("clients", {"n": 2}).version, 2)
+            entry = first.get("clients")
+            self.assertEqual((entry.version, entry.result), (2, {"n": 2}))
+            self.assertEqual(first.put("clients", {"n": 3}).version, 3)
+            self.assertEqual([f for f in os.listdir(directory) if f.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from transformer.filter import BoolFilter, PrefixFilter, TermFilter, WildcardFilter
+from transformer.mappings import FieldMappings
+from transformer.patterns import PatternPolicyError, PatternRewriter, analyze_pattern
+from transformer.transform import Transformer
+
+
+class TestAnalyzePattern(unittest.TestCase):
+
+    def test_shapes(self):
+        self.assertEqual(analyze_pattern("security"), ("exact", "security"))
+        self.assertEqual(analyze_pattern("security*"), ("prefix", "security"))
+        self.assertEqual(analyze_pattern("security**"), ("prefix", "security"))
+        self.assertEqual(analyze_pattern("*.log"), ("leading", None))
+        self.assertEqual(analyze_pattern("?ecurity"), ("leading", None))
+        self.assertEqual(analyze_pattern("sec*rity"), ("wildcard", None))
+        self.assertEqual(analyze_pattern("securit?"), ("wildcard", None))
+
+    def test_escaped_wildcards_are_literal(self):
+        self.assertEqual(analyze_pattern(r"a\*b"), ("exact", "a*b"))
+        self.assertEqual(analyze_pattern(r"a\*b*"), ("prefix", "a*b"))
+
+
+class TestPatternRewriter(unittest.TestCase):
+
+    def setUp(self):
+        self.mappings = FieldMappings.load()
+        self.rewriter = PatternRewriter(self.mappings)
+
+    def test_trailing_wildcard_becomes_prefix(self):
+        rewritten = self.rewriter.rewrite_filter(WildcardFilter("event.provider", "security*", case_insensitive=True))
+        self.assertIsInstance(rewritten, PrefixFilter)
+        self.assertEqual(
+            rewritten.to_elasticsearch(),
+            {"prefix": {"event.provider": {"value": "security", "case_insensitive": True}}}
+        )
+
+    def test_configured_rewrite_applies_to_high_cardinality_fields(self):
+        rewriter = PatternRewriter(self.mappings, rewrite="constant_score")
+        self.assertEqual(rewriter.rewrite_filter(WildcardFilter("event.provider", "sec*")).rewrite, "constant_score")
+        self.assertIsNone(rewriter.rewrite_filter(WildcardFilter("filename", "sec*")).rewrite)
+
+    def test_boost_is_kept_when_rewritten(self):
+        wildcard = WildcardFilter("event.provider", "security*", boost=2.0)
+        rewritten = self.rewriter.rewrite_filter(wildcard)
+        self.assertEqual(rewritten.to_elasticsearch()["bool"]["boost"], wildcard.to_elasticsearch()["bool"]["boost"])
+
+    def test_exact_pattern_becomes_term(self):
+        rewritten = self.rewriter.rewrite_filter(WildcardFilter("event.provider", "pfm"))
+        self.assertIsInstance(rewritten, TermFilter)
+        self.assertEqual(rewritten.to_elasticsearch(), {"term": {"event.provider": "pfm"}})
+
+    def test_explicit_rewrite_is_kept(self):
+        rewritten = self.rewriter.rewrite_filter(WildcardFilter("url.domain", "a*b", rewrite="top_terms_10"))
+        self.assertEqual(rewritten.rewrite, "top_terms_10")
+
+    def test_leading_wildcard_on_wildcard_field_is_kept(self):
+        rewritten = self.rewriter.rewrite_filter(WildcardFilter("url.path", "*/login"))
+        self.assertEqual(rewritten.to_elasticsearch(), {"wildcard": {"url.path": {"value": "*/login"}}})
+
+    def test_leading_wildcard_is_routed_to_wildcard_multi_field(self):
+        mappings = FieldMappings({"url": {"type": "keyword", "fields": {"pattern": {"type": "wildcard"}}}})
+        rewritten = PatternRewriter(mappings).rewrite_filter(WildcardFilter("url", "*evil*"))
+        self.assertEqual(rewritten.field, "url.pattern")
+
+    def test_leading_wildcard_on_keyword_is_rejected(self):
+        with self.assertRaises(PatternPolicyError):
+            self.rewriter.rewrite_filter(BoolFilter(should=[WildcardFilter("url.domain", "*.example.com")]))
+
+    def test_leading_wildcard_allowed_by_policy(self):
+        rewriter = PatternRewriter(self.mappings, leading_wildcard="allow")
+        rewritten = rewriter.rewrite_filter(WildcardFilter("url.domain", "*.example.com"))
+        self.assertEqual(rewritten.to_elasticsearch(), {"wildcard": {"url.domain": {"value": "*.example.com"}}})
+
+    def test_unmapped_fields_are_left_alone(self):
+        rewritten = self.rewriter.rewrite_filter(WildcardFilter("filename", "*.log"))
+        self.assertEqual(rewritten.to_elasticsearch(), {"wildcard": {"filename": {"value": "*.log"}}})
+
+    def test_transformer_rewrites_request_model(self):
+        transformer = Transformer("my_events", mappings=self.mappings)
+        body = transformer.transform({"filters": [{"event.provider": {"wildcard": "security*"}}]})
+        self.assertEqual(
+            body["query"]["bool"]["must"],
+            [{"prefix": {"event.provider": {"value": "security"}}}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
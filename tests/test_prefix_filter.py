@@ -0,0 +1,31 @@
+import unittest
+from transformer.filter import PrefixFilter
+
+
+class TestPrefixFilter(unittest.TestCase):
+
+    def test_prefix_basic(self):
+        prefix_filter = PrefixFilter("event.provider", "security")
+        self.assertEqual(prefix_filter.to_elasticsearch(), {"prefix": {"event.provider": {"value": "security"}}})
+
+    def test_prefix_with_options(self):
+        prefix_filter = PrefixFilter("event.provider", "sec", boost=2.0, case_insensitive=True, rewrite="constant_score")
+        expected_query = {
+            "bool": {
+                "should": [{"prefix": {"event.provider": {"value": "sec", "case_insensitive": True,
+                                                          "rewrite": "constant_score"}}}],
+                "minimum_should_match": 1,
+                "boost": 2.0
+            }
+        }
+        self.assertEqual(prefix_filter.to_elasticsearch(), expected_query)
+
+    def test_json_round_trip(self):
+        prefix_filter = PrefixFilter("event.provider", "sec", rewrite="constant_score")
+        self.assertEqual(prefix_filter.to_json(), {"type": "prefix", "field": "event.provider", "value": "sec",
+                                                   "rewrite": "constant_score"})
+        self.assertEqual(PrefixFilter.from_json(prefix_filter.to_json()).to_json(), prefix_filter.to_json())
+
+
+if __name__ == "__main__":
+    unittest.main()
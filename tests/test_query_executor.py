@@ -0,0 +1,79 @@
+import unittest
+from transformer.query_executor import QueryExecutor, filter_path_for_query
+
+
+class FakeElasticsearch:
+    """Records search calls instead of sending them to a cluster."""
+
+    def __init__(self, response=None):
+        self.response = response or {}
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.response
+
+
+class TestQueryExecutor(unittest.TestCase):
+
+    def test_filter_path_for_hits_query(self):
+        filter_path = filter_path_for_query({"query": {"match_all": {}}})
+        self.assertIn("hits.hits._source", filter_path)
+        self.assertIn("hits.total", filter_path)
+        self.assertNotIn("aggregations", filter_path)
+
+    def test_filter_path_for_aggregation_query(self):
+        filter_path = filter_path_for_query({"size": 0, "aggs": {"client_id": {}}, "track_total_hits": False})
+        self.assertEqual(filter_path, ["timed_out", "_shards.failed", "_shards.failures", "aggregations"])
+
+    def test_hit_paths_follow_the_body(self):
+        filter_path = filter_path_for_query({"query": {"match_all": {}}, "sort": [{"@timestamp": "desc"}], "_source": False})
+        self.assertIn("hits.hits._index", filter_path)
+        self.assertIn("hits.hits.sort", filter_path)
+        self.assertNotIn("hits.hits._source", filter_path)
+        self.assertNotIn("hits.hits._score", filter_path)
+        self.assertNotIn("hits.hits.highlight", filter_path)
+        filter_path = filter_path_for_query({
+            "query": {"nested": {"path": "analyst_notes", "query": {"match_all": {}}, "inner_hits": {}}},
+            "highlight": {"fields": {"note": {}}}, "fields": ["url.domain"],
+        })
+        for path in ("hits.hits._score", "hits.hits.highlight", "hits.hits.inner_hits", "hits.hits.fields"):
+            self.assertIn(path, filter_path)
+        self.assertIn("hits.hits._score", filter_path_for_query({"sort": ["_score"]}))
+
+    def test_execute_query_applies_filter_path(self):
+        client = FakeElasticsearch()
+        executor = QueryExecutor(index_name="events", client=client)
+        executor.execute_query({"size": 0, "aggs": {"client_id": {}}})
+        self.assertEqual(client.calls[0]["index"], "events")
+        self.assertEqual(client.calls[0]["filter_path"],
+                         ["timed_out", "_shards.failed", "_shards.failures", "hits.total", "aggregations"])
+
+    def test_execute_query_untrimmed(self):
+        client = FakeElasticsearch()
+        executor = QueryExecutor(client=client, trim_response=False)
+        executor.execute_query({"query": {"match_all": {}}})
+        self.assertNotIn("filter_path", client.calls[0])
+
+    def test_request_cache_for_aggregation_only_searches(self):
+        client = FakeElasticsearch()
+        executor = QueryExecutor(client=client)
+        executor.execute_query({"size": 0, "aggs": {"client_id": {}}})
+        executor.execute_query({"query": {"match_all": {}}, "aggs": {"client_id": {}}})
+        self.assertTrue(client.calls[0]["request_cache"])
+        self.assertNotIn("request_cache", client.calls[1])
+
+    def test_request_cache_can_be_disabled(self):
+        client = FakeElasticsearch()
+        QueryExecutor(client=client, request_cache=False).execute_query({"size": 0, "aggs": {"client_id": {}}})
+        self.assertNotIn("request_cache", client.calls[0])
+
+    def test_explicit_filter_path_wins(self):
+        client = FakeElasticsearch()
+        executor = QueryExecutor(client=client)
+        executor.execute_query({"query": {"match_all": {}}}, filter_path=["hits.hits._id"])
+        self.assertEqual(client.calls[0]["filter_path"], ["hits.hits._id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from elasticsearch import ApiError, ConnectionTimeout
+from transformer.query_executor import QueryExecutor
+from transformer.resilience import AdaptiveTimeout, HedgePolicy, LatencyTracker, RetryPolicy
+
+RESPONSE = {"timed_out": False, "hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}}
+
+
+class MockElasticsearch(ThreadingHTTPServer):
+    """
+    Local HTTP server answering `_search` like Elasticsearch. Each request takes the next `(delay, status)`
+    from `script`, where the delay is seconds or an Event to wait for; once it is exhausted, requests answer
+    200 immediately. Responses carry the request's number (from 1) as `took`, so tests can tell who answered.
+    """
+    daemon_threads = True
+
+    def __init__(self, script=()):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.script = list(script)
+        self.requests = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_step(self):
+        with self.lock:
+            self.requests += 1
+            return self.requests, *(self.script.pop(0) if self.script else (0, 200))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        number, delay, status = self.server.next_step()
+        if isinstance(delay, threading.Event):
+            delay.wait(5)
+        else:
+            time.sleep(delay)
+        response = {**RESPONSE, "took": number} if status == 200 else {"error": "unavailable", "status": status}
+        body = json.dumps(response).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("X-Elastic-Product", "Elasticsearch")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # ✅ The client gave up on this request
+
+    def log_message(self, *args):
+        pass
+
+
+def no_sleep(seconds):
+    pass
+
+
+class TestResilience(unittest.TestCase):
+
+    def serve(self, script=()):
+        server = MockElasticsearch(script)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_per_request_timeout(self):
+        server = self.serve([(self.stalled(), 200)])
+        executor = QueryExecutor(es_host=server.url, trim_response=False, request_timeout=5)
+        with self.assertRaises(ConnectionTimeout):
+            executor.execute_query({"size": 0}, timeout=0.1)
+        self.assertEqual(executor.metrics.timeouts, 1)
+
+    def test_retry_on_unavailable_node(self):
+        server = self.serve([(0, 503), (0, 502)])
+        executor = QueryExecutor(es_host=server.url, retry=RetryPolicy(max_retries=2, sleep=no_sleep))
+        self.assertFalse(executor.execute_query({"size": 0})["timed_out"])
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(executor.metrics.retries, 2)
+
+    def test_retries_are_bounded_and_skip_client_errors(self):
+        server = self.serve([(0, 503), (0, 503), (0, 400)])
+        executor = QueryExecutor(es_host=server.url, retry=RetryPolicy(max_retries=1, sleep=no_sleep))
+        with self.assertRaises(ApiError):
+            executor.execute_query({"size": 0})
+        self.assertEqual(server.requests, 2)
+
+        executor = QueryExecutor(es_host=server.url, retry=RetryPolicy(max_retries=3, sleep=no_sleep))
+        with self.assertRaises(ApiError):
+            executor.execute_query({"size": 0})  # ✅ A bad request fails the same way on every node
+        self.assertEqual(server.requests, 3)
+
+    def test_retry_after_timeout(self):
+        server = self.serve([(self.stalled(), 200)])
+        executor = QueryExecutor(es_host=server.url, trim_response=False, request_timeout=0.1,
+                                 retry=RetryPolicy(max_retries=1, sleep=no_sleep))
+        self.assertEqual(executor.execute_query({"size": 0})["took"], 2)  # ✅ The retry answered
+        self.assertEqual(executor.metrics.to_json()["retries"], 1)
+
+    def test_jittered_backoff(self):
+        policy = RetryPolicy(backoff=0.1, max_backoff=0.3, random=lambda: 0.5)
+        self.assertEqual([policy.delay(attempt) for attempt in range(4)], [0.05, 0.1, 0.15, 0.15])
+
+    def stalled(self):
+        """An Event the server waits on before answering; released when the test ends."""
+        event = threading.Event()
+        self.addCleanup(event.set)
+        return event
+
+    def test_hedge_wins_over_slow_request(self):
+        server = self.serve([(self.stalled(), 200)])  # ✅ The first request only answers once the test is over
+        executor = QueryExecutor(es_host=server.url, trim_response=False, hedging=HedgePolicy(initial_delay=0.05))
+        self.assertEqual(executor.execute_query({"size": 0})["took"], 2)  # ✅ The hedge answered
+        self.assertEqual(server.requests, 2)
+        self.assertEqual((executor.metrics.hedges_fired, executor.metrics.hedges_won), (1, 1))
+
+    def test_fast_request_is_not_hedged(self):
+        server = self.serve()
+        executor = QueryExecutor(es_host=server.url, trim_response=False, hedging=HedgePolicy(initial_delay=0.5))
+        self.assertEqual(executor.execute_query({"size": 0})["took"], 1)
+        self.assertEqual(server.requests, 1)
+        self.assertEqual((executor.metrics.hedges_fired, executor.metrics.hedges_won), (0, 0))
+
+    def test_hedge_delay_follows_latency_percentile(self):
+        latencies = LatencyTracker()
+        policy = HedgePolicy(percentile=95, initial_delay=1.0, min_samples=20)
+        self.assertEqual(policy.delay(latencies), 1.0)
+        for ms in range(1, 101):
+            latencies.record(ms / 1000)
+        self.assertEqual(policy.delay(latencies), 0.095)
+        self.assertEqual(AdaptiveTimeout(multiplier=10, percentile=99, min_timeout=0.5).timeout(latencies), 0.99)
+
+
+if __name__ == "__main__":
+    unittest.main()
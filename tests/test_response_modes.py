@@ -0,0 +1,81 @@
+import json
+import unittest
+from transformer.ir import compile_request
+from transformer.query_executor import filter_path_for_query, is_cacheable_query
+from transformer.transform import Transformer
+from validator import RequestValidator
+
+FILTERS = [{"client_id": 987654321}]
+AGGS = {"client_id": {"terms": {"field": "client_id"}}}
+
+
+class TestResponseModes(unittest.TestCase):
+
+    def setUp(self):
+        self.transformer = Transformer("my_events")
+
+    def test_aggregations_with_filters_skip_hits(self):
+        body = self.transformer.transform({"filters": FILTERS, "aggs": AGGS})
+        self.assertEqual(body["size"], 0)
+        self.assertIn("query", body)
+        self.assertIn("aggs", body)
+        self.assertIs(body["track_total_hits"], False)
+
+    def test_aggregations_keep_an_explicit_total(self):
+        body = self.transformer.transform({"filters": FILTERS, "aggs": AGGS, "track_total_hits": 1000})
+        self.assertEqual(body["track_total_hits"], 1000)
+
+    def test_requested_size_is_honored(self):
+        body = self.transformer.transform({"filters": FILTERS, "aggs": AGGS, "size": 5})
+        self.assertEqual(body["size"], 5)
+        self.assertEqual(self.transformer.transform({"filters": FILTERS})["size"], 20)
+        self.assertEqual(self.transformer.build_elasticsearch_query([], [], AGGS, 7)["size"], 7)
+
+    def test_sorted_aggregation_requests_keep_hits(self):
+        body = self.transformer.transform({"aggs": AGGS, "sorts": [{"field": "@timestamp", "order": "desc"}]})
+        self.assertEqual(body["size"], 20)
+        self.assertIn("sort", body)
+
+    def test_count(self):
+        body = self.transformer.transform({"filters": FILTERS, "size": 0, "fields": ["url.domain"]})
+        self.assertEqual(body["size"], 0)
+        self.assertNotIn("track_total_hits", body)  # ✅ An inferred count keeps the bounded default
+        self.assertNotIn("_source", body)  # ✅ No hits are fetched, so hit options are dropped
+        body = self.transformer.transform({"filters": FILTERS, "response_mode": "count"})
+        self.assertIs(body["track_total_hits"], True)
+        body = self.transformer.transform({"filters": FILTERS, "size": 0, "track_total_hits": True})
+        self.assertIs(body["track_total_hits"], True)
+        body = self.transformer.transform({"filters": FILTERS, "response_mode": "count", "track_total_hits": 1000})
+        self.assertEqual(body["track_total_hits"], 1000)
+        self.assertTrue(is_cacheable_query(body))
+
+    def test_exists(self):
+        body = self.transformer.transform({"filters": FILTERS, "response_mode": "exists",
+                                           "sorts": [{"field": "@timestamp", "order": "desc"}]})
+        self.assertEqual((body["size"], body["terminate_after"]), (0, 1))
+        self.assertNotIn("sort", body)
+        self.assertEqual(filter_path_for_query(body),
+                         ["timed_out", "_shards.failed", "_shards.failures", "hits.total", "terminated_early"])
+
+    def test_explicit_hits_mode(self):
+        body = self.transformer.transform({"aggs": AGGS, "response_mode": "hits"})
+        self.assertEqual(body["query"], {"match_all": {}})
+        self.assertEqual(body["size"], 20)
+
+    def test_invalid_modes(self):
+        with self.assertRaises(ValueError):
+            compile_request({"response_mode": "everything"})
+        with self.assertRaises(ValueError):
+            compile_request({"aggs": AGGS, "response_mode": "count"})
+        errors = RequestValidator().validate({"aggs": AGGS, "response_mode": "exists"})
+        self.assertEqual([error.path for error in errors], ["response_mode"])
+
+    def test_encoded_body_matches(self):
+        data = {"filters": FILTERS, "response_mode": "exists"}
+        encoded = self.transformer.transform_to_bytes(data)
+        self.assertEqual(json.loads(encoded), self.transformer.transform(data))
+        self.assertEqual(encoded.summary["terminate_after"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
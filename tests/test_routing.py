@@ -0,0 +1,73 @@
+import unittest
+from transformer.query_executor import QueryExecutor
+from transformer.routing import RoutingPolicy, routing_values
+from transformer.transform import Transformer
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return {}
+
+
+class TestRoutingValues(unittest.TestCase):
+
+    def test_term_and_terms(self):
+        self.assertEqual(routing_values({"term": {"client_id": 7}}, "client_id"), {7})
+        self.assertEqual(routing_values({"term": {"client_id": {"value": 7}}}, "client_id"), {7})
+        self.assertEqual(routing_values({"terms": {"client_id": [1, 2]}}, "client_id"), {1, 2})
+
+    def test_must_intersects_and_required_should_unions(self):
+        query = {"bool": {"must": [
+            {"terms": {"client_id": [1, 2, 3]}},
+            {"bool": {"should": [{"term": {"client_id": 2}}, {"term": {"client_id": 3}}], "minimum_should_match": 1}},
+        ]}}
+        self.assertEqual(routing_values(query, "client_id"), {2, 3})
+
+    def test_single_clause_occurrences(self):
+        query = {"bool": {"filter": {"terms": {"client_id": [1, 2]}}, "must": {"term": {"client_id": 2}}}}
+        self.assertEqual(routing_values(query, "client_id"), {2})
+        self.assertEqual(routing_values({"bool": {"should": {"term": {"client_id": 4}}}}, "client_id"), {4})
+
+    def test_unpinned_queries(self):
+        for query in (
+            {"match_all": {}},
+            {"bool": {"must_not": [{"term": {"client_id": 1}}]}},
+            {"bool": {"filter": [{"term": {"a": 1}}], "should": [{"term": {"client_id": 1}}]}},
+            {"terms": {"client_id": {"index": "lookup", "id": "1", "path": "values"}}},
+        ):
+            self.assertIsNone(routing_values(query, "client_id"))
+
+
+class TestRoutingPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeElasticsearch()
+        self.executor = QueryExecutor(client=self.client, routing=RoutingPolicy("client_id", max_values=2))
+        self.transformer = Transformer("my_events")
+
+    def test_single_tenant_query_is_routed(self):
+        body = self.transformer.transform({"filters": [{"client_id": 42}, {"event.provider": "pfm"}]})
+        self.executor.execute_query(body, session="u-1")
+        self.assertEqual(self.client.calls[0]["routing"], "42")
+        self.assertEqual(self.client.calls[0]["preference"], "u-1")
+
+    def test_encoded_bodies_are_routed(self):
+        self.executor.execute_query(self.transformer.transform_to_bytes({"filters": [{"client_id": [2, 1]}]}))
+        self.assertEqual(self.client.calls[0]["routing"], "1,2")
+        self.assertNotIn("preference", self.client.calls[0])
+
+    def test_too_many_values_search_all_shards(self):
+        self.executor.execute_query(self.transformer.transform({"filters": [{"client_id": [1, 2, 3]}]}))
+        self.assertNotIn("routing", self.client.calls[0])
+
+    def test_reserved_preference_values_are_prefixed(self):
+        self.assertEqual(RoutingPolicy().preference_for("_local"), "session-_local")
+        self.assertIsNone(RoutingPolicy(session_preference=False).preference_for("u-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from transformer.aggregation import (
+    CardinalityAggregation, SamplerAggregation, DiversifiedSamplerAggregation, RandomSamplerAggregation, TermsAggregation,
+    build_aggregation_query_class
+)
+from transformer.mappings import FieldMappings
+
+class TestSamplerAggregation(unittest.TestCase):
+
+    def test_sampler_wraps_sub_aggregations(self):
+        agg = SamplerAggregation(
+            name="sample", shard_size=200,
+            aggs={"domains": TermsAggregation(field="url.domain", size=5)}
+        )
+        expected = {
+            "sample": {
+                "sampler": {"shard_size": 200},
+                "aggs": {
+                    "domains": {"terms": {"field": "url.domain", "size": 5}}
+                }
+            }
+        }
+        self.assertEqual(agg.to_elasticsearch(), expected)
+
+    def test_diversified_sampler(self):
+        agg = DiversifiedSamplerAggregation(
+            name="sample", field="client_id", shard_size=100, max_docs_per_value=3,
+            aggs={"source_address": ["terms", 10]}
+        )
+        expected = {
+            "sample": {
+                "diversified_sampler": {"field": "client_id", "shard_size": 100, "max_docs_per_value": 3},
+                "aggs": {
+                    "source_address": {
+                        "terms": {"field": "source_address", "size": 10, "order": {"_count": "desc"}}
+                    }
+                }
+            }
+        }
+        self.assertEqual(agg.to_elasticsearch(), expected)
+
+    def test_random_sampler(self):
+        agg = RandomSamplerAggregation(name="sample", probability=0.1, seed=42, aggs={"client_id": ["terms", 10]})
+        self.assertEqual(agg.to_elasticsearch()["sample"]["random_sampler"], {"probability": 0.1, "seed": 42})
+
+    def test_random_sampler_invalid_probability(self):
+        with self.assertRaises(ValueError):
+            RandomSamplerAggregation(name="sample", probability=0.7, aggs={})
+
+    def test_sampler_from_data_model(self):
+        aggs = {
+            "source_address": {
+                "size": 20,
+                "execution_hint": "map",
+                "sampler": {"type": "diversified_sampler", "field": "client_id", "shard_size": 500}
+            }
+        }
+        expected = {
+            "source_address_sample": {
+                "diversified_sampler": {"field": "client_id", "shard_size": 500},
+                "aggs": {
+                    "source_address": {
+                        "terms": {
+                            "field": "source_address",
+                            "size": 20,
+                            "order": {"_count": "desc"},
+                            "execution_hint": "map"
+                        }
+                    }
+                }
+            }
+        }
+        self.assertEqual(build_aggregation_query_class(aggs), expected)
+
+    def test_field_type_defaults(self):
+        """High-cardinality (keyword/ip) fields get approximate, cheaper defaults; other fields keep Elasticsearch's."""
+        mappings = FieldMappings.load()
+        aggs = {"source_address": {"size": 10, "aggs": {"client_id": {"size": 5, "aggs": {"url.domain": ["terms", 5]}}}}}
+        query = build_aggregation_query_class(aggs, mappings)
+        self.assertEqual(query["source_address"]["terms"]["shard_size"], 10)
+        self.assertNotIn("shard_size", query["source_address"]["aggs"]["client_id"]["terms"])  # ✅ Numeric
+        self.assertEqual(query["source_address"]["aggs"]["client_id"]["aggs"]["url.domain"]["terms"]["shard_size"], 5)
+        self.assertNotIn("collect_mode", query["source_address"]["terms"])  # ✅ Elasticsearch already picks it
+
+        query = build_aggregation_query_class({"domains": CardinalityAggregation("url.domain")}, mappings)
+        self.assertEqual(query["domains"]["cardinality"]["precision_threshold"], 1000)
+        query = build_aggregation_query_class({"clients": CardinalityAggregation("client_id")}, mappings)
+        self.assertNotIn("precision_threshold", query["clients"]["cardinality"])
+
+    def test_explicit_options_win_over_defaults(self):
+        mappings = FieldMappings.load()
+        query = build_aggregation_query_class({"source_address": {"size": 10, "shard_size": 100}}, mappings)
+        self.assertEqual(query["source_address"]["terms"]["shard_size"], 100)
+        query = build_aggregation_query_class(
+            {"domains": CardinalityAggregation("url.domain", precision_threshold=40000)}, mappings)
+        self.assertEqual(query["domains"]["cardinality"]["precision_threshold"], 40000)
+
+    def test_sampler_below_the_root(self):
+        aggs = {"source_address": {"size": 10}, "url.domain": {"size": 5, "sampler": {"shard_size": 100}}}
+        query = build_aggregation_query_class(aggs)
+        self.assertEqual(list(query["source_address"]["aggs"]), ["url.domain_sample"])
+        sample = query["source_address"]["aggs"]["url.domain_sample"]
+        self.assertEqual(sample["sampler"], {"shard_size": 100})
+        self.assertEqual(sample["aggs"]["url.domain"]["terms"]["field"], "url.domain")
+
+    def test_explicit_collect_mode_wins(self):
+        mappings = FieldMappings.load()
+        aggs = {"source_address": {"collect_mode": "depth_first", "aggs": {"client_id": ["terms", 5]}}}
+        query = build_aggregation_query_class(aggs, mappings)
+        self.assertEqual(query["source_address"]["terms"]["collect_mode"], "depth_first")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from transformer.aggregation import (AvgAggregation, MaxAggregation, MinAggregation, PercentilesAggregation,
+                                     StatsAggregation, SumAggregation, TermsAggregation, create_aggregation_tree,
+                                     fuse_metric_aggregations)
+from transformer.transform import Transformer
+
+
+class TestStatsAggregation(unittest.TestCase):
+
+    def test_extended_stats_with_sigma(self):
+        agg = StatsAggregation("amount", name="amount_stats", extended=True, sigma=3)
+        self.assertEqual(agg.to_elasticsearch(), {"amount_stats": {"extended_stats": {"field": "amount", "sigma": 3}}})
+
+    def test_shorthand(self):
+        tree = create_aggregation_tree({"amount_stats": ["stats", "amount"], "avg_amount": ["avg", "amount"]})
+        self.assertIsInstance(tree["amount_stats"], StatsAggregation)
+        self.assertEqual(tree["avg_amount"].to_elasticsearch(), {"avg_amount": {"avg": {"field": "amount"}}})
+
+
+class TestMetricFusion(unittest.TestCase):
+
+    def test_sibling_metrics_on_one_field_become_stats(self):
+        aggs = {
+            "min_amount": MinAggregation("amount", name="min_amount"),
+            "max_amount": MaxAggregation("amount", name="max_amount"),
+            "avg_amount": AvgAggregation("amount", name="avg_amount"),
+            "sum_fee": SumAggregation("fee", name="sum_fee"),
+        }
+        fused = fuse_metric_aggregations(aggs)
+        self.assertEqual(list(fused), ["amount__stats", "sum_fee"])
+        self.assertEqual(fused["amount__stats"].to_elasticsearch(), {"amount__stats": {"stats": {"field": "amount"}}})
+        self.assertEqual(fused["amount__stats"].members, {"min_amount": "min", "max_amount": "max", "avg_amount": "avg"})
+        self.assertIs(fused["sum_fee"], aggs["sum_fee"])
+
+    def test_fusion_reaches_sub_aggregations(self):
+        aggs = {"client_id": TermsAggregation("client_id", name="client_id", size=5, aggs={
+            "min_amount": MinAggregation("amount", name="min_amount"),
+            "max_amount": MaxAggregation("amount", name="max_amount"),
+        })}
+        fused = fuse_metric_aggregations(aggs)
+        self.assertEqual(list(fused["client_id"].aggs), ["amount__stats"])
+        self.assertEqual(list(aggs["client_id"].aggs), ["min_amount", "max_amount"])
+
+    def test_metrics_a_bucket_order_refers_to_keep_their_name(self):
+        aggs = {"client_id": TermsAggregation("client_id", name="client_id", size=5, order={"max_amount": "desc"}, aggs={
+            "min_amount": MinAggregation("amount", name="min_amount"),
+            "max_amount": MaxAggregation("amount", name="max_amount"),
+            "avg_amount": AvgAggregation("amount", name="avg_amount"),
+        })}
+        fused = fuse_metric_aggregations(aggs)
+        self.assertEqual(list(fused["client_id"].aggs), ["amount__stats", "max_amount"])
+        self.assertEqual(fused["client_id"].aggs["amount__stats"].members, {"min_amount": "min", "avg_amount": "avg"})
+        aggs["client_id"].order = {"max_amount.value": "desc"}
+        self.assertIn("max_amount", fuse_metric_aggregations(aggs)["client_id"].aggs)
+
+    def test_response_is_projected_to_original_names(self):
+        request = Transformer("my_events", fuse_metrics=True).compile({"aggs": {
+            "client_id": {"size": 5, "aggs": {"min_amount": ["min", "amount"], "max_amount": ["max", "amount"]}}
+        }})
+        stats = {"count": 2, "min": 1.0, "max": 4.0, "avg": 2.5, "sum": 5.0}
+        response = {"aggregations": {"client_id": {"buckets": [{"key": "c1", "doc_count": 2, "amount__stats": stats}]}}}
+        request.reshape_response(response)
+        self.assertEqual(
+            response["aggregations"]["client_id"]["buckets"][0],
+            {"key": "c1", "doc_count": 2, "min_amount": {"value": 1.0}, "max_amount": {"value": 4.0}}
+        )
+
+    def test_nested_metrics_fuse_inside_the_join(self):
+        aggs = {
+            "min_formula": MinAggregation("analyst_notes.formula_id", name="min_formula", nested_path="analyst_notes"),
+            "max_formula": MaxAggregation("analyst_notes.formula_id", name="max_formula", nested_path="analyst_notes"),
+        }
+        request = Transformer("my_events", fuse_metrics=True).compile({"aggs": aggs})
+        self.assertEqual(
+            request.body()["aggs"],
+            {"analyst_notes.formula_id__stats": {
+                "nested": {"path": "analyst_notes"},
+                "aggs": {"analyst_notes.formula_id__stats": {"stats": {"field": "analyst_notes.formula_id"}}}
+            }}
+        )
+        response = {"aggregations": {"analyst_notes.formula_id__stats": {
+            "doc_count": 6, "analyst_notes.formula_id__stats": {"count": 6, "min": 2.0, "max": 9.0, "avg": 5.0, "sum": 30.0}
+        }}}
+        request.reshape_response(response)
+        self.assertEqual(response["aggregations"], {
+            "min_formula": {"doc_count": 6, "min_formula": {"value": 2.0}},
+            "max_formula": {"doc_count": 6, "max_formula": {"value": 9.0}},
+        })
+
+    def test_metrics_with_sub_aggregations_or_single_metrics_are_kept(self):
+        aggs = {"avg_amount": AvgAggregation("amount", name="avg_amount"), "max_fee": MaxAggregation("fee", name="max_fee")}
+        self.assertEqual(fuse_metric_aggregations(aggs), aggs)
+
+
+class TestPercentilesAggregation(unittest.TestCase):
+
+    def test_tdigest_compression(self):
+        agg = PercentilesAggregation("latency", name="latency_p", percents=[99, 50], compression=200)
+        self.assertEqual(
+            agg.to_elasticsearch(),
+            {"latency_p": {"percentiles": {"field": "latency", "percents": [50.0, 99.0], "tdigest": {"compression": 200}}}}
+        )
+
+    def test_hdr(self):
+        agg = PercentilesAggregation("latency", percents=[95], hdr_significant_digits=3)
+        self.assertEqual(agg.to_elasticsearch()["latency"]["percentiles"]["hdr"], {"number_of_significant_value_digits": 3})
+        with self.assertRaises(ValueError):
+            PercentilesAggregation("latency", compression=100, hdr_significant_digits=3)
+
+    def test_sibling_percentiles_share_one_sketch(self):
+        request = Transformer("my_events", fuse_metrics=True).compile({"aggs": {
+            "median": ["percentiles", "latency", {"percents": [50], "compression": 200}],
+            "tail": ["percentiles", "latency", {"percents": [95, 99], "compression": 200}],
+            "coarse": ["percentiles", "latency", {"percents": [50]}],
+        }})
+        body = request.body()["aggs"]
+        self.assertEqual(body["latency__percentiles"]["percentiles"]["percents"], [50.0, 95.0, 99.0])
+        self.assertIn("coarse", body)  # ✅ Different accuracy settings keep their own sketch
+
+        values = {"50.0": 12.0, "95.0": 80.0, "99.0": 130.0}
+        response = {"aggregations": {"latency__percentiles": {"values": values}, "coarse": {"values": {"50.0": 11.0}}}}
+        request.reshape_response(response)
+        self.assertEqual(response["aggregations"]["median"], {"values": {"50.0": 12.0}})
+        self.assertEqual(response["aggregations"]["tail"], {"values": {"95.0": 80.0, "99.0": 130.0}})
+        self.assertNotIn("latency__percentiles", response["aggregations"])
+
+
+if __name__ == "__main__":
+    unittest.main()
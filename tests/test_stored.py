@@ -0,0 +1,114 @@
+import json
+import re
+import unittest
+from transformer.panel_store import PanelScheduler, PanelStore
+from transformer.query_executor import QueryExecutor
+from transformer.routing import RoutingPolicy
+from transformer.stored import StoredScriptRegistry, TemplateRequest, parameterize
+from transformer.transform import Transformer
+
+TO_JSON = re.compile(r"\{\{#toJson\}\}(\w+)\{\{/toJson\}\}")
+
+
+class FakeElasticsearch:
+    """Stand-in cluster: keeps stored scripts and renders the `toJson` mustache templates the registry writes."""
+
+    def __init__(self):
+        self.scripts = {}
+        self.searches = []
+        self.options = []
+
+    def put_script(self, id, script):
+        self.scripts[id] = script
+
+    def render(self, id, params):
+        source = TO_JSON.sub(lambda m: json.dumps(params[m.group(1)]), self.scripts[id]["source"])
+        return json.loads(source)
+
+    def search_template(self, index, id, params, **options):
+        self.searches.append(self.render(id, params))
+        self.options.append(options)
+        return {"hits": {"hits": []}}
+
+
+def panel_model(provider, size=20):
+    return {
+        "filters": [{"event.provider": provider}, {"formula_matches_id": [3, 1, 2]}],
+        "sorts": [{"field": "_script", "script": "doc['action_count'].value * 2", "type": "number", "order": "desc"}],
+        "size": size,
+    }
+
+
+class TestStoredScriptRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeElasticsearch()
+        self.registry = StoredScriptRegistry(self.client)
+        self.transformer = Transformer("my_events", registry=self.registry)
+
+    def test_upload_stores_scripts_and_templates_once(self):
+        ids = self.registry.upload(self.transformer, [panel_model("pfm"), panel_model("ids")])
+        self.assertEqual(len(set(ids)), 1)  # ✅ Same shape, different values
+        self.assertEqual(sorted(script["lang"] for script in self.client.scripts.values()), ["mustache", "painless"])
+
+    def test_script_sorts_reference_the_stored_script(self):
+        self.registry.upload(self.transformer, [panel_model("pfm")])
+        sort = self.transformer.transform(panel_model("pfm"))["sort"][0]["_script"]
+        script_id = self.registry.scripts[("painless", "doc['action_count'].value * 2")]
+        self.assertEqual(sort, {"script": {"id": script_id}, "order": "desc", "type": "number"})
+
+    def test_template_renders_to_the_inline_body(self):
+        self.registry.upload(self.transformer, [panel_model("pfm")])
+        for data in (panel_model("pfm"), panel_model("other", size=5)):
+            template = self.transformer.transform_stored(data)
+            self.assertIsInstance(template, TemplateRequest)
+            self.assertEqual(self.client.render(template.id, template.params), self.transformer.transform(data))
+            self.assertLess(len(json.dumps(template.to_json())), len(json.dumps(self.transformer.transform(data))))
+
+    def test_unregistered_shapes_stay_inline(self):
+        self.registry.upload(self.transformer, [panel_model("pfm")])
+        body = self.transformer.transform_stored({"filters": [{"event.provider": "pfm"}]})
+        self.assertIsInstance(body, dict)
+
+    def test_executor_runs_templates(self):
+        self.registry.upload(self.transformer, [panel_model("pfm")])
+        executor = QueryExecutor(client=self.client)
+        executor.execute_query(self.transformer.transform_stored(panel_model("ids")))
+        self.assertEqual(self.client.searches, [self.transformer.transform(panel_model("ids"))])
+
+    def test_templates_are_routed(self):
+        self.registry.upload(self.transformer, [{"filters": [{"client_id": 1}], "size": 0}])
+        template = self.transformer.transform_stored({"filters": [{"client_id": 7}], "size": 0})
+        executor = QueryExecutor(client=self.client, routing=RoutingPolicy())
+        executor.execute_query(template, session="analyst-1")
+        self.assertEqual(self.client.options[0]["routing"], "7")
+        self.assertEqual(self.client.options[0]["preference"], "analyst-1")
+
+    def test_scheduler_refreshes_panels_with_templates(self):
+        self.registry.upload(self.transformer, [panel_model("pfm")])
+        scheduler = PanelScheduler(self.transformer, QueryExecutor(client=self.client), PanelStore())
+        scheduler.register("ids", panel_model("ids"))
+        self.assertIsInstance(scheduler.panels["ids"]["query"], TemplateRequest)
+        scheduler.refresh("ids")
+        self.assertEqual(self.client.searches, [self.transformer.transform(panel_model("ids"))])
+
+    def test_scheduler_uploads_templates_when_it_starts(self):
+        scheduler = PanelScheduler(self.transformer, QueryExecutor(client=self.client), PanelStore())
+        scheduler.register("pfm", panel_model("pfm"))
+        self.assertEqual(self.client.scripts, {})  # ✅ Registering never touches the cluster
+        self.assertNotIsInstance(scheduler.panels["pfm"]["query"], TemplateRequest)
+        scheduler.upload_templates()
+        scheduler.upload_templates()
+        self.assertEqual(len(self.client.scripts), 2)  # ✅ The script sort and the template, stored once
+        self.assertIsInstance(scheduler.panels["pfm"]["query"], TemplateRequest)
+        scheduler.refresh("pfm")
+        self.assertEqual(self.client.searches, [self.transformer.transform(panel_model("pfm"))])
+
+    def test_parameterize_keeps_lists_whole(self):
+        skeleton, params = parameterize({"terms": {"client_id": [1, 2]}, "size": 0})
+        self.assertEqual(params, {"p0": [1, 2], "p1": 0})
+        self.assertEqual(skeleton, {"terms": {"client_id": "__transformer_param_p0__"}, "size": "__transformer_param_p1__"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,37 @@ class TestTermsAggregation(unittest.TestCase):
         }
         self.assertEqual(agg.to_elasticsearch(), expected)
 
+    def test_terms_execution_options(self):
+        """Test execution hint, shard sizing and collect mode options."""
+        agg = TermsAggregation(
+            field="source_address", size=20, execution_hint="map", shard_size=100,
+            collect_mode="breadth_first", min_doc_count=2, shard_min_doc_count=1
+        )
+        expected = {
+            "source_address": {
+                "terms": {
+                    "field": "source_address",
+                    "size": 20,
+                    "execution_hint": "map",
+                    "shard_size": 100,
+                    "collect_mode": "breadth_first",
+                    "min_doc_count": 2,
+                    "shard_min_doc_count": 1
+                }
+            }
+        }
+        self.assertEqual(agg.to_elasticsearch(), expected)
+
+    def test_terms_execution_options_round_trip(self):
+        agg = TermsAggregation(field="url.domain", shard_size=50, collect_mode="breadth_first")
+        restored = TermsAggregation.from_json(agg.to_json())
+        self.assertEqual(restored.shard_size, 50)
+        self.assertEqual(restored.collect_mode, "breadth_first")
+
+    def test_invalid_collect_mode(self):
+        with self.assertRaises(ValueError):
+            TermsAggregation(field="category", collect_mode="sideways")
+
     def test_invalid_format(self):
         """Test that invalid format raises a TypeError"""
         with self.assertRaises(TypeError):  # ✅ Ensure invalid format raises an error
@@ -10,7 +10,7 @@ class TestTermsFilter(unittest.TestCase):
 
     def test_multiple_terms(self):
         terms_filter = TermsFilter("category", ["electronics", "books", "clothing"])
-        expected_query = {"terms": {"category": ["electronics", "books", "clothing"]}}
+        expected_query = {"terms": {"category": ["books", "clothing", "electronics"]}}
         self.assertEqual(terms_filter.to_elasticsearch(), expected_query)
 
     def test_empty_terms_list(self):
@@ -25,7 +25,7 @@ class TestTermsFilter(unittest.TestCase):
 
     def test_terms_with_boost(self):
         terms_filter = TermsFilter("tags", ["new", "featured"], boost=1.5)
-        expected_query = {"terms": {"tags": ["new", "featured"], "boost": 1.5}}
+        expected_query = {"terms": {"tags": ["featured", "new"], "boost": 1.5}}
         self.assertEqual(terms_filter.to_elasticsearch(), expected_query)
 
     def test_to_json_single_term(self):
@@ -35,7 +35,7 @@ class TestTermsFilter(unittest.TestCase):
 
     def test_to_json_multiple_terms(self):
         terms_filter = TermsFilter("category", ["electronics", "books"])
-        expected_json = {"type": "terms", "field": "category", "terms": ["electronics", "books"]}
+        expected_json = {"type": "terms", "field": "category", "terms": ["books", "electronics"]}
         self.assertEqual(terms_filter.to_json(), expected_json)
 
     def test_to_json_with_boost(self):
@@ -43,7 +43,7 @@ class TestTermsFilter(unittest.TestCase):
         expected_json = {
             "type": "terms",
             "field": "tags",
-            "terms": ["new", "featured"],
+            "terms": ["featured", "new"],
             "boost": 1.5
         }
         self.assertEqual(terms_filter.to_json(), expected_json)
@@ -58,14 +58,22 @@ class TestTermsFilter(unittest.TestCase):
         json_data = {"type": "terms", "field": "category", "terms": ["electronics", "books"]}
         terms_filter = TermsFilter.from_json(json_data)
         self.assertEqual(terms_filter.field, "category")
-        self.assertEqual(terms_filter.terms, ["electronics", "books"])
+        self.assertEqual(terms_filter.terms, ["books", "electronics"])
 
     def test_from_json_with_boost(self):
         json_data = {"type": "terms", "field": "tags", "terms": ["new", "featured"], "boost": 1.5}
         terms_filter = TermsFilter.from_json(json_data)
         self.assertEqual(terms_filter.field, "tags")
-        self.assertEqual(terms_filter.terms, ["new", "featured"])
+        self.assertEqual(terms_filter.terms, ["featured", "new"])
         self.assertEqual(terms_filter.boost, 1.5)
 
+    def test_terms_are_deduplicated_and_sorted(self):
+        terms_filter = TermsFilter("client_id", [3, 1, 3, 2, 1])
+        self.assertEqual(terms_filter.to_elasticsearch(), {"terms": {"client_id": [1, 2, 3]}})
+
+    def test_mixed_terms_sort_numbers_first(self):
+        terms_filter = TermsFilter("client_id", ["b", 2, "a", 1])
+        self.assertEqual(terms_filter.terms, [1, 2, "a", "b"])
+
 if __name__ == "__main__":
     unittest.main()
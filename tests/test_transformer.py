@@ -0,0 +1,42 @@
+import unittest
+from transformer.transform import Transformer
+
+class TestTransformer(unittest.TestCase):
+
+    def setUp(self):
+        self.transformer = Transformer("my_events")
+
+    def test_source_includes_and_excludes(self):
+        query = self.transformer.transform({
+            "filters": [{"client_id": 1}],
+            "fields": ["@timestamp", "url.domain"],
+            "exclude_fields": ["analyst_notes"]
+        })
+        self.assertEqual(query["_source"], {"includes": ["@timestamp", "url.domain"], "excludes": ["analyst_notes"]})
+
+    def test_docvalue_fields(self):
+        query = self.transformer.transform({"fields": ["@timestamp", "client_id"], "fetch": "docvalues"})
+        self.assertIs(query["_source"], False)
+        self.assertEqual(query["docvalue_fields"], ["@timestamp", "client_id"])
+
+    def test_fields_api(self):
+        query = self.transformer.transform({"fields": ["source_address"], "fetch": "fields"})
+        self.assertIs(query["_source"], False)
+        self.assertEqual(query["fields"], ["source_address"])
+
+    def test_track_total_hits(self):
+        query = self.transformer.transform({"filters": [{"client_id": 1}], "track_total_hits": 1000})
+        self.assertEqual(query["track_total_hits"], 1000)
+
+    def test_no_response_options(self):
+        query = self.transformer.transform({"filters": [{"client_id": 1}]})
+        self.assertNotIn("_source", query)
+        self.assertNotIn("track_total_hits", query)
+
+    def test_invalid_fetch_mode(self):
+        with self.assertRaises(ValueError):
+            self.transformer.transform({"fields": ["a"], "fetch": "everything"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from example_tests_objects import generate_bool_filter_object, generate_range_filter_object, generate_terms_agg_object
+from transformer.mappings import FieldMappings
+from validator import RequestValidationError, RequestValidator, ValidationError
+
+
+class TestRequestValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = RequestValidator(FieldMappings.load())
+
+    def test_valid_request(self):
+        data = {
+            "filters": [
+                {"event.provider": "pfm"},
+                {"@timestamp": {"gte": "2025-01-01T00:00:00.000Z", "lte": "2025-01-02T00:00:00.000Z"}},
+                {"source_address": {"ip": ["10.0.0.0/8"]}},
+                {"url.domain": {"wildcard": "*.example.com"}},
+            ],
+            "sorts": [{"field": "@timestamp", "order": "desc"}],
+            "aggs": {"client_id": {"terms": {"field": "client_id", "size": 5}, "aggs": {"url.domain": ["terms", 3]}}},
+            "size": 50,
+        }
+        self.assertEqual(self.validator.validate(data), [])
+
+    def test_structure_only_without_mappings(self):
+        validator = RequestValidator()
+        for data in (generate_bool_filter_object(), generate_range_filter_object(), generate_terms_agg_object()):
+            self.assertEqual(validator.validate(data), [])
+
+    def test_all_errors_are_reported_at_once(self):
+        data = {
+            "filters": [{"action_count": "many"}, {"url.domain": {"between": [1, 2]}}],
+            "sorts": [{"field": "@timestamp", "order": "up"}],
+            "aggs": {"client_id": ["terms", 0]},
+            "limit": 10,
+        }
+        self.assertEqual([error.path for error in self.validator.validate(data)], [
+            "filters[0].action_count", "filters[1].url.domain", "sorts[0].order", "aggs.client_id", "limit"
+        ])
+
+    def test_unmapped_fields_in_non_dynamic_mapping_match_nothing(self):
+        errors = self.validator.validate({"filters": [{"analyst_notes.mood": "happy"}]})
+        self.assertEqual(errors, [ValidationError(
+            "filters[0].analyst_notes.mood",
+            "Field 'analyst_notes.mood' is not mapped and its mapping is not dynamic, so it matches nothing"
+        )])
+        dynamic = RequestValidator(FieldMappings({"a": {"type": "keyword"}}))
+        self.assertEqual(dynamic.validate({"filters": [{"b": "x"}]}), [])
+
+    def test_field_types(self):
+        data = {
+            "filters": [{"source_address": {"ip": "10.0.0.300"}}, {"url.domain": {"ip": "10.0.0.1"}}],
+            "aggs": {"avg_domain": ["avg", "url.domain"]},
+        }
+        self.assertEqual(
+            [error.path for error in self.validator.validate(data)],
+            ["filters[0].source_address.ip", "filters[1].url.domain", "aggs.avg_domain[1]"]
+        )
+
+    def test_operators_are_checked_against_valid_operators(self):
+        errors = self.validator.validate({"filters": [{"@timestamp": {"after": "2025-01-01"}}]})
+        self.assertIn("Unknown operators ['after']", errors[0].message)
+
+    def test_multi_field_filters_and_mismatched_terms_field(self):
+        data = {
+            "filters": [{"event.provider": "pfm", "client_id": 1}],
+            "aggs": {"client_id": {"terms": {"field": "url.domain"}}},
+        }
+        self.assertEqual(
+            [error.path for error in self.validator.validate(data)],
+            ["filters[0]", "aggs.client_id.terms.field"]
+        )
+
+    def test_result_window(self):
+        errors = self.validator.validate({"size": 100, "from": 9950})
+        self.assertEqual([error.path for error in errors], ["size"])
+
+    def test_check_raises_with_every_error(self):
+        with self.assertRaises(RequestValidationError) as raised:
+            self.validator.check({"size": -1, "fetch": "all"})
+        self.assertEqual(len(raised.exception.errors), 2)
+        data = {"size": 10}
+        self.assertIs(self.validator.check(data), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import unittest
+import example_tests_objects
+from transformer import aggregation
+from transformer.aggregation import AvgAggregation
+from transformer.ir import CompiledRequest
+from transformer.mappings import FieldMappings
+from transformer.panel_store import PanelScheduler, PanelStore
+from transformer.query_executor import QueryExecutor, filter_path_for_query
+from transformer.routing import RoutingPolicy
+from transformer.transform import Transformer
+from transformer.writer import EncodedBody, JsonBytesWriter
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return {}
+
+
+class TestJsonBytesWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.transformer = Transformer("my_events")
+
+    def assert_same_body(self, data):
+        encoded = self.transformer.transform_to_bytes(data)
+        self.assertIsInstance(encoded, EncodedBody)
+        self.assertEqual(json.loads(encoded), self.transformer.transform(data))
+
+    def test_matches_dict_emitter(self):
+        for generate in (
+            example_tests_objects.generate_nested_terms_agg_object_order,
+            example_tests_objects.generate_sort_object,
+            example_tests_objects.generate_bool_filter_object,
+            example_tests_objects.generate_match_filter_object,
+            example_tests_objects.generate_wildcard_filter_object,
+        ):
+            self.assert_same_body(generate())
+
+    def test_match_all_and_options(self):
+        self.assert_same_body({"fields": ["client_id"], "track_total_hits": False, "from": 20})
+
+    def test_non_ascii_values(self):
+        self.assert_same_body({"filters": [{"formula_metadata.name": "Règle ✓"}]})
+
+    def test_unnamed_aggregations_take_their_key(self):
+        unnamed = {
+            "terms": aggregation.TermsAggregation("client_id"),
+            "avg": AvgAggregation("bytes"),
+            "sum": aggregation.SumAggregation("bytes"),
+            "min": aggregation.MinAggregation("bytes"),
+            "max": aggregation.MaxAggregation("bytes"),
+            "stats": aggregation.StatsAggregation("bytes"),
+            "percentiles": aggregation.PercentilesAggregation("bytes", percents=[95]),
+            "cardinality": aggregation.CardinalityAggregation("client_id"),
+            "range": aggregation.RangeAggregation("bytes", ranges=[{"to": 10}]),
+            "histogram": aggregation.HistogramAggregation("bytes", interval=10),
+            "date_histogram": aggregation.DateHistogramAggregation("@timestamp", calendar_interval="1d"),
+            "composite": aggregation.CompositeAggregation([{"client": {"terms": {"field": "client_id"}}}]),
+        }
+        for agg_type, agg in unnamed.items():
+            with self.subTest(agg_type):
+                for aggs in (self.transformer.transform({"aggs": {"x": agg}})["aggs"],
+                             json.loads(JsonBytesWriter().emit(CompiledRequest(aggs={"x": agg})))["aggs"]):
+                    self.assertEqual(list(aggs), ["x"])
+                    self.assertIn(agg_type, aggs["x"])
+                self.assert_same_body({"aggs": {"x": agg}})
+                self.assertIsNone(agg.name)
+
+    def test_definitions_are_not_modified(self):
+        transformer = Transformer("my_events", mappings=FieldMappings.load())
+        agg = AvgAggregation("analyst_notes.formula_id")
+        transformer.transform({"aggs": {"first": agg}})
+        self.assertEqual((agg.name, agg.nested_path), (None, None))
+        self.assertEqual(transformer.transform({"aggs": {"second": agg}})["aggs"]["second"]["aggs"],
+                         {"second": {"avg": {"field": "analyst_notes.formula_id"}}})
+
+    def test_summary(self):
+        encoded = self.transformer.transform_to_bytes({"aggs": {"client_id": ["terms", 5]}, "track_total_hits": False})
+        self.assertEqual(encoded.summary, {"size": 0, "aggs": True, "track_total_hits": False})
+
+    def test_summary_derives_the_same_filter_path(self):
+        transformer = Transformer("my_events", mappings=FieldMappings.load())
+        data = {"filters": [{"analyst_notes.action": "close"}], "inner_hits": True,
+                "sorts": [{"field": "@timestamp", "order": "desc"}]}
+        filter_path = filter_path_for_query(transformer.transform(data))
+        self.assertIn("hits.hits.inner_hits", filter_path)
+        self.assertEqual(filter_path_for_query(transformer.transform_to_bytes(data)), filter_path)
+
+    def test_executor_sends_bytes_untouched(self):
+        client = RecordingClient()
+        encoded = self.transformer.transform_to_bytes({"aggs": {"client_id": ["terms", 5]}})
+        QueryExecutor(client=client).execute_query(encoded)
+        self.assertIs(client.calls[0]["body"], encoded)
+        self.assertEqual(client.calls[0]["filter_path"],
+                         ["timed_out", "_shards.failed", "_shards.failures", "aggregations"])
+
+
+    def test_routing_reads_the_summary(self):
+        client = RecordingClient()
+        encoded = self.transformer.transform_to_bytes({"filters": [{"client_id": 7}]})
+        QueryExecutor(client=client, routing=RoutingPolicy()).execute_query(encoded)
+        self.assertEqual(encoded.summary["query"], self.transformer.transform({"filters": [{"client_id": 7}]})["query"])
+        self.assertEqual(client.calls[0]["routing"], "7")
+
+    def test_panels_are_encoded_once(self):
+        client = RecordingClient()
+        scheduler = PanelScheduler(self.transformer, QueryExecutor(client=client), PanelStore())
+        scheduler.register("domains", {"aggs": {"url.domain": ["terms", 5]}})
+        scheduler.refresh("domains")
+        scheduler.refresh("domains")
+        self.assertIsInstance(client.calls[0]["body"], EncodedBody)
+        self.assertIs(client.calls[0]["body"], client.calls[1]["body"])
+
+
+if __name__ == "__main__":
+    unittest.main()
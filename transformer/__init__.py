@@ -1,6 +1,56 @@
 # transformer/__init__.py
-from .filter import MatchFilter, TermFilter, RangeFilter, BoolFilter, IdsFilter, WildcardFilter, TermsFilter, create_filter_object, build_filter_query_class
-from .sort import Sort, create_sort_object
-from .aggregation import BaseAggregation, AvgAggregation, CardinalityAggregation, DateHistogramAggregation, HistogramAggregation, MaxAggregation, MinAggregation, SumAggregation, CompositeAggregation, RangeAggregation, TermsAggregation, build_aggregation_query_class, create_aggregation_object, create_single_aggregation_object
-from .transform import Transformer
-from .query_executor import QueryExecutor
\ No newline at end of file
+# Names are resolved lazily so transform-only users never import `elasticsearch` or build a client.
+import importlib
+
+_EXPORTS = {
+    "filter": ("MatchFilter", "TermFilter", "RangeFilter", "BoolFilter", "IdsFilter", "WildcardFilter", "TermsFilter",
+               "TermsLookupFilter", "PrefixFilter", "IpFilter", "NestedFilter", "create_filter_object", "build_filter_query_class"),
+    "sort": ("Sort", "create_sort_object"),
+    "aggregation": ("BaseAggregation", "AvgAggregation", "CardinalityAggregation", "DateHistogramAggregation",
+                    "HistogramAggregation", "MaxAggregation", "MinAggregation", "SumAggregation", "CompositeAggregation",
+                    "RangeAggregation", "TermsAggregation", "SamplerAggregation", "DiversifiedSamplerAggregation",
+                    "RandomSamplerAggregation", "NestedAggregationGroup", "build_aggregation_query_class",
+                    "create_aggregation_object", "create_single_aggregation_object", "create_aggregation_tree",
+                    "default_aggregation_options", "merge_nested_aggregations", "StatsAggregation", "PercentilesAggregation",
+                    "fuse_metric_aggregations", "plan_aggregations"),
+    "nodes": ("FrozenNode", "NodeInterner", "freeze"),
+    "ir": ("CompiledRequest", "compile_request", "RequestEmitter", "ElasticsearchEmitter", "JsonEmitter",
+           "CacheKeyEmitter"),
+    "mappings": ("FieldMappings",),
+    "writer": ("JsonBytesWriter", "EncodedBody"),
+    "nested": ("NestedGrouper",),
+    "patterns": ("PatternRewriter", "PatternPolicyError", "analyze_pattern"),
+    "large_terms": ("TermsLookupStore", "LargeTermsPlanner", "search_large_terms"),
+    "stored": ("StoredScriptRegistry", "TemplateRequest"),
+    "dates": ("DateRounder",),
+    "index_catalog": ("IndexCatalog",),
+    "routing": ("RoutingPolicy",),
+    "resilience": ("RetryPolicy", "HedgePolicy", "AdaptiveTimeout"),
+    "limiter": ("ConcurrencyLimiter", "OverloadedError"),
+    "cancellation": ("SearchTracker", "SearchCancelledError"),
+    "async_search": ("AsyncSearchManager", "AsyncSearchHandle"),
+    "fusion": ("FusionPlanner", "FusionBatcher"),
+    "transform": ("Transformer",),
+    "query_executor": ("QueryExecutor",),
+}
+
+_NAME_TO_MODULE = {name: module for module, names in _EXPORTS.items() for name in names}
+_SUBMODULES = {"filter", "sort", "aggregation", "mappings", "nodes", "ir", "writer", "nested", "patterns", "large_terms", "stored", "dates", "index_catalog", "routing", "resilience", "limiter", "cancellation", "async_search", "fusion", "transform", "query_executor",
+               "panel_store", "columnar"}
+
+__all__ = sorted(_NAME_TO_MODULE)
+
+
+def __getattr__(name):
+    if name in _NAME_TO_MODULE:
+        value = getattr(importlib.import_module(f".{_NAME_TO_MODULE[name]}", __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # ✅ Cache so later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_NAME_TO_MODULE) | _SUBMODULES)
@@ -1,3 +1,11 @@
+import copy
+import json
+
+HIGH_CARDINALITY_FIELD_TYPES = {"keyword", "ip", "wildcard"}
+DEFAULT_CARDINALITY_PRECISION = 1000
+VALID_COLLECT_MODES = {"depth_first", "breadth_first"}
+
+
 class BaseAggregation:
     def __init__(self, field, name=None, nested_path=None, nested_filter=None, aggs=None):
         self.field = field
@@ -5,31 +13,75 @@ class BaseAggregation:
         self.nested_path = nested_path
         self.nested_filter = nested_filter
         self.aggs = aggs or {}  # ✅ Ensure sub-aggregations are stored properly
+        self.reverse_nested = None  # ✅ True (root) or a nested path to step back to before aggregating
 
     def _add_nested_clause(self, agg_query):
-        """Wraps an aggregation in a nested clause if a nested path is provided."""
+        """Wraps an aggregation in a nested (or reverse_nested) clause if a nested path is provided."""
         if self.nested_path:
-            nested_query = {
-                "nested": {"path": self.nested_path},
-                "aggs": {self.name: agg_query} if self.name else agg_query,
-            }
-            if self.nested_filter:
-                nested_query["nested"]["filter"] = self.nested_filter
-            return nested_query
-        return agg_query
+            join = {"nested": {"path": self.nested_path}}
+        elif self.reverse_nested:
+            join = {"reverse_nested": {} if self.reverse_nested is True else {"path": self.reverse_nested}}
+        else:
+            return agg_query
+        if self.nested_filter:
+            # ✅ `nested` takes no filter; a `filter` aggregation inside it restricts the nested documents
+            agg_query = {"filter": self.nested_filter, "aggs": {self.name: agg_query}}
+        join["aggs"] = {self.name: agg_query} if self.name else agg_query
+        return join
+
+    def _unwrap_join(self, result):
+        """Splits a response wrapped by `_add_nested_clause` into the join `doc_count`s and the inner result."""
+        counts = []
+        if self.nested_path or self.reverse_nested:
+            levels = 2 if self.nested_filter else 1
+            for _ in range(levels):
+                counts.append(result.get("doc_count"))
+                result = result.get(self.name, {})
+        return counts, result
+
+    def reshape_response(self, response_aggs):
+        """
+        Restores the original names of merged or fused sub-aggregations in this aggregation's response, in place.
+
+        :return: The response names this aggregation's results now live under.
+        """
+        response_name = self.name or self.field
+        sub_aggs = {name: agg for name, agg in self.aggs.items() if isinstance(agg, BaseAggregation)}
+        result = response_aggs.get(response_name)
+        if not sub_aggs or not isinstance(result, dict):
+            return [response_name]
+        _, result = self._unwrap_join(result)
+        buckets = result.get("buckets")
+        if buckets is None:
+            containers = [result]
+        else:
+            containers = buckets.values() if isinstance(buckets, dict) else buckets
+        for container in containers:
+            reshape_aggregations(sub_aggs, container)
+        return [response_name]
 
     def to_elasticsearch(self):
         """Convert aggregation to Elasticsearch format."""
         raise NotImplementedError("Subclasses must implement this method.")
 
 class TermsAggregation(BaseAggregation):
-    def __init__(self, field, name=None, size=10, order=None, nested_path=None, nested_filter=None, aggs=None):
+    def __init__(self, field, name=None, size=10, order=None, nested_path=None, nested_filter=None, aggs=None,
+                 execution_hint=None, shard_size=None, collect_mode=None, min_doc_count=None, shard_min_doc_count=None,
+                 missing=None):
         if not isinstance(field, str):  # ✅ Validate field type
             raise TypeError(f"Field must be a string, got {type(field)}")
+        if collect_mode is not None and collect_mode not in VALID_COLLECT_MODES:
+            raise ValueError(f"Invalid collect_mode '{collect_mode}'. Allowed: {VALID_COLLECT_MODES}")
 
         super().__init__(field, name, nested_path, nested_filter, aggs)
         self.size = size if isinstance(size, int) and size > 0 else 10  # ✅ Validate size
         self.order = order if isinstance(order, dict) else None  # ✅ Validate order format
+        self.execution_hint = execution_hint
+        self.shard_size = shard_size
+        self.collect_mode = collect_mode
+        self.min_doc_count = min_doc_count
+        self.shard_min_doc_count = shard_min_doc_count
+        self.missing = missing
 
     def to_elasticsearch(self):
         """Convert TermsAggregation to an Elasticsearch-compatible format."""
@@ -42,11 +94,23 @@ class TermsAggregation(BaseAggregation):
 
         if self.order:
             terms_agg["terms"]["order"] = self.order
-
-        terms_agg = self._add_nested_clause(terms_agg)
+        if self.execution_hint:
+            terms_agg["terms"]["execution_hint"] = self.execution_hint
+        if self.shard_size is not None:
+            terms_agg["terms"]["shard_size"] = self.shard_size
+        if self.collect_mode:
+            terms_agg["terms"]["collect_mode"] = self.collect_mode
+        if self.min_doc_count is not None:
+            terms_agg["terms"]["min_doc_count"] = self.min_doc_count
+        if self.shard_min_doc_count is not None:
+            terms_agg["terms"]["shard_min_doc_count"] = self.shard_min_doc_count
+        if self.missing is not None:
+            terms_agg["terms"]["missing"] = self.missing
 
         if self.aggs:
-            terms_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            terms_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        terms_agg = self._add_nested_clause(terms_agg)
 
         return {self.name: terms_agg} if self.name else {self.field: terms_agg}  # ✅ Ensure correct nesting
 
@@ -57,6 +121,12 @@ class TermsAggregation(BaseAggregation):
             "name": self.name,
             "size": self.size,
             "order": self.order,
+            "execution_hint": self.execution_hint,
+            "shard_size": self.shard_size,
+            "collect_mode": self.collect_mode,
+            "min_doc_count": self.min_doc_count,
+            "shard_min_doc_count": self.shard_min_doc_count,
+            "missing": self.missing,
             "nested_path": self.nested_path,
             "nested_filter": self.nested_filter
         }
@@ -70,7 +140,13 @@ class TermsAggregation(BaseAggregation):
             size=data.get("size", 10),
             order=data.get("order"),
             nested_path=data.get("nested_path"),
-            nested_filter=data.get("nested_filter")
+            nested_filter=data.get("nested_filter"),
+            execution_hint=data.get("execution_hint"),
+            shard_size=data.get("shard_size"),
+            collect_mode=data.get("collect_mode"),
+            min_doc_count=data.get("min_doc_count"),
+            shard_min_doc_count=data.get("shard_min_doc_count"),
+            missing=data.get("missing")
         )
 
 class AvgAggregation(BaseAggregation):
@@ -95,10 +171,11 @@ class AvgAggregation(BaseAggregation):
 
     def to_elasticsearch(self):
         avg_agg = {"avg": {"field": self.field}}
-        avg_agg = self._add_nested_clause(avg_agg)
-        
+
         if self.aggs:  # Add nested aggregations if present
-            avg_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            avg_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        avg_agg = self._add_nested_clause(avg_agg)
 
         return {self.name: avg_agg} if self.name else avg_agg  # ✅ No wrapping when name is None
 
@@ -135,15 +212,10 @@ class RangeAggregation(BaseAggregation):
 
         # Add nested sub-aggregations if present
         if self.aggs:
-            range_agg["aggs"] = {name: sub_agg.to_elasticsearch() for name, sub_agg in self.aggs.items()}
+            range_agg["aggs"] = _build_sub_aggregations(self.aggs)
 
         # Handle Nested Queries
-        if self.nested_path:
-            nested_query = {"nested": {"path": self.nested_path}}
-            if self.nested_filter:
-                nested_query["nested"]["filter"] = self.nested_filter
-            nested_query["nested"]["aggs"] = {self.name: range_agg} if self.name else range_agg
-            return nested_query
+        range_agg = self._add_nested_clause(range_agg)
 
         return {self.name: range_agg} if self.name else range_agg  # ✅ Name is correctly handled
 
@@ -195,10 +267,10 @@ class HistogramAggregation(BaseAggregation):
         if self.keyed is not None:
             histogram_agg["histogram"]["keyed"] = self.keyed
 
-        histogram_agg = self._add_nested_clause(histogram_agg)
-
         if self.aggs:
-            histogram_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            histogram_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        histogram_agg = self._add_nested_clause(histogram_agg)
 
         return {self.name: histogram_agg} if self.name else histogram_agg
 
@@ -278,12 +350,12 @@ class DateHistogramAggregation(BaseAggregation):
         if self.extended_bounds:
             date_histogram_agg["date_histogram"]["extended_bounds"] = self.extended_bounds
 
-        # ✅ Handle nested aggregation
-        date_histogram_agg = self._add_nested_clause(date_histogram_agg)
-
         # ✅ Add sub-aggregations if they exist
         if self.aggs:
-            date_histogram_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            date_histogram_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        # ✅ Handle nested aggregation
+        date_histogram_agg = self._add_nested_clause(date_histogram_agg)
 
         # ✅ Ensure correct wrapping of aggregation under field name
         return {self.name: date_histogram_agg} if self.name else {self.field: date_histogram_agg}
@@ -332,12 +404,12 @@ class SumAggregation(BaseAggregation):
         """Convert SumAggregation to Elasticsearch-compatible format."""
         sum_agg = {"sum": {"field": self.field}}
 
-        # ✅ Handle nested aggregation
-        sum_agg = self._add_nested_clause(sum_agg)
-
         # ✅ Add sub-aggregations if they exist
         if self.aggs:
-            sum_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            sum_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        # ✅ Handle nested aggregation
+        sum_agg = self._add_nested_clause(sum_agg)
 
         # ✅ Ensure correct wrapping of aggregation under field name
         return {self.name: sum_agg} if self.name else {self.field: sum_agg}
@@ -372,12 +444,12 @@ class MinAggregation(BaseAggregation):
         """Convert MinAggregation to an Elasticsearch-compatible format."""
         min_agg = {"min": {"field": self.field}}
         
-        # ✅ Handle nested paths/filters if applicable
-        min_agg = self._add_nested_clause(min_agg)
-
         # ✅ Add sub-aggregations if they exist
         if self.aggs:
-            min_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            min_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        # ✅ Handle nested paths/filters if applicable
+        min_agg = self._add_nested_clause(min_agg)
 
         # ✅ Ensure correct wrapping of aggregation under field name
         return {self.name: min_agg} if self.name else {self.field: min_agg}
@@ -413,12 +485,12 @@ class MaxAggregation(BaseAggregation):
         """Convert MaxAggregation to an Elasticsearch-compatible format."""
         max_agg = {"max": {"field": self.field}}
         
-        # ✅ Handle nested paths/filters if applicable
-        max_agg = self._add_nested_clause(max_agg)
-
         # ✅ Add sub-aggregations if they exist
         if self.aggs:
-            max_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            max_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        # ✅ Handle nested paths/filters if applicable
+        max_agg = self._add_nested_clause(max_agg)
 
         # ✅ Ensure correct wrapping of aggregation under field name
         return {self.name: max_agg} if self.name else {self.field: max_agg}
@@ -446,10 +518,147 @@ class MaxAggregation(BaseAggregation):
             nested_filter=data.get("nested_filter")
         )
 
+class StatsAggregation(BaseAggregation):
+    """
+    `stats` (or `extended_stats`) over one field. When built by `fuse_metric_aggregations` it also carries
+    `members`: the sibling metric aggregations it replaced, as `{name: stat}`, projected back by `reshape_response`.
+    """
+
+    def __init__(self, field, name=None, extended=False, sigma=None, nested_path=None, nested_filter=None,
+                 members=None):
+        super().__init__(field, name, nested_path, nested_filter)
+        self.extended = extended
+        self.sigma = sigma
+        self.members = members or {}
+
+    def to_elasticsearch(self):
+        agg_type = "extended_stats" if self.extended else "stats"
+        stats_agg = {agg_type: {"field": self.field}}
+        if self.extended and self.sigma is not None:
+            stats_agg[agg_type]["sigma"] = self.sigma
+        stats_agg = self._add_nested_clause(stats_agg)
+        return {self.name: stats_agg} if self.name else {self.field: stats_agg}
+
+    def reshape_response(self, response_aggs):
+        if not self.members:
+            return [self.name or self.field]
+        result = response_aggs.pop(self.name, None)
+        if not isinstance(result, dict):
+            return []
+        counts, stats = self._unwrap_join(result)
+        for member_name, stat in self.members.items():
+            if stat is None:
+                projected = stats  # ✅ A stats aggregation the request asked for itself
+            else:
+                projected = {"value": stats.get(stat)}
+                if f"{stat}_as_string" in stats:
+                    projected["value_as_string"] = stats[f"{stat}_as_string"]
+            for count in reversed(counts):
+                projected = {"doc_count": count, member_name: projected}
+            response_aggs[member_name] = projected
+        return list(self.members)
+
+    def to_json(self):
+        json_data = {
+            "type": "stats_aggregation",
+            "field": self.field,
+            "name": self.name,
+            "extended": self.extended or None,
+            "sigma": self.sigma,
+            "nested_path": self.nested_path,
+            "nested_filter": self.nested_filter,
+            "members": self.members or None
+        }
+        return {k: v for k, v in json_data.items() if v is not None}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            field=data["field"],
+            name=data.get("name"),
+            extended=data.get("extended", False),
+            sigma=data.get("sigma"),
+            nested_path=data.get("nested_path"),
+            nested_filter=data.get("nested_filter"),
+            members=data.get("members")
+        )
+
+class PercentilesAggregation(BaseAggregation):
+    def __init__(self, field, name=None, percents=None, compression=None, hdr_significant_digits=None,
+                 nested_path=None, nested_filter=None, members=None):
+        """
+        Initialize a PercentilesAggregation.
+
+        :param percents: (Optional) Percentiles to compute (Elasticsearch defaults to 1, 5, 25, 50, 75, 95, 99).
+        :param compression: (Optional) TDigest compression; higher is more accurate and uses more memory.
+        :param hdr_significant_digits: (Optional) Use HDR histograms with this many significant digits instead.
+        :param members: Set by `fuse_metric_aggregations`: `{name: percents}` of the siblings it replaced.
+        """
+        if compression is not None and hdr_significant_digits is not None:
+            raise ValueError("Use either TDigest compression or HDR significant digits, not both.")
+        super().__init__(field, name, nested_path, nested_filter)
+        self.percents = sorted(set(float(p) for p in percents)) if percents else None
+        self.compression = compression
+        self.hdr_significant_digits = hdr_significant_digits
+        self.members = members or {}
+
+    def to_elasticsearch(self):
+        percentiles_agg = {"percentiles": {"field": self.field}}
+        if self.percents:
+            percentiles_agg["percentiles"]["percents"] = self.percents
+        if self.compression is not None:
+            percentiles_agg["percentiles"]["tdigest"] = {"compression": self.compression}
+        if self.hdr_significant_digits is not None:
+            percentiles_agg["percentiles"]["hdr"] = {"number_of_significant_value_digits": self.hdr_significant_digits}
+        percentiles_agg = self._add_nested_clause(percentiles_agg)
+        return {self.name: percentiles_agg} if self.name else {self.field: percentiles_agg}
+
+    def reshape_response(self, response_aggs):
+        if not self.members:
+            return [self.name or self.field]
+        result = response_aggs.pop(self.name, None)
+        if not isinstance(result, dict):
+            return []
+        counts, percentiles = self._unwrap_join(result)
+        values = percentiles.get("values", {})
+        for member_name, percents in self.members.items():
+            projected = {"values": {key: value for key, value in values.items() if float(key) in percents}}
+            for count in reversed(counts):
+                projected = {"doc_count": count, member_name: projected}
+            response_aggs[member_name] = projected
+        return list(self.members)
+
+    def to_json(self):
+        json_data = {
+            "type": "percentiles_aggregation",
+            "field": self.field,
+            "name": self.name,
+            "percents": self.percents,
+            "compression": self.compression,
+            "hdr_significant_digits": self.hdr_significant_digits,
+            "nested_path": self.nested_path,
+            "nested_filter": self.nested_filter
+        }
+        return {k: v for k, v in json_data.items() if v is not None}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            field=data["field"],
+            name=data.get("name"),
+            percents=data.get("percents"),
+            compression=data.get("compression"),
+            hdr_significant_digits=data.get("hdr_significant_digits"),
+            nested_path=data.get("nested_path"),
+            nested_filter=data.get("nested_filter")
+        )
+
 class CardinalityAggregation(BaseAggregation):
-    def __init__(self, field, name=None, precision_threshold=None, nested_path=None, nested_filter=None, aggs=None):
+    def __init__(self, field, name=None, precision_threshold=None, nested_path=None, nested_filter=None, aggs=None,
+                 execution_hint=None):
         super().__init__(field, name, nested_path, nested_filter, aggs)
         self.precision_threshold = precision_threshold
+        self.execution_hint = execution_hint
 
     def to_elasticsearch(self):
         """Convert CardinalityAggregation to an Elasticsearch-compatible format."""
@@ -458,13 +667,15 @@ class CardinalityAggregation(BaseAggregation):
         # ✅ Add precision_threshold if present
         if self.precision_threshold is not None:
             cardinality_agg["cardinality"]["precision_threshold"] = self.precision_threshold
-
-        # ✅ Handle nested paths/filters if applicable
-        cardinality_agg = self._add_nested_clause(cardinality_agg)
+        if self.execution_hint:
+            cardinality_agg["cardinality"]["execution_hint"] = self.execution_hint
 
         # ✅ Add sub-aggregations if they exist
         if self.aggs:
-            cardinality_agg["aggs"] = build_aggregation_query_class(self.aggs)
+            cardinality_agg["aggs"] = _build_sub_aggregations(self.aggs)
+
+        # ✅ Handle nested paths/filters if applicable
+        cardinality_agg = self._add_nested_clause(cardinality_agg)
 
         # ✅ Ensure correct wrapping of aggregation under field name
         return {self.name: cardinality_agg} if self.name else {self.field: cardinality_agg}
@@ -476,6 +687,7 @@ class CardinalityAggregation(BaseAggregation):
             "field": self.field,
             "name": self.name,
             "precision_threshold": self.precision_threshold,
+            "execution_hint": self.execution_hint,
             "nested_path": self.nested_path,
             "nested_filter": self.nested_filter
         }
@@ -491,7 +703,8 @@ class CardinalityAggregation(BaseAggregation):
             name=data.get("name"),
             precision_threshold=data.get("precision_threshold"),
             nested_path=data.get("nested_path"),
-            nested_filter=data.get("nested_filter")
+            nested_filter=data.get("nested_filter"),
+            execution_hint=data.get("execution_hint")
         )
 
 class CompositeAggregation(BaseAggregation):
@@ -516,7 +729,7 @@ class CompositeAggregation(BaseAggregation):
 
         # ✅ Add sub-aggregations if present
         if self.aggs:
-            composite_agg["aggs"] = {name: agg.to_elasticsearch() for name, agg in self.aggs.items()}
+            composite_agg["aggs"] = _build_sub_aggregations(self.aggs)
 
         return {self.name: self._add_nested_clause(composite_agg)} if self.name else self._add_nested_clause(composite_agg)
     
@@ -549,6 +762,380 @@ class CompositeAggregation(BaseAggregation):
             nested_filter=data.get("nested_filter")
         )
 
+class SamplerAggregation(BaseAggregation):
+    """Restricts sub-aggregations to the top-scoring `shard_size` documents on each shard."""
+
+    agg_type = "sampler"
+
+    def __init__(self, name, aggs, shard_size=None):
+        if not name:
+            raise ValueError(f"A name must be provided for {self.__class__.__name__}.")
+        super().__init__(None, name, None, None, aggs)
+        self.shard_size = shard_size
+
+    def _sampler_options(self):
+        return {"shard_size": self.shard_size} if self.shard_size is not None else {}
+
+    def to_elasticsearch(self):
+        sampler_agg = {self.agg_type: self._sampler_options()}
+        if self.aggs:
+            sampler_agg["aggs"] = _build_sub_aggregations(self.aggs)
+        return {self.name: sampler_agg}
+
+    def to_json(self):
+        json_data = {"type": f"{self.agg_type}_aggregation", "name": self.name, **self._sampler_options()}
+        json_data["aggs"] = {name: agg.to_json() if isinstance(agg, BaseAggregation) else agg for name, agg in self.aggs.items()}
+        return json_data
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(name=data["name"], aggs=data.get("aggs"), shard_size=data.get("shard_size"))
+
+class DiversifiedSamplerAggregation(SamplerAggregation):
+    """Sampler that caps the number of sampled documents sharing a value of `field`."""
+
+    agg_type = "diversified_sampler"
+
+    def __init__(self, name, aggs, field, shard_size=None, max_docs_per_value=None, execution_hint=None):
+        super().__init__(name, aggs, shard_size)
+        self.field = field
+        self.max_docs_per_value = max_docs_per_value
+        self.execution_hint = execution_hint
+
+    def _sampler_options(self):
+        options = {"field": self.field, **super()._sampler_options()}
+        if self.max_docs_per_value is not None:
+            options["max_docs_per_value"] = self.max_docs_per_value
+        if self.execution_hint:
+            options["execution_hint"] = self.execution_hint
+        return options
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            name=data["name"],
+            aggs=data.get("aggs"),
+            field=data["field"],
+            shard_size=data.get("shard_size"),
+            max_docs_per_value=data.get("max_docs_per_value"),
+            execution_hint=data.get("execution_hint")
+        )
+
+class RandomSamplerAggregation(SamplerAggregation):
+    """Runs sub-aggregations over a random `probability` fraction of the matching documents."""
+
+    agg_type = "random_sampler"
+
+    def __init__(self, name, aggs, probability, seed=None):
+        if not 0 < probability <= 0.5 and probability != 1:
+            raise ValueError("Random sampler probability must be in (0, 0.5] or exactly 1.")
+        super().__init__(name, aggs)
+        self.probability = probability
+        self.seed = seed
+
+    def _sampler_options(self):
+        options = {"probability": self.probability}
+        if self.seed is not None:
+            options["seed"] = self.seed
+        return options
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(name=data["name"], aggs=data.get("aggs"), probability=data["probability"], seed=data.get("seed"))
+
+class NestedAggregationGroup(BaseAggregation):
+    """
+    Runs sibling aggregations that share a nested path (or reverse_nested target) and nested filter under a
+    single join, so Elasticsearch walks the nested documents once. `reshape_response` puts each member's
+    result back under its own name, in the shape it would have had on its own.
+    """
+
+    def __init__(self, name, aggs, path=None, nested_filter=None, reverse=False):
+        """
+        :param aggs: Member aggregations, with their own nested path/filter removed.
+        :param path: Nested path to join (or, with `reverse`, the path to step back to; None for the root).
+        :param nested_filter: (Optional) Query restricting the joined documents.
+        :param reverse: Emit a `reverse_nested` join instead of `nested`.
+        """
+        super().__init__(None, name, None, nested_filter, aggs)
+        self.path = path
+        self.reverse = reverse
+
+    @property
+    def filter_name(self):
+        return f"{self.name}_filter"
+
+    def to_elasticsearch(self):
+        if self.reverse:
+            join = {"reverse_nested": {"path": self.path} if self.path else {}}
+        else:
+            join = {"nested": {"path": self.path}}
+        members = _build_sub_aggregations(self.aggs)
+        if self.nested_filter:
+            members = {self.filter_name: {"filter": self.nested_filter, "aggs": members}}
+        return {self.name: {**join, "aggs": members}}
+
+    def reshape_response(self, response_aggs):
+        result = response_aggs.pop(self.name, None)
+        if not isinstance(result, dict):
+            return []
+        joined = result.get(self.filter_name, {}) if self.nested_filter else result
+        names = []
+        for agg in self.aggs.values():
+            for name in agg.reshape_response(joined):
+                member = {"doc_count": joined.get("doc_count"), name: joined.get(name)}
+                if self.nested_filter:
+                    member = {"doc_count": result.get("doc_count"), name: member}
+                response_aggs[name] = member
+                names.append(name)
+        return names
+
+    def to_json(self):
+        json_data = {
+            "type": "nested_group_aggregation",
+            "name": self.name,
+            "path": self.path,
+            "nested_filter": self.nested_filter,
+            "reverse": self.reverse or None,
+            "aggs": {name: agg.to_json() for name, agg in self.aggs.items()}
+        }
+        return {k: v for k, v in json_data.items() if v is not None}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(name=data["name"], aggs=data.get("aggs"), path=data.get("path"),
+                   nested_filter=data.get("nested_filter"), reverse=data.get("reverse", False))
+
+METRIC_STATS = {
+    MinAggregation: "min",
+    MaxAggregation: "max",
+    AvgAggregation: "avg",
+    SumAggregation: "sum",
+}
+
+SAMPLER_CLASSES = {
+    "sampler": SamplerAggregation,
+    "diversified_sampler": DiversifiedSamplerAggregation,
+    "random_sampler": RandomSamplerAggregation,
+}
+
+def _build_sub_aggregations(aggs):
+    """Emits sub-aggregations given either as aggregation objects or in the simplified data model."""
+    aggs_query = {}
+    for agg in create_aggregation_tree(aggs).values():
+        aggs_query.update(agg.to_elasticsearch())
+    return aggs_query
+
+def reshape_aggregations(aggs, response_aggs):
+    """Rewrites an `aggregations` response section in place so merged aggregations appear under their original names."""
+    for agg in list(aggs.values()):
+        if hasattr(agg, "reshape_response"):
+            agg.reshape_response(response_aggs)
+
+def _join_key(agg):
+    """Identifies the nested join an aggregation is wrapped in, or None."""
+    if not isinstance(agg, BaseAggregation) or isinstance(agg, NestedAggregationGroup):
+        return None
+    if agg.nested_path:
+        join = ("nested", agg.nested_path)
+    elif agg.reverse_nested:
+        join = ("reverse_nested", None if agg.reverse_nested is True else agg.reverse_nested)
+    else:
+        return None
+    return join + (json.dumps(agg.nested_filter, sort_keys=True, default=str),)
+
+def merge_nested_aggregations(aggs):
+    """
+    Collects sibling aggregations sharing a nested join and nested filter under one NestedAggregationGroup, at
+    every level of the tree. Returns a new tree; the aggregations passed in are not modified.
+    """
+    processed = {}
+    for name, agg in aggs.items():
+        if isinstance(agg, BaseAggregation) and agg.aggs and all(isinstance(a, BaseAggregation) for a in agg.aggs.values()):
+            agg = copy.copy(agg)
+            agg.aggs = merge_nested_aggregations(agg.aggs)
+        processed[name] = agg
+
+    members = {}
+    for name, agg in processed.items():
+        key = _join_key(agg)
+        if key is not None:
+            members.setdefault(key, []).append(name)
+
+    merged = {}
+    for name, agg in processed.items():
+        key = _join_key(agg)
+        if key is None or len(members[key]) < 2:
+            merged[name] = agg
+            continue
+        if name != members[key][0]:
+            continue
+
+        kind, path, _ = key
+        group_name = f"{path or 'root'}__{kind}"
+        while group_name in processed or group_name in merged:
+            group_name += "_"
+        group_aggs = {}
+        for member_name in members[key]:
+            member = copy.copy(processed[member_name])
+            member.nested_path = member.nested_filter = member.reverse_nested = None
+            group_aggs[member_name] = member
+        merged[group_name] = NestedAggregationGroup(group_name, group_aggs, path, agg.nested_filter, kind == "reverse_nested")
+    return merged
+
+def _fusion_key(agg):
+    """Identifies the sibling metric aggregations that one stats or percentiles aggregation can answer, or None."""
+    if agg.aggs:
+        return None
+    if isinstance(agg, (MinAggregation, MaxAggregation, AvgAggregation, SumAggregation)):
+        kind = "stats"
+    elif isinstance(agg, StatsAggregation) and not agg.members and agg.sigma is None:
+        kind = "stats"
+    elif isinstance(agg, PercentilesAggregation) and agg.percents and not agg.members:
+        # ✅ Only percentiles with the same accuracy settings can share one sketch
+        kind = ("percentiles", agg.compression, agg.hdr_significant_digits)
+    else:
+        return None
+    return kind, agg.field, _join_key(agg)
+
+def _fuse(group_name, group):
+    """Builds the one aggregation answering every aggregation of a fusion group."""
+    group = [(agg.name or agg.field, agg) for agg in group]
+    first = group[0][1]
+    if isinstance(first, PercentilesAggregation):
+        fused = PercentilesAggregation(
+            first.field, group_name, [p for _, agg in group for p in agg.percents], first.compression,
+            first.hdr_significant_digits, members={name: set(agg.percents) for name, agg in group}
+        )
+    else:
+        members = {name: METRIC_STATS.get(type(agg)) for name, agg in group}
+        extended = any(isinstance(agg, StatsAggregation) and agg.extended for _, agg in group)
+        fused = StatsAggregation(first.field, group_name, extended=extended, members=members)
+    fused.nested_path = first.nested_path
+    fused.nested_filter = first.nested_filter
+    fused.reverse_nested = first.reverse_nested
+    return fused
+
+def _ordered_by(agg, name):
+    """Whether the bucket `order` of `agg` refers to its sub-aggregation `name` (e.g. `name`, `name.max`)."""
+    order = getattr(agg, "order", None)
+    if not isinstance(order, dict):
+        return False
+    return any(path == name or path.startswith((f"{name}.", f"{name}>")) for path in order)
+
+def fuse_metric_aggregations(aggs, parent=None):
+    """
+    Replaces sibling min/max/avg/sum/stats aggregations over the same field (and nested join) with one `stats`
+    (or `extended_stats`) aggregation, and sibling percentiles over the same field with one percentiles
+    aggregation computing the union of their percents, at every level of the tree. Each field is then read
+    once per bucket instead of once per metric. `reshape_response` projects the fused results back under the
+    original names. Returns a new tree; the aggregations passed in are not modified.
+
+    Metrics the parent's bucket `order` refers to keep their name, so the order path stays valid.
+
+    :param parent: (Optional) The aggregation `aggs` are the sub-aggregations of.
+    """
+    processed = {}
+    for name, agg in aggs.items():
+        if isinstance(agg, BaseAggregation) and agg.aggs and all(isinstance(a, BaseAggregation) for a in agg.aggs.values()):
+            agg = copy.copy(agg)
+            agg.aggs = fuse_metric_aggregations(agg.aggs, agg)
+        processed[name] = agg
+
+    def fusion_key(name, agg):
+        if not isinstance(agg, BaseAggregation) or _ordered_by(parent, name):
+            return None
+        return _fusion_key(agg)
+
+    groups = {}
+    for name, agg in processed.items():
+        key = fusion_key(name, agg)
+        if key is not None:
+            groups.setdefault(key, []).append(name)
+
+    fused = {}
+    for name, agg in processed.items():
+        key = fusion_key(name, agg)
+        if key is None or len(groups[key]) < 2:
+            fused[name] = agg
+            continue
+        if name != groups[key][0]:
+            continue
+
+        suffix = "stats" if key[0] == "stats" else "percentiles"
+        group_name = f"{agg.field}__{suffix}"
+        while group_name in processed or group_name in fused:
+            group_name += "_"
+        fused[group_name] = _fuse(group_name, [processed[member] for member in groups[key]])
+    return fused
+
+def plan_aggregations(aggs, fuse_metrics=False):
+    """
+    Applies the response-preserving rewrites to a compiled aggregation tree: metric fusion, then nested merging.
+
+    :param fuse_metrics: Also fuse sibling metrics (see fuse_metric_aggregations). Fused results come back under
+                         new names, so only callers that reshape every response should enable it.
+    """
+    if fuse_metrics:
+        aggs = fuse_metric_aggregations(aggs)
+    return merge_nested_aggregations(aggs)
+
+def apply_nested_paths(aggs, mappings, current_path=None):
+    """
+    Sets `nested_path` on aggregations over fields under a nested mapping, and `reverse_nested` on
+    aggregations that step from a nested context back to their parent documents. Explicit settings win.
+    """
+    for agg in aggs.values():
+        if not isinstance(agg, BaseAggregation):
+            continue
+        path = current_path
+        if agg.field and not agg.nested_path and not agg.reverse_nested:
+            path = mappings.nested_path(agg.field)
+            if path and path != current_path and (current_path is None or path.startswith(f"{current_path}.")):
+                agg.nested_path = path
+            elif current_path and path != current_path and (path is None or current_path.startswith(f"{path}.")):
+                agg.reverse_nested = path or True
+            else:
+                path = current_path
+        elif agg.nested_path:
+            path = agg.nested_path
+        if agg.aggs:
+            apply_nested_paths(agg.aggs, mappings, path)
+
+def default_aggregation_options(agg, field_type):
+    """Returns the options the transformer applies by default to an aggregation over a mapped field type."""
+    if field_type not in HIGH_CARDINALITY_FIELD_TYPES:
+        return {}
+    if isinstance(agg, TermsAggregation):
+        # ✅ Each shard returns only its top `size` terms instead of ~1.5x: fewer buckets to build and merge,
+        # at the cost of approximate counts in the long tail
+        return {"shard_size": agg.size}
+    if isinstance(agg, CardinalityAggregation):
+        # ✅ Exact below the threshold, with a third of the default's memory per bucket beyond it
+        return {"precision_threshold": DEFAULT_CARDINALITY_PRECISION}
+    return {}
+
+def apply_field_type_defaults(aggs, mappings):
+    """Fills in per-field-type defaults on an aggregation tree without overriding explicit options."""
+    for agg in aggs.values():
+        if not isinstance(agg, BaseAggregation):
+            continue
+        for option, value in default_aggregation_options(agg, mappings.field_type(agg.field)).items():
+            if getattr(agg, option) is None:
+                setattr(agg, option, value)
+        if agg.aggs:
+            apply_field_type_defaults(agg.aggs, mappings)
+
+def create_sampler_aggregation(name, aggs, sampler):
+    """Builds the sampler aggregation requested by the dict data model (`sampler: <shard_size>` or a dict)."""
+    if not isinstance(sampler, dict):
+        sampler = {"type": "sampler", "shard_size": sampler}
+    options = dict(sampler)
+    sampler_type = options.pop("type", "sampler")
+    if sampler_type not in SAMPLER_CLASSES:
+        raise ValueError(f"Invalid sampler type '{sampler_type}'. Allowed: {set(SAMPLER_CLASSES)}")
+    return SAMPLER_CLASSES[sampler_type](name=name, aggs=aggs, **options)
+
 def create_single_aggregation_object(agg_def, name=None):
     """Creates a single aggregation object from a definition, supporting both traditional and simplified formats."""
     if isinstance(agg_def, dict):
@@ -599,50 +1186,104 @@ def create_aggregation_object(agg_data):
 
     return agg_objects
 
-def build_aggregation_query_class(aggs_data):
-    """Converts simplified aggregation definitions into Elasticsearch-compatible format with correct nesting and order."""
+METRIC_SHORTHANDS = {"min", "max", "avg", "sum", "stats", "extended_stats", "percentiles"}
+
+def create_metric_aggregation(name, agg_type, field, options=None):
+    """
+    Creates a metric aggregation from the `[type, field]` or `[type, field, {options}]` shorthand.
+
+    Options: `sigma` for extended_stats; `percents`, `compression` and `hdr_significant_digits` for percentiles.
+    """
+    options = options or {}
+    if agg_type == "percentiles":
+        return PercentilesAggregation(
+            field, name, percents=options.get("percents"), compression=options.get("compression"),
+            hdr_significant_digits=options.get("hdr_significant_digits")
+        )
+    if agg_type in ("stats", "extended_stats"):
+        return StatsAggregation(field, name, extended=agg_type == "extended_stats", sigma=options.get("sigma"))
+    metric_classes = {"min": MinAggregation, "max": MaxAggregation, "avg": AvgAggregation, "sum": SumAggregation}
+    return metric_classes[agg_type](field, name)
+
+TERMS_MODEL_OPTIONS = ("execution_hint", "shard_size", "collect_mode", "min_doc_count", "shard_min_doc_count", "missing")
+
+def _terms_model_options(agg_def):
+    """Collects terms options from the dict data model, accepting them at the top level or under `terms`."""
+    options = {}
+    terms_def = agg_def.get("terms")
+    if isinstance(terms_def, dict):
+        options.update({k: v for k, v in terms_def.items() if k != "field"})
+    elif isinstance(terms_def, int):
+        options["size"] = terms_def
+    options.update({k: agg_def[k] for k in ("size", "order", *TERMS_MODEL_OPTIONS) if k in agg_def})
+    return options
+
+def create_aggregation_tree(aggs_data, mappings=None):
+    """
+    Compiles the simplified aggregation data model into aggregation objects, keyed by response name.
+
+    `["terms", size]` entries become terms aggregations. Dict entries become terms aggregations with their
+    own `aggs`; every dict entry after the first is nested under the first one. An entry with a `sampler`
+    is wrapped, where it sits in the tree, in a sampler aggregation named `<name>_sample`.
+    Aggregation objects are compiled from copies, named after their key when unnamed, so the caller's
+    definitions are never modified.
+    """
     if not aggs_data:
         return {}
 
-    aggs_query = {}
+    tree = {}
     parent_agg = None
+    samplers = []  # ✅ (aggregations holding the entry, name, sampler)
 
     for name, agg_def in aggs_data.items():
-        if isinstance(agg_def, list):  # ✅ Handle ["terms", size] shorthand
+        if isinstance(agg_def, BaseAggregation):
+            agg_def = copy.deepcopy(agg_def)  # ✅ Names and nested paths set below stay off the caller's object
+            agg_def.name = agg_def.name or name
+            tree[name] = agg_def
+
+        elif isinstance(agg_def, list) and agg_def and agg_def[0] in METRIC_SHORTHANDS:
+            tree[name] = create_metric_aggregation(name, *agg_def)
+
+        elif isinstance(agg_def, list):  # ✅ Handle ["terms", size] shorthand
             agg_type, size = agg_def
             if agg_type == "terms":
-                aggs_query[name] = {
-                    "terms": {
-                        "field": name,
-                        "size": int(size),
-                        "order": {"_count": "desc"}  # ✅ Default order unless overridden
-                    }
-                }
+                tree[name] = TermsAggregation(field=name, name=name, size=int(size), order={"_count": "desc"})
                 if not parent_agg:
                     parent_agg = name  # ✅ Set the first aggregation as the root
 
         elif isinstance(agg_def, dict):  # ✅ Handle nested aggregations
-            size = int(agg_def.get("size", 10))
-            order = agg_def.get("order", {"_count": "desc"})  # ✅ Extract order if available, default to "_count"
-            nested_aggs = agg_def.get("aggs", {})
-
-            terms_agg = {
-                "terms": {
-                    "field": name,
-                    "size": size,
-                    "order": order  # ✅ Ensure order is applied
-                }
-            }
+            options = _terms_model_options(agg_def)
+            size = int(options.pop("size", 10))
+            order = options.pop("order", {"_count": "desc"})  # ✅ Extract order if available, default to "_count"
 
-            if nested_aggs:
-                terms_agg["aggs"] = build_aggregation_query_class(nested_aggs)
+            terms_agg = TermsAggregation(
+                field=name, name=name, size=size, order=order,
+                aggs=create_aggregation_tree(agg_def.get("aggs", {})), **options
+            )
 
             if not parent_agg:
                 # ✅ First aggregation becomes the root
-                aggs_query[name] = terms_agg
+                container = tree
                 parent_agg = name
             else:
                 # ✅ Nest all subsequent aggregations under the first one
-                aggs_query[parent_agg].setdefault("aggs", {})[name] = terms_agg
+                container = tree[parent_agg].aggs
+            container[name] = terms_agg
 
-    return aggs_query
+            if "sampler" in agg_def:
+                samplers.append((container, name, agg_def["sampler"]))
+
+    if mappings is not None:
+        apply_field_type_defaults(tree, mappings)
+        apply_nested_paths(tree, mappings)
+
+    # ✅ Sampling wraps the finished aggregation so nesting above still applies
+    for container, name, sampler in samplers:
+        sampler_agg = create_sampler_aggregation(f"{name}_sample", {name: container.pop(name)}, sampler)
+        container[sampler_agg.name] = sampler_agg
+
+    return tree
+
+def build_aggregation_query_class(aggs_data, mappings=None):
+    """Converts simplified aggregation definitions into Elasticsearch-compatible format with correct nesting and order."""
+    return _build_sub_aggregations(create_aggregation_tree(aggs_data, mappings))
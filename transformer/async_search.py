@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+
+from transformer.ir import CompiledRequest
+from transformer.stored import TemplateRequest
+
+logger = logging.getLogger(__name__)
+
+HANDLE_FILTER_PATHS = ["id", "is_running", "is_partial", "start_time_in_millis", "expiration_time_in_millis"]
+DEFAULT_ABANDON_AFTER = 300
+DEFAULT_STREAM_DURATION = 30
+
+
+def async_filter_path(filter_path):
+    """Maps a search `filter_path` onto an async search response, which nests the search response."""
+    if not filter_path:
+        return None
+    return HANDLE_FILTER_PATHS + [f"response.{path}" for path in filter_path]
+
+
+class AsyncSearchHandle:
+    def __init__(self, id, is_running, is_partial, expires_at=None, response=None):
+        """
+        State of an async search, as returned by a submit or a poll.
+
+        :param id: Async search id, or None when the search completed within the submit wait and was not kept.
+        :param is_running: Whether the search is still running on the cluster.
+        :param is_partial: Whether `response` holds partial results (still running, or failed on some shards).
+        :param expires_at: Epoch milliseconds after which the cluster deletes the search and its results.
+        :param response: The (possibly partial) search response; None for a status poll.
+        """
+        self.id = id
+        self.is_running = is_running
+        self.is_partial = is_partial
+        self.expires_at = expires_at
+        self.response = response
+
+    @classmethod
+    def from_response(cls, body):
+        body = getattr(body, "body", body)
+        return cls(body.get("id"), body.get("is_running", False), body.get("is_partial", False),
+                   body.get("expiration_time_in_millis"), body.get("response"))
+
+    def to_json(self):
+        data = {"id": self.id, "is_running": self.is_running, "is_partial": self.is_partial,
+                "expires_at": self.expires_at}
+        if self.response is not None:
+            data["response"] = self.response
+        return data
+
+
+class AsyncSearchManager:
+    def __init__(self, executor, wait_for_completion_timeout="1s", keep_alive="5m", batched_reduce_size=5,
+                 keep_on_completion=False, abandon_after=DEFAULT_ABANDON_AFTER, priority="batch", clock=time.time):
+        """
+        Runs long searches with `_async_search`: a submit returns a handle within `wait_for_completion_timeout`
+        and the results are then polled, so no request worker waits for the whole search.
+
+        Handles submitted through this manager are tracked; those not polled for `abandon_after` seconds are
+        deleted from the cluster by `cleanup()` (called on every submit) instead of living until `keep_alive`.
+
+        :param executor: QueryExecutor whose index, pruning, routing and trimming settings are used. Submits
+                         take a slot of its limiter and are registered with its tracker.
+        :param keep_alive: How long the cluster keeps a search after each poll. A submit cannot set it, so
+                           searches nobody polls keep the cluster default until `cleanup()` deletes them.
+        :param keep_on_completion: Also store searches that complete within the submit wait, so they can be
+                                   fetched again by id.
+        :param batched_reduce_size: Shard results reduced at a time, which is how often partial aggregations
+                                    become visible.
+        :param priority: Limiter priority of submits.
+        :param clock: Time source, injectable for tests.
+        """
+        self.executor = executor
+        self.wait_for_completion_timeout = wait_for_completion_timeout
+        self.keep_alive = keep_alive
+        self.keep_on_completion = keep_on_completion
+        self.batched_reduce_size = batched_reduce_size
+        self.abandon_after = abandon_after
+        self.priority = priority
+        self.clock = clock
+        self._handles = {}  # id → {"filter_path", "request", "expires_at", "last_polled"}
+        self._lock = threading.Lock()
+
+    def _track(self, handle, filter_path=None, request=None, submitted=False):
+        with self._lock:
+            if handle.id is None:
+                return
+            if not handle.is_running and not submitted:
+                tracked = self._handles.get(handle.id)
+                if tracked is not None:
+                    tracked["last_polled"] = self.clock()
+                    tracked["expires_at"] = handle.expires_at
+                return
+            tracked = self._handles.setdefault(handle.id, {"filter_path": filter_path, "request": request})
+            tracked["expires_at"] = handle.expires_at
+            tracked["last_polled"] = self.clock()
+
+    def submit(self, query, filter_path=None, session=None, opaque_id=None):
+        """
+        Submits a query and waits up to `wait_for_completion_timeout` for it. Submits are neither retried nor
+        hedged, since each one starts a new search on the cluster.
+
+        :param query: Search body, or a CompiledRequest whose `reshape_response` is then applied to the results
+                      of this submit and of every later poll.
+        """
+        if isinstance(query, TemplateRequest):
+            raise ValueError("Async search does not run stored templates; submit the rendered body")
+        request = None
+        if isinstance(query, CompiledRequest):
+            request, query = query, query.body()
+        self.cleanup()
+        _, params = self.executor.search_request(query, filter_path, session)
+        filter_path = params.pop("filter_path", None)
+        params.update({
+            "wait_for_completion_timeout": self.wait_for_completion_timeout,
+            "keep_on_completion": self.keep_on_completion,
+            "batched_reduce_size": self.batched_reduce_size,
+        })
+        if filter_path:
+            params["filter_path"] = async_filter_path(filter_path)
+        handle = AsyncSearchHandle.from_response(
+            self.executor.send("async_search.submit", params, None, opaque_id, self.priority))
+        self._reshape(handle, request)
+        self._track(handle, filter_path, request, submitted=True)
+        return handle
+
+    def _reshape(self, handle, request):
+        if request is not None and handle.response:
+            request.reshape_response(handle.response)
+
+    def poll(self, id, wait_for_completion_timeout=None):
+        """Returns the current, possibly partial, results of an async search; NotFoundError once it expired."""
+        params = {"id": id, "keep_alive": self.keep_alive}
+        if wait_for_completion_timeout:
+            params["wait_for_completion_timeout"] = wait_for_completion_timeout
+        with self._lock:
+            tracked = self._handles.get(id)
+        if tracked is not None and tracked["filter_path"]:
+            params["filter_path"] = async_filter_path(tracked["filter_path"])
+        handle = AsyncSearchHandle.from_response(self.executor.send("async_search.get", params, None))
+        self._reshape(handle, tracked and tracked["request"])
+        self._track(handle)
+        return handle
+
+    def status(self, id):
+        """Returns whether an async search is still running, without fetching its results."""
+        return AsyncSearchHandle.from_response(self.executor.send("async_search.status", {"id": id}, None))
+
+    def delete(self, id):
+        """Cancels an async search if it is still running and deletes its results."""
+        with self._lock:
+            self._handles.pop(id, None)
+        self.executor.send("async_search.delete", {"id": id}, None)
+
+    def stream(self, id, wait_for_completion_timeout="1s", max_duration=DEFAULT_STREAM_DURATION):
+        """
+        Yields the async search's handle each time its partial results may have changed, until it completes or
+        `max_duration` seconds have passed; a caller still waiting then polls or streams again.
+        """
+        deadline = self.clock() + max_duration
+        while True:
+            handle = self.poll(id, wait_for_completion_timeout)
+            yield handle
+            if not handle.is_running or self.clock() >= deadline:
+                return
+
+    def cleanup(self):
+        """Forgets expired handles and deletes those nobody polled for `abandon_after` seconds."""
+        now = self.clock()
+        with self._lock:
+            expired = [id for id, tracked in self._handles.items()
+                       if tracked["expires_at"] is not None and tracked["expires_at"] <= now * 1000]
+            abandoned = [id for id, tracked in self._handles.items()
+                         if id not in expired and now - tracked["last_polled"] >= self.abandon_after]
+            for id in expired + abandoned:
+                del self._handles[id]
+        for id in abandoned:
+            try:
+                self.executor.send("async_search.delete", {"id": id}, None)
+            except Exception as e:  # ✅ It still expires on the cluster after `keep_alive`
+                logger.warning("Could not delete abandoned async search '%s': %s", id, e)
+        return abandoned
+
+    def tracked(self):
+        with self._lock:
+            return sorted(self._handles)
@@ -0,0 +1,123 @@
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SEARCH_ACTIONS = "indices:data/read/search*"
+CANCEL_REASONS = ("client", "deadline", "superseded", "hedge_lost")
+ATTEMPT_REASONS = {"deadline", "hedge_lost"}  # ✅ Stop one attempt; the search itself may still be retried or won
+
+
+class SearchCancelledError(RuntimeError):
+    """Raised when a search fails because it was cancelled on purpose."""
+
+    def __init__(self, opaque_id, reason):
+        self.opaque_id = opaque_id
+        self.reason = reason
+        super().__init__(f"Search '{opaque_id}' was cancelled ({reason})")
+
+
+class DuplicateSearchError(ValueError):
+    """Raised when a search is registered under an opaque id that is already in flight."""
+
+    def __init__(self, opaque_id):
+        self.opaque_id = opaque_id
+        super().__init__(f"Search '{opaque_id}' is already in flight")
+
+
+class SearchTracker:
+    def __init__(self, actions=SEARCH_ACTIONS):
+        """
+        Registry of the searches in flight, by `X-Opaque-Id`, so their work on the cluster can be cancelled
+        through the tasks API once nobody is waiting for the result.
+
+        A search may be registered under a key (e.g. a panel of one user's dashboard); a newer search with the
+        same key supersedes it and the older one is cancelled. A search may also have an owner (e.g. a session
+        id); clients then cancel it with `cancel_owned`. Attempts of one search (hedged duplicates) use ids of
+        the form `<opaque_id>/<suffix>` and are cancelled with it.
+
+        :param actions: Task actions searched for cancellable tasks.
+        """
+        self.actions = actions
+        self._searches = {}  # opaque id → {"client", "key", "owner", "cancelled"}
+        self._by_key = {}
+        self._cancelled = dict.fromkeys(CANCEL_REASONS, 0)
+        self._lock = threading.Lock()
+
+    def begin(self, client, opaque_id=None, key=None, owner=None):
+        """
+        Registers a search sent through `client` and returns its opaque id; supersedes the key's last search.
+
+        :raises ValueError: The id is invalid.
+        :raises DuplicateSearchError: The id is already in flight (ids must be unique, e.g. per session).
+        """
+        opaque_id = opaque_id or uuid.uuid4().hex
+        if "/" in opaque_id:
+            raise ValueError(f"Invalid opaque id '{opaque_id}': '/' separates the attempts of a search")
+        with self._lock:
+            if opaque_id in self._searches:
+                raise DuplicateSearchError(opaque_id)
+            self._searches[opaque_id] = {"client": client, "key": key, "owner": owner, "cancelled": None}
+            previous = self._by_key.get(key) if key is not None else None
+            if key is not None:
+                self._by_key[key] = opaque_id
+        if previous is not None and previous != opaque_id:
+            self.cancel(previous, "superseded")
+        return opaque_id
+
+    def end(self, opaque_id):
+        with self._lock:
+            search = self._searches.pop(opaque_id, None)
+            if search is not None and self._by_key.get(search["key"]) == opaque_id:
+                del self._by_key[search["key"]]
+
+    def cancelled(self, opaque_id):
+        """The reason a registered search was cancelled, or None."""
+        with self._lock:
+            search = self._searches.get(opaque_id.split("/")[0])
+            return search["cancelled"] if search is not None else None
+
+    def in_flight(self):
+        with self._lock:
+            return sorted(self._searches)
+
+    def cancel(self, opaque_id, reason="client"):
+        """
+        Cancels the cluster tasks of a registered search (or of one attempt, given its full id). Returns
+        whether the search was registered; a search whose task has not started yet fails before it is sent.
+        Attempt reasons (`deadline`, `hedge_lost`) stop only the attempt sent with exactly this id.
+        """
+        root = opaque_id.split("/")[0]
+        with self._lock:
+            search = self._searches.get(root)
+            if search is None:
+                return False
+            if opaque_id == root and reason not in ATTEMPT_REASONS:
+                search["cancelled"] = reason
+            self._cancelled[reason] += 1
+            client = search["client"]
+        attempt_only = reason in ATTEMPT_REASONS
+
+        try:
+            # ✅ Grouped by parents, only top-level tasks are listed; cancelling them cancels their shard tasks
+            tasks = client.tasks.list(actions=self.actions, detailed=True, group_by="parents")
+            for task_id, task in tasks["tasks"].items():
+                header = task.get("headers", {}).get("X-Opaque-Id", "")
+                if header == opaque_id or (not attempt_only and header.startswith(f"{opaque_id}/")):
+                    client.tasks.cancel(task_id=task_id)
+        except Exception as e:  # ✅ Cancelling only frees resources; the search is already abandoned
+            logger.warning("Could not cancel search '%s': %s", opaque_id, e)
+        return True
+
+    def cancel_owned(self, opaque_id, owner):
+        """Cancels a search on behalf of a client: only a search registered with the same owner is cancelled."""
+        with self._lock:
+            search = self._searches.get(opaque_id)
+            if search is None or search["owner"] != owner:
+                return False
+        return self.cancel(opaque_id, "client")
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._searches), "cancelled": dict(self._cancelled)}
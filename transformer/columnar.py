@@ -0,0 +1,199 @@
+import csv
+from array import array
+from datetime import datetime, timedelta, timezone
+
+# ✅ Mapping type → array typecode; dates are stored as epoch milliseconds
+TYPECODES = {
+    "long": "q",
+    "integer": "q",
+    "short": "q",
+    "byte": "q",
+    "unsigned_long": "Q",
+    "double": "d",
+    "float": "d",
+    "half_float": "d",
+    "scaled_float": "d",
+    "boolean": "b",
+    "date": "q",
+    "date_nanos": "q",
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MILLISECOND = timedelta(milliseconds=1)
+
+# ✅ Sources may carry numbers and booleans as strings
+CONVERTERS = {
+    "q": int,
+    "Q": int,
+    "d": float,
+    "b": lambda v: v in (True, "true"),
+}
+
+
+def parse_dates(values):
+    """Converts a column of date values (ISO strings or epoch millis) to epoch milliseconds.
+
+    Timestamps in a result page repeat heavily, so each distinct string is parsed only once.
+    """
+    parsed = {}
+    millis = array("q")
+    for value in values:
+        if value is None:
+            millis.append(0)
+            continue
+        if isinstance(value, (int, float)):
+            millis.append(int(value))
+            continue
+        result = parsed.get(value)
+        if result is None:
+            moment = datetime.fromisoformat(value)
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            result = parsed[value] = (moment - EPOCH) // ONE_MILLISECOND
+        millis.append(result)
+    return millis
+
+
+def _source_getter(path):
+    """Returns a function reading a dotted field from `_source`, flattened or as nested objects."""
+    parts = path.split(".")
+
+    def get(source):
+        value = source.get(path)
+        if value is not None or len(parts) == 1:
+            return value
+        for part in parts:
+            if not isinstance(source, dict):
+                return None
+            source = source.get(part)
+            if source is None:
+                return None
+        return source
+
+    return get
+
+
+class ColumnarResult:
+    def __init__(self, fields, types, columns, validity, ids):
+        """
+        Typed columns decoded from search hits.
+
+        :param columns: Field → `array.array` for numeric/date/boolean fields, list for everything else.
+        :param validity: Field → bytearray with 1 where the hit had a value.
+        :param ids: Document `_id`s in hit order.
+        """
+        self.fields = fields
+        self.types = types
+        self.columns = columns
+        self.validity = validity
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, field):
+        return self.columns[field]
+
+    def _values(self, field):
+        """Yields a column's values with None for missing entries and datetimes for dates."""
+        column, valid = self.columns[field], self.validity[field]
+        is_date = self.types[field] in ("date", "date_nanos")
+        for value, ok in zip(column, valid):
+            if not ok:
+                yield None
+            elif is_date:
+                yield EPOCH + value * ONE_MILLISECOND
+            else:
+                yield value
+
+    def to_csv(self, file):
+        """Writes the table as CSV (with an `_id` column) to a text file object."""
+        writer = csv.writer(file)
+        writer.writerow(["_id", *self.fields])
+        value_columns = [self._values(field) for field in self.fields]
+        for row in zip(self.ids, *value_columns):
+            writer.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime) else v for v in row])
+
+    def to_arrow(self):
+        """Returns a `pyarrow.Table`. Requires the optional `pyarrow` package."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for ColumnarResult.to_arrow()") from e
+
+        arrow_types = {"q": pa.int64(), "Q": pa.uint64(), "d": pa.float64(), "b": pa.bool_()}
+        arrays = [pa.array(self.ids, type=pa.string())]
+        for field in self.fields:
+            valid = self.validity[field]
+            mask = [not ok for ok in valid]
+            if self.types[field] in ("date", "date_nanos"):
+                arrays.append(pa.array(self.columns[field], type=pa.timestamp("ms", tz="UTC"), mask=mask))
+            elif field_typecode := TYPECODES.get(self.types[field]):
+                column = self.columns[field]
+                if field_typecode == "b":
+                    column = [bool(v) for v in column]
+                arrays.append(pa.array(column, type=arrow_types[field_typecode], mask=mask))
+            else:
+                arrays.append(pa.array(list(self._values(field))))
+        return pa.Table.from_arrays(arrays, names=["_id", *self.fields])
+
+
+class HitsDecoder:
+    def __init__(self, fields, mappings=None, types=None):
+        """
+        Decodes search hits into typed columns in a single pass.
+
+        :param fields: Dotted field names to extract.
+        :param mappings: (Optional) FieldMappings used to type each column.
+        :param types: (Optional) Field → mapping type overrides.
+        """
+        self.fields = list(fields)
+        types = types or {}
+        self.types = {
+            field: types.get(field) or (mappings.field_type(field) if mappings else None) or "keyword"
+            for field in self.fields
+        }
+        self._getters = [_source_getter(field) for field in self.fields]
+
+    def decode(self, response):
+        """Extracts `hits.hits` from a search response into a ColumnarResult."""
+        hits = getattr(response, "body", response).get("hits", {}).get("hits", [])
+
+        raw = [[] for _ in self.fields]
+        validity = {field: bytearray(len(hits)) for field in self.fields}
+        valid_columns = [validity[field] for field in self.fields]
+        ids = []
+        getters = self._getters
+        fields = self.fields
+        scalar = [field_type in TYPECODES for field_type in self.types.values()]
+
+        for row, hit in enumerate(hits):
+            ids.append(hit.get("_id"))
+            source = hit.get("_source") or {}
+            doc_fields = hit.get("fields") or {}
+            for i, get in enumerate(getters):
+                value = get(source)
+                if value is None:
+                    # ✅ docvalue_fields / fields API always return lists
+                    value = doc_fields.get(fields[i])
+                    if isinstance(value, list) and len(value) == 1:
+                        value = value[0]
+                if isinstance(value, list) and scalar[i]:
+                    value = value[0] if value else None
+                if value is not None:
+                    valid_columns[i][row] = 1
+                raw[i].append(value)
+
+        columns = {}
+        for field, values in zip(self.fields, raw):
+            field_type = self.types[field]
+            typecode = TYPECODES.get(field_type)
+            if field_type in ("date", "date_nanos"):
+                columns[field] = parse_dates(values)
+            elif typecode:
+                convert = CONVERTERS[typecode]
+                columns[field] = array(typecode, (0 if v is None else convert(v) for v in values))
+            else:
+                columns[field] = values
+
+        return ColumnarResult(self.fields, self.types, columns, validity, ids)
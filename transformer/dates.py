@@ -0,0 +1,192 @@
+import calendar
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from transformer.filter import BoolFilter, RangeFilter
+
+ROUNDING_UNITS = {"y", "M", "w", "d", "h", "H", "m", "s"}
+ROUNDING_MODES = {"round", "split"}
+DATE_FIELD_TYPES = {"date", "date_nanos"}
+ABSOLUTE_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+LOWER_BOUNDS = ("gte", "gt")
+UPPER_BOUNDS = ("lte", "lt")
+DATE_MATH_STEP = re.compile(r"([+-])(\d+)([yMwdhHms])|/([yMwdhHms])")
+UTC_OFFSET = re.compile(r"^([+-])(\d{2}):?(\d{2})$")
+FIXED_UNITS = {"w": timedelta(weeks=1), "d": timedelta(days=1), "h": timedelta(hours=1), "H": timedelta(hours=1),
+               "m": timedelta(minutes=1), "s": timedelta(seconds=1)}
+
+
+def is_date_bound(value):
+    """Whether a range bound is date math (`now-15m`) or an absolute date string."""
+    return isinstance(value, str) and (value.startswith("now") or bool(ABSOLUTE_DATE.match(value)))
+
+
+def round_bound(value, unit):
+    """
+    Appends date-math rounding to a bound: `now-15m` → `now-15m/m`, `2025-01-01T00:00:07.123Z` →
+    `2025-01-01T00:00:07.123Z||/m`. Bounds that are already rounded are returned unchanged.
+    """
+    if value.startswith("now"):
+        return value if "/" in value else f"{value}/{unit}"
+    return value if "||" in value else f"{value}||/{unit}"
+
+
+def _add_months(moment, months):
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def _floor(moment, unit):
+    if unit == "y":
+        return moment.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == "M":
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == "w":
+        return (moment - timedelta(days=moment.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    fields = {"d": ("hour", "minute", "second"), "h": ("minute", "second"), "H": ("minute", "second"),
+              "m": ("second",), "s": ()}[unit]
+    return moment.replace(microsecond=0, **{field: 0 for field in fields})
+
+
+def _step(moment, sign, amount, unit):
+    if unit in ("y", "M"):
+        return _add_months(moment, sign * amount * (12 if unit == "y" else 1))
+    return moment + sign * amount * FIXED_UNITS[unit]
+
+
+def parse_time_zone(value):
+    """The tzinfo of a range query `time_zone` (`+01:00`, `-0800`, `UTC`, `Europe/Paris`), or None if unknown."""
+    if not isinstance(value, str):
+        return None
+    offset = UTC_OFFSET.match(value)
+    if offset:
+        sign, hours, minutes = offset.groups()
+        delta = timedelta(hours=int(hours), minutes=int(minutes))
+        return timezone(-delta if sign == "-" else delta)
+    try:
+        return ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def resolve_date_bound(value, now, round_up=False, time_zone=None):
+    """
+    Evaluates a date range bound to epoch milliseconds (UTC), or None when it cannot be evaluated.
+
+    Handles epoch milliseconds, ISO dates and date math anchored on `now` or on `<date>||`. Rounding goes
+    down, or up to the last millisecond of the unit when `round_up` is set.
+
+    :param now: The current time as a timezone-aware datetime.
+    :param time_zone: (Optional) tzinfo of the range's `time_zone`. Like Elasticsearch, it applies to dates
+                      without an offset and to rounding, not to epoch milliseconds or `now` itself.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    if value.startswith("now"):
+        moment, expression = now if time_zone is None else now.astimezone(time_zone), value[3:]
+    else:
+        anchor, _, expression = value.partition("||")
+        try:
+            moment = datetime.fromisoformat(anchor)
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=time_zone or timezone.utc)
+
+    position = 0
+    for match in DATE_MATH_STEP.finditer(expression):
+        if match.start() != position:
+            return None
+        position = match.end()
+        sign, amount, unit, rounding = match.groups()
+        if rounding:
+            moment = _floor(moment, rounding)
+            if round_up:
+                moment = _step(moment, 1, 1, rounding) - timedelta(milliseconds=1)
+        else:
+            moment = _step(moment, -1 if sign == "-" else 1, int(amount), unit)
+    if position != len(expression):
+        return None
+    return int(moment.timestamp() * 1000)
+
+
+class DateRounder:
+    def __init__(self, unit="m", mode="round", mappings=None, fields=None):
+        """
+        Rounds date range bounds so repeated requests are identical and can be served from the shard
+        request cache, which never caches requests on unrounded `now`.
+
+        In `round` mode every bound gets date-math rounding, with Elasticsearch's rounding rules
+        (`gte`/`lt` round down, `gt`/`lte` round up to the end of the unit), so a range can gain up to one
+        unit at each end. In `split` mode the range becomes a rounded core plus exact edges of at most one
+        unit, which together match exactly the original range; the core is reused from the query cache.
+
+        :param unit: Date-math rounding unit (`y`, `M`, `w`, `d`, `h`/`H`, `m`, `s`).
+        :param mode: `round` or `split`.
+        :param mappings: (Optional) FieldMappings; only `date` fields are rounded when given.
+        :param fields: (Optional) Field names to round; defaults to every field with date bounds.
+        """
+        if unit not in ROUNDING_UNITS:
+            raise ValueError(f"Invalid rounding unit '{unit}'. Allowed: {ROUNDING_UNITS}")
+        if mode not in ROUNDING_MODES:
+            raise ValueError(f"Invalid rounding mode '{mode}'. Allowed: {ROUNDING_MODES}")
+        self.unit = unit
+        self.mode = mode
+        self.mappings = mappings
+        self.fields = set(fields) if fields else None
+
+    def _applies(self, node):
+        if self.fields is not None and node.field not in self.fields:
+            return False
+        if self.mappings is not None and self.mappings.field_type(node.field) not in DATE_FIELD_TYPES:
+            return False
+        return any(is_date_bound(value) for value in node.conditions.values())
+
+    def round_range(self, node):
+        """Returns a rounded RangeFilter, or in `split` mode a bool of the rounded core and exact edges."""
+        if self.mode == "round":
+            return RangeFilter(node.field, **{
+                operator: round_bound(value, self.unit) if is_date_bound(value) else value
+                for operator, value in node.conditions.items()
+            })
+
+        lower = next(((op, node.conditions[op]) for op in LOWER_BOUNDS if op in node.conditions), None)
+        upper = next(((op, node.conditions[op]) for op in UPPER_BOUNDS if op in node.conditions), None)
+        core, edges = {}, []
+        if lower and is_date_bound(lower[1]):
+            rounded = round_bound(lower[1], self.unit)
+            core["gt"] = rounded  # ✅ `gt` rounds up: the core starts at the next whole unit
+            edges.append(RangeFilter(node.field, **{lower[0]: lower[1], "lte": rounded}))
+        elif lower:
+            core[lower[0]] = lower[1]
+        if upper and is_date_bound(upper[1]):
+            rounded = round_bound(upper[1], self.unit)
+            core["lt"] = rounded  # ✅ `lt` rounds down: the core ends where the last partial unit starts
+            edges.append(RangeFilter(node.field, **{"gte": rounded, upper[0]: upper[1]}))
+        elif upper:
+            core[upper[0]] = upper[1]
+
+        if lower and upper:
+            # ✅ A range shorter than one unit would overshoot through its edges; clip each to the full range
+            edges = [BoolFilter(must=[edge, RangeFilter(node.field, **dict([lower, upper]))]) for edge in edges]
+        return BoolFilter(should=[RangeFilter(node.field, **core), *edges], minimum_should_match=1)
+
+    def round_filter(self, node):
+        """Rounds every date RangeFilter in a filter tree; other filters are returned unchanged."""
+        if isinstance(node, RangeFilter):
+            return self.round_range(node) if self._applies(node) else node
+        if isinstance(node, BoolFilter):
+            return BoolFilter(
+                must=[self.round_filter(child) for child in node.must],
+                must_not=[self.round_filter(child) for child in node.must_not],
+                should=[self.round_filter(child) for child in node.should],
+                minimum_should_match=node.minimum_should_match
+            )
+        return node
+
+    def round_filters(self, filters):
+        return [self.round_filter(node) for node in filters]
@@ -1,15 +1,31 @@
+import ipaddress
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Logging is configured by the application (see app.py), never on import
 logger = logging.getLogger(__name__)
 
 VALID_OPERATORS = {"OR", "AND", "gt", "lt", "gte", "lte", "term", "terms", "wildcard", "match", "match_phrase", "query_string"}
 
 
+def _term_sort_key(value):
+    return (isinstance(value, str), value)  # ✅ Numbers before strings, so mixed lists still sort
+
+
+def normalize_terms(values):
+    """Deduplicates and sorts a list of term values, so equal sets always produce the same request body."""
+    unique = set(values)
+    try:
+        return sorted(unique)
+    except TypeError:
+        return sorted(unique, key=_term_sort_key)
+
+
 class IdsFilter:
     def __init__(self, values):
-        self.values = values
+        """
+        :param values: Document `_id`s; duplicates are dropped and the list is sorted.
+        """
+        self.values = normalize_terms(values)
 
     def to_elasticsearch(self):
         return {"ids": {"values": self.values}}
@@ -81,6 +97,95 @@ class RangeFilter:
         field = data.pop("field")  # Extract field name
         return cls(field, **data)  # Pass remaining data as conditions
 
+def _merge_ip_intervals(intervals):
+    """Merges overlapping or adjacent `(first, last)` address intervals."""
+    merged = []
+    for first, last in sorted(intervals, key=lambda r: (r[0].version, r[0])):
+        if merged and merged[-1][1].version == first.version and int(first) <= int(merged[-1][1]) + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def collapse_ip_values(values, max_range_networks=1):
+    """
+    Collapses IP addresses, CIDR blocks and `first-last` ranges into the fewest clauses.
+
+    Overlapping and adjacent values are merged first. A merged interval covered by at most
+    `max_range_networks` CIDR blocks is sent as blocks; anything larger stays a range, which is a single
+    BKD lookup on its own.
+
+    :return: `(networks, ranges)`: CIDR strings (bare addresses for single hosts) and `(first, last)`
+             address string pairs, both in address order.
+    """
+    intervals = []
+    for value in values:
+        value = str(value).strip()
+        if "-" in value:
+            first, last = (ipaddress.ip_address(part.strip()) for part in value.split("-", 1))
+            if first.version != last.version or first > last:
+                raise ValueError(f"Invalid IP range '{value}'")
+            intervals.append((first, last))
+        else:
+            network = ipaddress.ip_network(value, strict=False)
+            intervals.append((network.network_address, network.broadcast_address))
+
+    networks, ranges = [], []
+    for first, last in _merge_ip_intervals(intervals):
+        cover = list(ipaddress.summarize_address_range(first, last))
+        if len(cover) > max_range_networks:
+            ranges.append((str(first), str(last)))
+            continue
+        for network in cover:
+            is_host = network.prefixlen == network.max_prefixlen
+            networks.append(str(network.network_address) if is_host else str(network))
+    return networks, ranges
+
+
+class IpFilter:
+    def __init__(self, field, values, max_range_networks=1):
+        """
+        Initialize an IpFilter on an `ip` field.
+
+        :param field: The ip field to search.
+        :param values: Addresses, CIDR blocks (`10.1.0.0/16`) or ranges (`10.0.0.1-10.0.0.200`), collapsed into
+                       the fewest CIDR blocks, which Elasticsearch answers from the ip points index.
+        :param max_range_networks: Ranges needing more CIDR blocks than this are sent as `range` queries.
+        """
+        self.field = field
+        self.max_range_networks = max_range_networks
+        self.networks, ranges = collapse_ip_values(values if isinstance(values, list) else [values], max_range_networks)
+        self.ranges = [f"{first}-{last}" for first, last in ranges]
+
+    def to_elasticsearch(self):
+        clauses = []
+        if len(self.networks) == 1:
+            clauses.append({"term": {self.field: self.networks[0]}})
+        elif self.networks:
+            clauses.append({"terms": {self.field: self.networks}})
+        for ip_range in self.ranges:
+            first, last = ip_range.split("-")
+            clauses.append({"range": {self.field: {"gte": first, "lte": last}}})
+
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"bool": {"should": clauses, "minimum_should_match": 1}}
+
+    def to_json(self):
+        json_data = {
+            "type": "ip",
+            "field": self.field,
+            "values": self.networks + self.ranges
+        }
+        if self.max_range_networks != 1:
+            json_data["max_range_networks"] = self.max_range_networks
+        return json_data
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["field"], data["values"], data.get("max_range_networks", 1))
+
 class TermFilter:
     def __init__(self, field, value, boost=None, case_insensitive=False):
         self.field = field
@@ -131,12 +236,12 @@ class TermsFilter:
         Initialize a TermsFilter.
 
         :param field: The field to search.
-        :param terms: A list of exact terms to match.
+        :param terms: A list of exact terms to match; duplicates are dropped and the list is sorted.
         :param boost: (Optional) Boost value to increase or decrease relevance.
         """
         self.field = field
         if isinstance(terms, list):
-            self.terms = terms
+            self.terms = normalize_terms(terms)  # ✅ Large lists repeat values; ES gains nothing from duplicates
         else:
             self.terms = [terms]  # Ensure terms is a list
         self.boost = boost
@@ -181,6 +286,110 @@ class TermsFilter:
             data.get("boost")
         )
 
+class TermsLookupFilter:
+    def __init__(self, field, index, id, path="values", routing=None, boost=None):
+        """
+        A terms query whose values are read from a stored document instead of being sent inline.
+
+        :param field: The field to search (`_id` to look up document ids).
+        :param index: Index holding the lookup document.
+        :param id: `_id` of the lookup document.
+        :param path: Field of the lookup document that holds the values.
+        :param routing: (Optional) Routing of the lookup document.
+        :param boost: (Optional) Boost value to increase or decrease relevance.
+        """
+        self.field = field
+        self.index = index
+        self.id = id
+        self.path = path
+        self.routing = routing
+        self.boost = boost
+
+    def to_elasticsearch(self):
+        lookup = {"index": self.index, "id": self.id, "path": self.path}
+        if self.routing is not None:
+            lookup["routing"] = self.routing
+        terms_query = {"terms": {self.field: lookup}}
+        if self.boost is not None:
+            terms_query["terms"]["boost"] = self.boost
+        return terms_query
+
+    def to_json(self):
+        json_data = {
+            "type": "terms_lookup",
+            "field": self.field,
+            "index": self.index,
+            "id": self.id,
+            "path": self.path
+        }
+        if self.routing is not None:
+            json_data["routing"] = self.routing
+        if self.boost is not None:
+            json_data["boost"] = self.boost
+        return json_data
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["field"],
+            data["index"],
+            data["id"],
+            path=data.get("path", "values"),
+            routing=data.get("routing"),
+            boost=data.get("boost")
+        )
+
+class PrefixFilter:
+    def __init__(self, field, value, boost=None, case_insensitive=False, rewrite=None):
+        """
+        Initialize a PrefixFilter.
+
+        :param field: The field to search.
+        :param value: Literal prefix the term must start with.
+        :param boost: (Optional) Boost value to increase or decrease relevance.
+        :param case_insensitive: Match the prefix regardless of case.
+        :param rewrite: (Optional) Multi-term rewrite method (e.g. `constant_score`).
+        """
+        self.field = field
+        self.value = value
+        self.boost = boost
+        self.case_insensitive = case_insensitive
+        self.rewrite = rewrite
+
+    def to_elasticsearch(self):
+        prefix_query = {"prefix": {self.field: {"value": self.value}}}
+        if self.case_insensitive:
+            prefix_query["prefix"][self.field]["case_insensitive"] = True
+        if self.rewrite:
+            prefix_query["prefix"][self.field]["rewrite"] = self.rewrite
+        if self.boost is not None:  # ✅ Boosted like WildcardFilter, so a rewritten pattern scores the same
+            return {"bool": {"should": [prefix_query], "minimum_should_match": 1, "boost": self.boost}}
+        return prefix_query
+
+    def to_json(self):
+        json_data = {
+            "type": "prefix",
+            "field": self.field,
+            "value": self.value
+        }
+        if self.boost is not None:
+            json_data["boost"] = self.boost
+        if self.case_insensitive:
+            json_data["case_insensitive"] = True
+        if self.rewrite:
+            json_data["rewrite"] = self.rewrite
+        return json_data
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            field=data["field"],
+            value=data["value"],
+            boost=data.get("boost"),
+            case_insensitive=data.get("case_insensitive", False),
+            rewrite=data.get("rewrite")
+        )
+
 class WildcardFilter:
     def __init__(self, field, value, boost=None, case_insensitive=False, rewrite=None):
         self.field = field
@@ -288,18 +497,7 @@ class BoolFilter:
 
         def load_filters(filters_list):
             """Ensures filters are properly reconstructed based on type hints in JSON."""
-            reconstructed_filters = []
-            for item in filters_list:
-                if "type" in item:  
-                    filter_class_name = item["type"].capitalize() + "Filter"
-                    if filter_class_name in globals():
-                        reconstructed_filters.append(globals()[filter_class_name].from_json(item))
-                    else:
-                        raise ValueError(f"Unknown filter type: {item['type']}")
-                else:
-                    # Fallback to `create_filter_object` when type is missing
-                    reconstructed_filters.append(create_filter_object(item))
-            return reconstructed_filters
+            return [filter_from_json(item) for item in filters_list]
 
         must = load_filters(data.get("must", []))
         must_not = load_filters(data.get("must_not", []))
@@ -308,11 +506,73 @@ class BoolFilter:
 
         return cls(must=must, must_not=must_not, should=should, minimum_should_match=minimum_should_match)
 
+class NestedFilter:
+    def __init__(self, path, query, score_mode=None, inner_hits=None):
+        """
+        Initialize a NestedFilter.
+
+        :param path: The nested path (e.g. `analyst_notes`).
+        :param query: Filter object matched against each nested object.
+        :param score_mode: (Optional) How nested scores combine (`avg`, `max`, `min`, `sum`, `none`).
+        :param inner_hits: (Optional) `inner_hits` options; `{}` returns matching nested objects with defaults.
+        """
+        self.path = path
+        self.query = query
+        self.score_mode = score_mode
+        self.inner_hits = inner_hits
+
+    def to_elasticsearch(self):
+        nested_query = {"nested": {"path": self.path, "query": self.query.to_elasticsearch()}}
+        if self.score_mode:
+            nested_query["nested"]["score_mode"] = self.score_mode
+        if self.inner_hits is not None:
+            nested_query["nested"]["inner_hits"] = self.inner_hits
+        return nested_query
+
+    def to_json(self):
+        json_data = {
+            "type": "nested",
+            "path": self.path,
+            "query": self.query.to_json()
+        }
+        if self.score_mode:
+            json_data["score_mode"] = self.score_mode
+        if self.inner_hits is not None:
+            json_data["inner_hits"] = self.inner_hits
+        return json_data
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["path"],
+            filter_from_json(data["query"]),
+            score_mode=data.get("score_mode"),
+            inner_hits=data.get("inner_hits")
+        )
+
+def bool_clauses(bool_query, occurrence):
+    """The clauses of a raw `bool` query occurrence (`must`, `filter`, ...) as a list; a single clause may be a dict."""
+    clauses = bool_query.get(occurrence) or []
+    return [clauses] if isinstance(clauses, dict) else list(clauses)
+
+def filter_from_json(item):
+    """Reconstructs a filter object from its `to_json` form (or a data-model entry when `type` is missing)."""
+    if "type" in item:
+        filter_class_name = "".join(part.capitalize() for part in item["type"].split("_")) + "Filter"
+        if filter_class_name in globals():
+            return globals()[filter_class_name].from_json(item)
+        raise ValueError(f"Unknown filter type: {item['type']}")
+    # Fallback to `create_filter_object` when type is missing
+    return create_filter_object(item)
+
 def create_filter_object(filter_data):
     """Creates a filter object for Elasticsearch based on the data model."""
 
     if isinstance(filter_data, dict):
         for field, value in filter_data.items():
+            if field == "ids":
+                return IdsFilter(value if isinstance(value, list) else [value])  # ✅ `_id` filter (data model §1.1)
+
             if isinstance(value, list):  
                 # ✅ If all values are simple (strings/numbers), decide `terms` or `match`
                 if all(isinstance(v, (str, int, float)) for v in value):
@@ -338,6 +598,10 @@ def create_filter_object(filter_data):
                 elif any(k in value for k in ["gt", "lt", "gte", "lte"]):
                     return RangeFilter(field, **value)
 
+                # ✅ Handle IP addresses, CIDR blocks and ranges on ip fields
+                elif "ip" in value:
+                    return IpFilter(field, value["ip"])
+
                 # ✅ Handle wildcard filters
                 elif "wildcard" in value:
                     return WildcardFilter(
@@ -0,0 +1,174 @@
+import copy
+import json
+import threading
+
+from transformer.ir import CompiledRequest
+
+FUSED_NAME = "p{member}__{name}"
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 32
+
+
+def fusion_key(index, body):
+    """Requests with equal keys differ at most in their aggregations: same index, query and options."""
+    shared = {key: value for key, value in body.items() if key != "aggs"}
+    return index, json.dumps(shared, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class FusedSearch:
+    def __init__(self, index, body, members):
+        """
+        One search standing in for several requests.
+
+        :param index: Index override for the search, or None for the executor's index.
+        :param body: The search body: the members' shared query and options with all of their aggregations.
+        :param members: `(position, names)` per request, where `names` maps the request's aggregation names to
+                        their names in `body` (None when the request is sent unchanged).
+        """
+        self.index = index
+        self.body = body
+        self.members = members
+
+    def split(self, response):
+        """Returns `(position, response)` for each member, each with only its own aggregations."""
+        if self.members[0][1] is None:
+            return [(self.members[0][0], response)]
+        response = getattr(response, "body", response)
+        response_aggs = response.get("aggregations", {})
+        uses = {}
+        for _, names in self.members:
+            for fused in names.values():
+                uses[fused] = uses.get(fused, 0) + 1
+
+        results = []
+        for position, names in self.members:
+            member = {key: value for key, value in response.items() if key != "aggregations"}
+            if names:
+                # ✅ Reshaping rewrites results in place; members sharing one result each get their own copy
+                member["aggregations"] = {
+                    name: copy.deepcopy(response_aggs[fused]) if uses[fused] > 1 else response_aggs[fused]
+                    for name, fused in names.items() if fused in response_aggs
+                }
+            results.append((position, member))
+        return results
+
+
+class FusionPlanner:
+    def __init__(self, transformer):
+        """
+        Combines requests that share their filters (and index and options) into one search carrying all of
+        their aggregations, so N dashboard panels cost one query phase instead of N.
+
+        Only requests that return no hits (`aggs` and `count` response modes) are fused. Aggregation names are
+        namespaced per request, and identical aggregations are computed once.
+
+        :param transformer: Transformer compiling the request models passed as dictionaries.
+        """
+        self.transformer = transformer
+
+    def _compile(self, request):
+        index = None
+        if isinstance(request, tuple):
+            index, request = request
+        if not isinstance(request, CompiledRequest):
+            request = self.transformer.compile(request)
+        return index, request
+
+    def plan(self, requests):
+        """
+        Plans the searches for a list of request models or CompiledRequests, each optionally given as an
+        `(index, request)` pair. Returns FusedSearches covering every request exactly once.
+        """
+        groups = {}
+        for position, request in enumerate(requests):
+            index, compiled = self._compile(request)
+            if compiled.mode in ("aggs", "count"):
+                key = fusion_key(index, compiled.body())
+            else:
+                key = ("hits", position)  # ✅ Hits depend on each request's size, sort and paging
+            groups.setdefault(key, []).append((position, index, compiled))
+
+        searches = []
+        for members in groups.values():
+            position, index, compiled = members[0]
+            if len(members) == 1:
+                searches.append(FusedSearch(index, compiled.body(), [(position, None)]))
+                continue
+
+            body = {key: value for key, value in compiled.body().items() if key != "aggs"}
+            fused_aggs, by_definition, fused_members = {}, {}, []
+            for position, _, member in members:
+                names = {}
+                for name, definition in member.body().get("aggs", {}).items():
+                    canonical = json.dumps(definition, sort_keys=True, default=str)
+                    fused = by_definition.get(canonical)
+                    if fused is None:
+                        fused = by_definition[canonical] = FUSED_NAME.format(member=position, name=name)
+                        fused_aggs[fused] = definition
+                    names[name] = fused
+                fused_members.append((position, names))
+            if fused_aggs:
+                body["aggs"] = fused_aggs
+            searches.append(FusedSearch(index, body, fused_members))
+        return searches
+
+    def execute(self, executor, requests):
+        """
+        Runs the requests with as few searches as possible and returns their responses in order. Responses are
+        split but not reshaped; call each CompiledRequest's `reshape_response` as for an unfused search.
+        """
+        responses = [None] * len(requests)
+        for search in self.plan(requests):
+            response = executor.execute_query(search.body, index=search.index)
+            for position, member_response in search.split(response):
+                responses[position] = member_response
+        return responses
+
+
+class FusionBatcher:
+    def __init__(self, planner, executor, window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        """
+        Fuses requests issued concurrently from several threads (e.g. one per panel of a dashboard load).
+
+        The first request of a batch waits up to `window` seconds for others, then runs the whole batch
+        through the planner; the other callers block until their response is ready.
+
+        :param max_batch: A batch reaching this many requests is run without waiting for the window to end.
+        """
+        self.planner = planner
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def execute(self, request):
+        """Returns the (unreshaped) response for one request, run together with concurrent ones."""
+        entry = {"request": request, "done": threading.Event()}
+        with self._lock:
+            self._pending.append(entry)
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+
+        if leader:
+            self._full.wait(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._full.clear()
+            try:
+                responses = self.planner.execute(self.executor, [e["request"] for e in batch])
+                for batched, response in zip(batch, responses):
+                    batched["response"] = response
+            except Exception as e:
+                for batched in batch:
+                    batched["error"] = e
+            finally:
+                for batched in batch:
+                    batched["done"].set()
+
+        entry["done"].wait()
+        if "error" in entry:
+            raise entry["error"]
+        return entry["response"]
@@ -0,0 +1,181 @@
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+from transformer.dates import LOWER_BOUNDS, UPPER_BOUNDS, parse_time_zone, resolve_date_bound
+from transformer.filter import bool_clauses
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 60
+MAX_CATALOG_INDICES = 10000
+CLOCK_SKEW_MS = 60000
+
+
+def _range_window(conditions, now):
+    """
+    `(lower, upper)` epoch-millisecond window of a range clause, widened by rounding; None for open ends.
+    Returns None when the clause's `time_zone` is not understood.
+    """
+    time_zone = None
+    if "time_zone" in conditions:
+        time_zone = parse_time_zone(conditions["time_zone"])
+        if time_zone is None:
+            return None
+    lower = upper = None
+    for operator in LOWER_BOUNDS:
+        if operator in conditions:
+            lower = resolve_date_bound(conditions[operator], now, time_zone=time_zone)
+            if lower is None:
+                return None
+    for operator in UPPER_BOUNDS:
+        if operator in conditions:
+            upper = resolve_date_bound(conditions[operator], now, round_up=True, time_zone=time_zone)
+            if upper is None:
+                return None
+    return lower, upper
+
+
+def _intersect(a, b):
+    lower = b[0] if a[0] is None else a[0] if b[0] is None else max(a[0], b[0])
+    upper = b[1] if a[1] is None else a[1] if b[1] is None else min(a[1], b[1])
+    return lower, upper
+
+
+def _hull(a, b):
+    lower = None if a[0] is None or b[0] is None else min(a[0], b[0])
+    upper = None if a[1] is None or b[1] is None else max(a[1], b[1])
+    return lower, upper
+
+
+def time_window(query, field, now):
+    """
+    Returns the `(lower, upper)` epoch-millisecond window a query clause restricts `field` to, or None when
+    it does not restrict it. Ranges under `must`/`filter` intersect; a pure `should` (one match needed)
+    restricts the field only if every clause does, to the hull of their windows.
+    """
+    if "range" in query:
+        conditions = query["range"].get(field)
+        return _range_window(conditions, now) if isinstance(conditions, dict) else None
+    bool_query = query.get("bool")
+    if not isinstance(bool_query, dict):
+        return None
+
+    window = None
+    for clause in bool_clauses(bool_query, "must") + bool_clauses(bool_query, "filter"):
+        clause_window = time_window(clause, field, now)
+        if clause_window is not None:
+            window = clause_window if window is None else _intersect(window, clause_window)
+
+    should = bool_clauses(bool_query, "should")
+    minimum_should_match = bool_query.get("minimum_should_match")
+    if minimum_should_match is None:
+        # ✅ Next to `must`/`filter` clauses, `should` clauses are optional unless asked otherwise
+        minimum_should_match = 0 if bool_query.get("must") or bool_query.get("filter") else 1
+    if should and minimum_should_match == 1:
+        windows = [time_window(clause, field, now) for clause in should]
+        if all(w is not None for w in windows):
+            hull = windows[0]
+            for clause_window in windows[1:]:
+                hull = _hull(hull, clause_window)
+            window = hull if window is None else _intersect(window, hull)
+    return window
+
+
+class IndexCatalog:
+    def __init__(self, client, pattern, time_field="@timestamp", refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 clock=time.time):
+        """
+        Cached map of the concrete indices behind a pattern to the time span of their documents, used to
+        search only the indices a request's time range can reach.
+
+        :param client: Elasticsearch client.
+        :param pattern: Index pattern (e.g. `my-events-*`), also the fallback when pruning is not possible.
+        :param time_field: Date field the indices are partitioned by.
+        :param refresh_interval: Seconds before the catalog is reloaded. Indices created since the last load
+                                 are not searched until then, so keep it below the rollover period.
+        :param clock: Time source, injectable for tests.
+        """
+        self.client = client
+        self.pattern = pattern
+        self.time_field = time_field
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._bounds = None  # index → (min, max) epoch ms, or None for an index with no documents yet
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reloads every index's time span with one aggregation search; keeps the old catalog on failure."""
+        try:
+            indices = [row["index"] for row in self.client.cat.indices(index=self.pattern, format="json", h="index")]
+            response = self.client.search(index=self.pattern, size=0, aggs={"indices": {
+                "terms": {"field": "_index", "size": MAX_CATALOG_INDICES},
+                "aggs": {"min": {"min": {"field": self.time_field}}, "max": {"max": {"field": self.time_field}}}
+            }})
+        except Exception as e:  # ✅ Pruning is an optimization; searching the pattern is always correct
+            logger.warning("Could not load the index catalog for '%s': %s", self.pattern, e)
+            with self._lock:
+                self._loaded_at = self.clock()  # ✅ Retry after the next interval, not on every search
+            return
+        response = getattr(response, "body", response)
+        bounds = dict.fromkeys(indices)
+        for bucket in response["aggregations"]["indices"]["buckets"]:
+            if bucket["min"]["value"] is not None:
+                bounds[bucket["key"]] = (bucket["min"]["value"], bucket["max"]["value"])
+        with self._lock:
+            self._bounds = bounds
+            self._loaded_at = self.clock()
+
+    def bounds(self):
+        """Returns the catalog, reloading it first when it is older than `refresh_interval`."""
+        if self._loaded_at is None or self.clock() - self._loaded_at >= self.refresh_interval:
+            self.refresh()
+        with self._lock:
+            return self._bounds
+
+    def indices_for(self, lower, upper):
+        """
+        Returns the sorted concrete indices that can hold documents between `lower` and `upper` (epoch ms,
+        None for an open end), or None when the catalog cannot answer.
+
+        Indices with no documents yet are always included. The index holding the newest documents is treated
+        as open-ended, since it is the one still receiving writes.
+        """
+        bounds = self.bounds()
+        if not bounds:
+            return None
+        newest = max((span[1] for span in bounds.values() if span), default=None)
+        lower = -math.inf if lower is None else lower
+        upper = math.inf if upper is None else upper
+        selected = []
+        for index, span in bounds.items():
+            if span is None:
+                selected.append(index)
+                continue
+            first, last = span
+            if last == newest:
+                last = math.inf
+            if first <= upper and last >= lower:
+                selected.append(index)
+        return sorted(selected) or None
+
+    def resolve(self, query):
+        """Returns the indices to search for a query body (dict or JSON bytes): concrete indices, or the pattern."""
+        if isinstance(query, (bytes, bytearray)):
+            body = json.loads(query)
+        elif isinstance(query, dict):
+            body = query
+        else:
+            return self.pattern  # ✅ e.g. a TemplateRequest, whose body is only rendered by the cluster
+        window = time_window(body.get("query", {}), self.time_field, datetime.fromtimestamp(self.clock(), timezone.utc))
+        if window is None:
+            return self.pattern
+        lower, upper = window
+        # ✅ `now` is evaluated here and again on the cluster; widen so clock skew cannot drop an index
+        lower = None if lower is None else lower - CLOCK_SKEW_MS
+        upper = None if upper is None else upper + CLOCK_SKEW_MS
+        return self.indices_for(lower, upper) or self.pattern
@@ -0,0 +1,313 @@
+import copy
+import hashlib
+import json
+
+from transformer import aggregation
+from transformer import filter
+from transformer import sort
+from transformer.nested import NestedGrouper
+from transformer.patterns import PatternRewriter
+from transformer.nodes import FrozenNode, copy_json, freeze, freeze_value, thaw_value
+
+RESPONSE_FETCH_MODES = {"source", "docvalues", "fields"}
+RESPONSE_MODES = {"hits", "aggs", "count", "exists"}
+HIT_OPTIONS = {"_source", "fields", "docvalue_fields"}
+DEFAULT_SIZE = 20
+
+
+def resolve_response_mode(mode, size, aggs, sorts):
+    """
+    Picks what a request returns: `hits`, only `aggs`, a `count` or whether anything `exists`.
+
+    Without an explicit mode, a request with aggregations but no requested size or sort only wants the
+    aggregations, and a request with `size: 0` only wants the count; everything else returns hits. Only an
+    explicit `count` is exact by default; an inferred one keeps the cluster's bounded `track_total_hits`.
+    """
+    if mode is not None:
+        if mode not in RESPONSE_MODES:
+            raise ValueError(f"Invalid response mode '{mode}'. Allowed: {RESPONSE_MODES}")
+        if mode in ("count", "exists") and aggs:
+            raise ValueError(f"Response mode '{mode}' does not return aggregations")
+        return mode
+    if aggs and not sorts and not size:
+        return "aggs"
+    return "count" if size == 0 else "hits"
+
+
+def _named(name, node):
+    """An aggregation named after its key: unnamed classes disagree on how they emit, so none is left unnamed."""
+    if node.name is not None:
+        return node
+    node = node.thaw() if isinstance(node, FrozenNode) else copy.copy(node)
+    node.name = name
+    return node
+
+
+class CompiledRequest:
+    """
+    Immutable, compiled form of a request model: frozen filter, sort and aggregation nodes plus paging
+    and response options. Emitters walk it to produce the Elasticsearch body, the JSON model or a cache key.
+    """
+
+    __slots__ = ("filters", "sorts", "aggs", "size", "from_", "options", "mode", "_body")
+
+    def __init__(self, filters=(), sorts=(), aggs=(), size=None, from_=None, options=None, mode=None):
+        """
+        :param filters: Filter nodes, combined with AND.
+        :param sorts: Sort nodes, in order.
+        :param aggs: `(name, aggregation)` pairs, or a dict of them; unnamed aggregations take their name.
+        :param size: Requested number of hits (DEFAULT_SIZE when not given).
+        :param from_: Hit offset for paging.
+        :param options: Extra top-level body options (e.g. `_source`, `track_total_hits`).
+        :param mode: (Optional) Response mode (`hits`, `aggs`, `count`, `exists`); see resolve_response_mode.
+        """
+        if isinstance(aggs, dict):
+            aggs = aggs.items()
+        # ✅ Nodes are interned, so identical subtrees across requests share one memoized body
+        object.__setattr__(self, "filters", tuple(freeze(node) for node in filters))
+        object.__setattr__(self, "sorts", tuple(freeze(node) for node in sorts))
+        object.__setattr__(self, "aggs", tuple((name, freeze(_named(name, node))) for name, node in aggs))
+        object.__setattr__(self, "size", size)
+        object.__setattr__(self, "from_", from_)
+        object.__setattr__(self, "options", tuple(sorted((k, freeze_value(v)) for k, v in (options or {}).items())))
+        object.__setattr__(self, "mode", resolve_response_mode(mode, size, self.aggs, self.sorts))
+        object.__setattr__(self, "_body", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def option(self, name, default=None):
+        for key, value in self.options:
+            if key == name:
+                return thaw_value(value)
+        return default
+
+    def accept(self, emitter):
+        return emitter.visit_request(self)
+
+    def body(self):
+        """The Elasticsearch body, emitted once and cached; each call returns a new copy the caller may change."""
+        if self._body is None:
+            object.__setattr__(self, "_body", ElasticsearchEmitter().emit(self))
+        return copy_json(self._body)
+
+    def cache_key(self):
+        return CacheKeyEmitter().emit(self)
+
+    def reshape_response(self, response):
+        """Puts merged aggregation results back under their original names, in place, and returns the response."""
+        response_aggs = getattr(response, "body", response).get("aggregations")
+        if response_aggs:
+            aggregation.reshape_aggregations(dict(self.aggs), response_aggs)
+        return response
+
+
+class RequestEmitter:
+    """Base visitor over a CompiledRequest. Subclasses implement the `visit_*` hooks."""
+
+    def emit(self, request):
+        return request.accept(self)
+
+    def visit_request(self, request):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def visit_filter(self, node):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def visit_sort(self, node):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def visit_aggregation(self, name, node):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+
+class ElasticsearchEmitter(RequestEmitter):
+    """Emits the Elasticsearch search body."""
+
+    def visit_request(self, request):
+        return self.assemble(self.sections(request))
+
+    def sections(self, request):
+        """Returns the top-level `(key, value)` pairs of the body, with nodes already visited."""
+        sections = []
+        hits = request.mode == "hits"
+
+        # ✅ Apply filters if they exist
+        if request.filters:
+            sections.append(("query", self.visit_filter(freeze(filter.BoolFilter(must=list(request.filters))))))
+        elif hits:
+            sections.append(("query", {"match_all": {}}))  # ✅ Ensure valid query
+
+        if hits:
+            sections.append(("size", DEFAULT_SIZE if request.size is None else request.size))
+            if request.from_ is not None:
+                sections.append(("from", request.from_))
+            # ✅ Apply sorting if present
+            if request.sorts:
+                sections.append(("sort", [self.visit_sort(node) for node in request.sorts]))
+        else:
+            sections.append(("size", 0))  # ✅ No hits: skip the fetch phase entirely
+            if request.mode == "exists":
+                sections.append(("terminate_after", 1))  # ✅ Each shard stops at its first match
+
+        # ✅ Apply aggregations if present
+        if request.aggs:
+            sections.append(("aggs", [self.visit_aggregation(name, node) for name, node in request.aggs]))
+
+        options = [(key, thaw_value(value)) for key, value in request.options if hits or key not in HIT_OPTIONS]
+        if request.mode == "aggs" and request.option("track_total_hits") is None:
+            options.append(("track_total_hits", False))  # ✅ Nobody reads the total, so shards need not count
+        sections.extend(options)
+        return sections
+
+    def assemble(self, sections):
+        query_body = {}
+        for key, value in sections:
+            if key == "aggs":
+                query_body["aggs"] = {}
+                for agg in value:
+                    query_body["aggs"].update(agg)
+            else:
+                query_body[key] = value
+        return query_body
+
+    def visit_filter(self, node):
+        return node.to_elasticsearch()
+
+    def visit_sort(self, node):
+        return node.to_elasticsearch()
+
+    def visit_aggregation(self, name, node):
+        return node.to_elasticsearch()  # ✅ `{name: {...}}`: CompiledRequest names every aggregation
+
+
+class JsonEmitter(RequestEmitter):
+    """Emits a JSON-serializable description of the compiled request, using each node's `to_json`."""
+
+    def visit_request(self, request):
+        json_data = {
+            "filters": [self.visit_filter(node) for node in request.filters],
+            "sorts": [self.visit_sort(node) for node in request.sorts],
+            "aggs": dict(self.visit_aggregation(name, node) for name, node in request.aggs),
+        }
+        if request.size is not None:
+            json_data["size"] = request.size
+        if request.from_ is not None:
+            json_data["from"] = request.from_
+        json_data["response_mode"] = request.mode
+        json_data.update((key, thaw_value(value)) for key, value in request.options)
+        return json_data
+
+    def visit_filter(self, node):
+        return node.to_json()
+
+    def visit_sort(self, node):
+        return node.to_json()
+
+    def visit_aggregation(self, name, node):
+        return name, node.to_json()
+
+
+class CacheKeyEmitter(RequestEmitter):
+    """Emits a stable hex digest of the Elasticsearch body; equal bodies give equal keys."""
+
+    def visit_request(self, request):
+        canonical = json.dumps(request.body(), sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compile_response_options(data):
+    """Compiles `fields`/`exclude_fields`/`fetch`/`track_total_hits` from the request model into body options."""
+    options = {}
+    fields = data.get("fields")
+    exclude_fields = data.get("exclude_fields")
+    fetch = data.get("fetch", "source")
+
+    if fetch not in RESPONSE_FETCH_MODES:
+        raise ValueError(f"Invalid fetch mode '{fetch}'. Allowed: {RESPONSE_FETCH_MODES}")
+
+    if fetch == "source":
+        source = {}
+        if fields:
+            source["includes"] = list(fields)
+        if exclude_fields:
+            source["excludes"] = list(exclude_fields)
+        if source:
+            options["_source"] = source
+    elif fields:
+        # ✅ Read values from doc values / the fields API and skip loading `_source` entirely
+        options["_source"] = False
+        options["docvalue_fields" if fetch == "docvalues" else "fields"] = list(fields)
+
+    if "track_total_hits" in data:
+        options["track_total_hits"] = data["track_total_hits"]
+    elif data.get("response_mode") == "count":
+        options["track_total_hits"] = True  # ✅ An explicit count is the answer, so make it exact
+
+    return options
+
+
+def compile_filters(filters, rewriter=None):
+    """
+    Compiles the filter data model (list → AND, dict → single filter object) into filter nodes.
+
+    :param rewriter: (Optional) PatternRewriter applied to wildcard filters; defaults to one without mappings.
+    """
+    filters_list = []
+
+    # ✅ Handle both dictionary (OR) and list (AND)
+    if isinstance(filters, dict):  # OR condition (should)
+        created_filter = filter.create_filter_object(filters)
+        if created_filter:
+            filters_list.append(created_filter)
+
+    elif isinstance(filters, list):  # AND condition (must)
+        for filter_data in filters:
+            created_filter = filter.create_filter_object(filter_data)
+            if created_filter:
+                filters_list.append(created_filter)
+
+    return (rewriter or PatternRewriter()).rewrite_filters(filters_list)
+
+
+def nested_grouper(data, mappings):
+    """
+    Returns the NestedGrouper for a request model, or None when the mappings define no nested paths.
+
+    :raises ValueError: The request asks for `inner_hits`, which needs the mappings' nested paths.
+    """
+    if mappings is not None and mappings.nested_paths:
+        return NestedGrouper(mappings, data.get("inner_hits"))
+    if data.get("inner_hits") not in (None, False):
+        raise ValueError("'inner_hits' needs field mappings with nested paths")
+    return None
+
+
+def compile_request(data, mappings=None, rewriter=None, registry=None, rounder=None, fuse_metrics=False):
+    """
+    Compiles a request model into a CompiledRequest in a single pass.
+
+    :param registry: (Optional) StoredScriptRegistry; script sorts it has stored are referenced by id.
+    :param rounder: (Optional) DateRounder applied to date range filters.
+    :param fuse_metrics: Fuse sibling metric aggregations; see aggregation.plan_aggregations.
+    """
+    filters = compile_filters(data.get("filters", []), rewriter or PatternRewriter(mappings))
+    if rounder is not None:
+        filters = rounder.round_filters(filters)
+    grouper = nested_grouper(data, mappings)
+    if grouper is not None:
+        filters = grouper.group_filters(filters)
+    sorts = [sort.create_sort_object(s) for s in data.get("sorts", [])]
+    if registry is not None:
+        sorts = registry.rewrite_sorts(sorts)
+
+    return CompiledRequest(
+        filters=filters,
+        sorts=sorts,
+        aggs=aggregation.plan_aggregations(aggregation.create_aggregation_tree(data.get("aggs", {}), mappings),
+                                           fuse_metrics),
+        size=data.get("size"),
+        from_=data.get("from"),
+        options=compile_response_options(data),
+        mode=data.get("response_mode"),
+    )
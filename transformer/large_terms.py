@@ -0,0 +1,223 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key
+
+from transformer import aggregation
+from transformer import ir
+from transformer import sort
+from transformer.filter import BoolFilter, IdsFilter, TermsFilter, TermsLookupFilter
+from transformer.nodes import encode_json
+from transformer.patterns import PatternRewriter
+
+DEFAULT_INLINE_LIMIT = 10000
+DEFAULT_MAX_TERMS_COUNT = 65536  # ✅ ES `index.max_terms_count` default; terms lookups are bounded by it too
+LOOKUP_INDEX = "transformer-terms-lookup"
+
+
+def _term_values(node):
+    if isinstance(node, TermsFilter):
+        return node.terms
+    if isinstance(node, IdsFilter):
+        return node.values
+    return None
+
+
+def _with_values(node, values):
+    """Returns a copy of a TermsFilter/IdsFilter holding `values` instead."""
+    if isinstance(node, IdsFilter):
+        return IdsFilter(values)
+    return TermsFilter(node.field, values, node.boost)
+
+
+class TermsLookupStore:
+    def __init__(self, client, index=LOOKUP_INDEX):
+        """
+        Writes large value lists to a staging index so terms queries can read them by document id.
+
+        :param client: Elasticsearch client of the cluster being searched.
+        :param index: Staging index holding one document per distinct value list.
+        """
+        self.client = client
+        self.index = index
+        self._staged = set()
+        self._index_ready = False
+        self._lock = threading.Lock()
+
+    def ensure_index(self):
+        """Creates the staging index if needed. Values are only read back from `_source`, so nothing is indexed."""
+        if self._index_ready:
+            return
+        if not self.client.indices.exists(index=self.index):
+            self.client.indices.create(index=self.index, mappings={"enabled": False})
+        self._index_ready = True
+
+    def stage(self, values):
+        """Stores a normalized value list and returns its document id. Identical lists are written once."""
+        doc_id = hashlib.sha256(encode_json(values)).hexdigest()
+        with self._lock:
+            if doc_id in self._staged:
+                return doc_id
+        self.ensure_index()
+        # ✅ `wait_for` makes the document visible to the search that looks it up next
+        self.client.index(index=self.index, id=doc_id, document={"values": values}, refresh="wait_for")
+        with self._lock:
+            self._staged.add(doc_id)
+        return doc_id
+
+    def lookup_filter(self, node):
+        """Stages the values of a TermsFilter/IdsFilter and returns the equivalent TermsLookupFilter."""
+        if isinstance(node, IdsFilter):
+            return TermsLookupFilter("_id", self.index, self.stage(node.values))
+        return TermsLookupFilter(node.field, self.index, self.stage(node.terms), boost=node.boost)
+
+
+class LargeTermsPlanner:
+    def __init__(self, store=None, inline_limit=DEFAULT_INLINE_LIMIT, max_terms_count=DEFAULT_MAX_TERMS_COUNT,
+                 chunk_size=None):
+        """
+        Decides how each terms/ids list in a filter list is sent.
+
+        Lists up to `inline_limit` values stay inline. Longer lists become terms lookups when a store is
+        given. Lists that still do not fit (over `max_terms_count`, or over `inline_limit` without a store)
+        are split into chunks, one search per chunk.
+
+        :param store: (Optional) TermsLookupStore used for lookups.
+        :param inline_limit: Largest list sent inline.
+        :param max_terms_count: The cluster's `index.max_terms_count`.
+        :param chunk_size: Values per chunked search (defaults to the largest list a single search accepts).
+        """
+        self.store = store
+        self.inline_limit = inline_limit
+        self.max_terms_count = max_terms_count
+        self.chunk_size = chunk_size or (max_terms_count if store else inline_limit)
+
+    def _oversized(self, node):
+        values = _term_values(node)
+        return values is not None and len(values) > (self.max_terms_count if self.store else self.inline_limit)
+
+    def _rewrite(self, node):
+        if isinstance(node, BoolFilter):
+            for child in node.must + node.must_not + node.should:
+                if self._oversized(child):
+                    raise ValueError("Terms lists too large for one search can only be split at the top level of the filters")
+            return BoolFilter(
+                must=[self._rewrite(child) for child in node.must],
+                must_not=[self._rewrite(child) for child in node.must_not],
+                should=[self._rewrite(child) for child in node.should],
+                minimum_should_match=node.minimum_should_match
+            )
+        values = _term_values(node)
+        if values is not None and len(values) > self.inline_limit and self.store is not None:
+            return self.store.lookup_filter(node)
+        return node
+
+    def plan(self, filters):
+        """
+        Returns one filter list per search to run. Their results together match `filters`.
+
+        :param filters: Top-level filter objects (combined with AND).
+        """
+        oversized = [i for i, node in enumerate(filters) if self._oversized(node)]
+        if len(oversized) > 1:
+            raise ValueError("Only one terms list per request can be split into chunked searches")
+        if not oversized:
+            return [[self._rewrite(node) for node in filters]]
+
+        position = oversized[0]
+        node = filters[position]
+        values = _term_values(node)
+        rest = [self._rewrite(other) for i, other in enumerate(filters) if i != position]
+        return [
+            rest[:position] + [self._rewrite(_with_values(node, values[start:start + self.chunk_size]))] + rest[position:]
+            for start in range(0, len(values), self.chunk_size)
+        ]
+
+
+def _compare_hits(orders, a, b):
+    for order, x, y in zip(orders, a.get("sort", []), b.get("sort", [])):
+        if x == y:
+            continue
+        if x is None or y is None:
+            return 1 if x is None else -1  # ✅ Missing values sort last, as in Elasticsearch
+        result = -1 if x < y else 1
+        return -result if order == "desc" else result
+    return 0
+
+
+def merge_hit_responses(responses, sorts=(), from_=0, size=20):
+    """
+    Merges the responses of chunked searches into one page of hits.
+
+    Hits are de-duplicated by `_id` and ordered by their `sort` values, or without sorts like Elasticsearch
+    does: by `_score` descending, then `_id`. Totals are summed, so documents whose
+    field holds values from several chunks are counted once per chunk.
+    """
+    hits, seen = [], set()
+    total, relation, has_total, timed_out = 0, "eq", False, False
+    for response in responses:
+        body = getattr(response, "body", response)
+        timed_out = timed_out or body.get("timed_out", False)
+        hits_section = body.get("hits", {})
+        chunk_total = hits_section.get("total")
+        if isinstance(chunk_total, dict):
+            has_total = True
+            total += chunk_total.get("value", 0)
+            if chunk_total.get("relation") == "gte":
+                relation = "gte"
+        elif chunk_total is not None:
+            has_total = True
+            total += chunk_total
+        for hit in hits_section.get("hits", []):
+            hit_id = hit.get("_id")
+            if hit_id is not None:
+                if hit_id in seen:
+                    continue
+                seen.add(hit_id)
+            hits.append(hit)
+
+    if sorts:
+        hits.sort(key=cmp_to_key(lambda a, b: _compare_hits([s.order for s in sorts], a, b)))
+    else:
+        hits.sort(key=lambda hit: (-(hit.get("_score") or 0), hit.get("_id") or ""))
+
+    merged = {"timed_out": timed_out, "hits": {"hits": hits[from_:from_ + size]}}
+    if has_total:
+        merged["hits"]["total"] = {"value": total, "relation": relation}
+    return merged
+
+
+def search_large_terms(data, executor, planner, mappings=None, max_workers=4):
+    """
+    Runs a request model whose filters may hold very large terms/ids lists and returns one response.
+
+    :param data: The request model.
+    :param executor: QueryExecutor used for every search.
+    :param planner: LargeTermsPlanner deciding between inline lists, lookups and chunked searches.
+    :param max_workers: Chunked searches run in parallel on up to this many threads.
+    """
+    plans = planner.plan(ir.compile_filters(data.get("filters", []), PatternRewriter(mappings)))
+    if ir.nested_grouper(data, mappings) is not None:
+        # ✅ One grouper per search, since inner_hits names only need to be unique within one request
+        plans = [ir.nested_grouper(data, mappings).group_filters(plan) for plan in plans]
+    sorts = [sort.create_sort_object(s) for s in data.get("sorts", [])]
+    # ✅ The single search below is reshaped, so its metrics can be fused
+    aggs = aggregation.plan_aggregations(aggregation.create_aggregation_tree(data.get("aggs", {}), mappings), True)
+    size = data.get("size", 20)
+    from_ = data.get("from")
+    options = ir.compile_response_options(data)
+
+    if len(plans) == 1:
+        request = ir.CompiledRequest(plans[0], sorts, aggs, size, from_, options)
+        return request.reshape_response(executor.execute_query(request.body()))
+
+    if aggs:
+        raise ValueError("Aggregations cannot be merged across chunked searches; stage the list for a terms lookup instead")
+
+    # ✅ Each chunk returns its own first `from + size` hits; the merge cuts the requested page from them
+    page_end = (from_ or 0) + size
+    chunk_options = {**options, "size": page_end}
+    bodies = [ir.CompiledRequest(chunk, sorts, (), page_end, None, chunk_options).body() for chunk in plans]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        responses = list(pool.map(executor.execute_query, bodies))
+    return merge_hit_responses(responses, sorts, from_ or 0, size)
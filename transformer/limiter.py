@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from elastic_transport import ApiError, TransportError
+
+from transformer.resilience import LatencyTracker
+
+PRIORITIES = ("interactive", "batch")
+OVERLOAD_STATUS = {429, 503, 504}
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a search is shed instead of being sent to an overloaded cluster."""
+
+    def __init__(self, priority, reason, retry_after):
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Search rejected ({priority}, {reason}); retry after {retry_after}s")
+
+
+def is_overload(error):
+    """Whether a failed search signals an overloaded cluster rather than a bad request."""
+    if isinstance(error, ApiError):
+        return error.meta.status in OVERLOAD_STATUS
+    return isinstance(error, TransportError)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, initial_limit=20, min_limit=2, max_limit=200, backoff_ratio=0.9, tolerance=2.0,
+                 max_queue=50, queue_timeout=1.0, batch_share=0.5, retry_after=1, clock=time.monotonic):
+        """
+        Adaptive (AIMD) limit on the searches in flight, shared by every QueryExecutor given the same instance.
+
+        The limit grows by one per window of successful searches and is multiplied by `backoff_ratio` when a
+        search fails with an overload error or takes longer than `tolerance` times the baseline latency (the
+        10th percentile of recent searches). Searches beyond the limit wait in a bounded queue, interactive
+        ones first; when the queue is full or the wait too long, they fail fast with OverloadedError.
+
+        :param batch_share: Fraction of the limit, and of the queue, batch searches may occupy, so
+                            interactive searches always have room.
+        :param retry_after: Seconds clients are told to wait before retrying a rejected search.
+        :param clock: Monotonic time source, injectable for tests.
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.tolerance = tolerance
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.batch_share = batch_share
+        self.retry_after = retry_after
+        self.clock = clock
+        self.latencies = LatencyTracker()
+        self._in_flight = dict.fromkeys(PRIORITIES, 0)
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._admitted = dict.fromkeys(PRIORITIES, 0)
+        self._rejected = {priority: {"queue_full": 0, "queue_timeout": 0} for priority in PRIORITIES}
+        self._last_decrease = None
+        self._cond = threading.Condition()
+
+    def _capacity(self, priority):
+        limit = max(self.min_limit, math.floor(self.limit))
+        if sum(self._in_flight.values()) >= limit:
+            return False
+        return priority != "batch" or self._in_flight["batch"] < max(1, math.floor(limit * self.batch_share))
+
+    def _next_in_line(self):
+        for priority in PRIORITIES:
+            if self._queues[priority]:
+                return self._queues[priority][0]
+        return None
+
+    def _reject(self, priority, reason):
+        self._rejected[priority][reason] += 1
+        raise OverloadedError(priority, reason, self.retry_after)
+
+    def acquire(self, priority="interactive", timeout=None):
+        """Takes a slot, waiting up to `timeout` (default `queue_timeout`) seconds; raises OverloadedError."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority '{priority}'. Allowed: {PRIORITIES}")
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._cond:
+            if self._next_in_line() is None and self._capacity(priority):
+                self._admit(priority)
+                return
+            queued = sum(len(queue) for queue in self._queues.values())
+            if queued >= self.max_queue or (
+                    priority == "batch" and len(self._queues["batch"]) >= self.max_queue * self.batch_share):
+                self._reject(priority, "queue_full")
+
+            ticket = (priority, object())
+            self._queues[priority].append(ticket)
+            deadline = time.monotonic() + timeout
+            while not (self._next_in_line() is ticket and self._capacity(priority)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[priority].remove(ticket)
+                    self._cond.notify_all()  # ✅ Whoever was behind us may be able to run now
+                    self._reject(priority, "queue_timeout")
+                self._cond.wait(remaining)
+            self._queues[priority].popleft()
+            self._admit(priority)
+            self._cond.notify_all()
+
+    def try_acquire(self, priority="interactive"):
+        """Takes a slot only if one is free now and nobody is queued for it; returns whether it did."""
+        with self._cond:
+            if self._next_in_line() is None and self._capacity(priority):
+                self._admit(priority)
+                return True
+            return False
+
+    def _admit(self, priority):
+        self._in_flight[priority] += 1
+        self._admitted[priority] += 1
+
+    def release(self, priority, latency, overloaded=False):
+        """Frees a slot and adapts the limit to the search's outcome."""
+        with self._cond:
+            self._in_flight[priority] -= 1
+            baseline = self.latencies.percentile(10) if self.latencies.count() >= 10 else None
+            if not overloaded:
+                self.latencies.record(latency)
+            if overloaded or (baseline is not None and latency > self.tolerance * baseline):
+                now = self.clock()
+                # ✅ Back off once per latency window, not once per search of the same burst
+                if self._last_decrease is None or now - self._last_decrease >= max(latency, baseline or 0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority="interactive", timeout=None, acquired=False):
+        """
+        Holds a slot for the duration of a search; failures that signal overload shrink the limit.
+
+        :param acquired: The slot was already taken with `try_acquire`; it is only held and released.
+        """
+        if not acquired:
+            self.acquire(priority, timeout)
+        start = self.clock()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self.release(priority, self.clock() - start, overloaded)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": math.floor(self.limit),
+                "in_flight": dict(self._in_flight),
+                "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+                "admitted": dict(self._admitted),
+                "rejected": {priority: dict(reasons) for priority, reasons in self._rejected.items()},
+            }
@@ -0,0 +1,103 @@
+import json
+import os
+
+DEFAULT_MAPPINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mappings.json")
+
+
+class FieldMappings:
+    """Flattened view of an index mapping, keyed by dotted field path."""
+
+    def __init__(self, properties, dynamic=True):
+        """
+        Initialize FieldMappings.
+
+        :param properties: The `properties` block of an Elasticsearch mapping.
+        :param dynamic: Whether the root mapping accepts unmapped fields.
+        """
+        self.dynamic = dynamic
+        self.field_types = {}
+        self.nested_paths = set()
+        self.multi_fields = {}
+        self.object_dynamic = {}
+        self._flatten(properties or {}, "")
+
+    def _flatten(self, properties, prefix):
+        for name, definition in properties.items():
+            path = f"{prefix}{name}"
+            field_type = definition.get("type", "object")
+            self.field_types[path] = field_type
+
+            if field_type == "nested":
+                self.nested_paths.add(path)
+
+            if "dynamic" in definition:
+                self.object_dynamic[path] = definition["dynamic"] not in (False, "false", "strict")
+
+            # ✅ Multi-fields (e.g. `client_id.keyword`) are addressable as sub-paths
+            for sub_name, sub_definition in definition.get("fields", {}).items():
+                self.field_types[f"{path}.{sub_name}"] = sub_definition.get("type", "object")
+                self.multi_fields.setdefault(path, []).append(f"{path}.{sub_name}")
+
+            if "properties" in definition:
+                self._flatten(definition["properties"], f"{path}.")
+
+    def field_type(self, field):
+        """Returns the mapped type of a field, or None when the field is not mapped."""
+        return self.field_types.get(field)
+
+    def has_field(self, field):
+        return field in self.field_types
+
+    def accepts_unmapped(self, field):
+        """
+        Whether an unmapped field can hold values, following the `dynamic` setting of its innermost enclosing
+        object. Fields under a non-dynamic object are never indexed, so queries on them match nothing.
+        """
+        parts = field.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            candidate = ".".join(parts[:i])
+            if candidate in self.object_dynamic:
+                return self.object_dynamic[candidate]
+        return self.dynamic
+
+    def wildcard_field(self, field):
+        """
+        Returns the `wildcard`-typed field holding the same values as `field` (the field itself, one of its
+        multi-fields, or the parent of a multi-field), or None.
+        """
+        parent = field.rsplit(".", 1)[0] if "." in field else None
+        candidates = [field, *self.multi_fields.get(field, [])]
+        if parent in self.multi_fields and field in self.multi_fields[parent]:
+            candidates += [parent, *self.multi_fields[parent]]
+        for candidate in candidates:
+            if self.field_types.get(candidate) == "wildcard":
+                return candidate
+        return None
+
+    def nested_path(self, field):
+        """Returns the innermost nested path that contains the field, if any."""
+        parts = field.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            candidate = ".".join(parts[:i])
+            if candidate in self.nested_paths:
+                return candidate
+        return None
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Builds FieldMappings from a mapping document.
+
+        Accepts the `GET <index>/_mapping` response shape (`{"<index>": {"mappings": ...}}`),
+        a `{"mappings": ...}` body, or the bare mappings body.
+        """
+        if "properties" not in data and "mappings" not in data and len(data) == 1:
+            data = next(iter(data.values()))
+        mappings = data.get("mappings", data)
+        return cls(mappings.get("properties", {}), dynamic=mappings.get("dynamic", True) not in (False, "false", "strict"))
+
+    @classmethod
+    def load(cls, path=DEFAULT_MAPPINGS_PATH):
+        """Loads FieldMappings from a JSON file (defaults to the repository `mappings.json`)."""
+        with open(path) as mapping_file:
+            return cls.from_json(json.load(mapping_file))
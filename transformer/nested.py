@@ -0,0 +1,99 @@
+from transformer.filter import BoolFilter, NestedFilter
+
+
+class NestedGrouper:
+    def __init__(self, mappings, inner_hits=None):
+        """
+        Wraps filters on nested fields in `nested` queries, one per nested path and bool clause group.
+
+        Clauses combined with AND on the same path must match within the same nested object (e.g. one
+        analyst note with both the action and the author). OR and NOT groups are equivalent either way.
+
+        :param mappings: FieldMappings that tell which fields live under nested paths.
+        :param inner_hits: (Optional) `True`/`{}` or an `inner_hits` options dict to return the matching
+                           nested objects with every positive nested query.
+        """
+        self.mappings = mappings
+        self.inner_hits = {} if inner_hits is True else (None if inner_hits is None or inner_hits is False else inner_hits)
+        self._inner_hits_names = set()
+
+    def _path_of(self, node):
+        """The nested path every leaf of the clause targets, or None."""
+        if isinstance(node, NestedFilter):
+            return self.mappings.nested_path(node.path)  # ✅ Enclosing path of a multi-level nested query
+        if isinstance(node, BoolFilter):
+            if node.must_not:
+                return None  # ✅ "No nested object matches" needs its own nested query under `must_not`
+            paths = {self._path_of(child) for child in node.must + node.should}
+            return paths.pop() if len(paths) == 1 else None
+        field = getattr(node, "field", None)
+        return self.mappings.nested_path(field) if field else None
+
+    def _inner_hits_for(self, path):
+        if self.inner_hits is None:
+            return None
+        options = dict(self.inner_hits)
+        base = name = options.get("name", path)  # ✅ Elasticsearch names them after the path by default
+        suffix = len(self._inner_hits_names)
+        while name in self._inner_hits_names:
+            # ✅ inner_hits names must be unique within a request, including a caller-supplied one
+            name, suffix = f"{base}_{suffix}", suffix + 1
+        if name != base:
+            options["name"] = name
+        self._inner_hits_names.add(name)
+        return options
+
+    def _wrap(self, path, query, positive):
+        nested = NestedFilter(path, query, inner_hits=self._inner_hits_for(path) if positive else None)
+        outer = self.mappings.nested_path(path)
+        return self._wrap(outer, nested, positive) if outer else nested
+
+    def _group(self, clauses, role, positive, merge=True):
+        """
+        Groups one list of bool clauses by nested path, keeping the order of first appearance.
+
+        :param merge: When False, each nested clause gets its own nested query.
+        """
+        positive = positive and role != "must_not"
+        grouped, buckets = [], {}
+        for clause in clauses:
+            path = self._path_of(clause)
+            if path is None or not merge:
+                grouped.append((path, [clause]))
+            elif path in buckets:
+                buckets[path].append(clause)
+            else:
+                buckets[path] = [clause]
+                grouped.append((path, buckets[path]))
+
+        result = []
+        for path, bucket in grouped:
+            if path is None:
+                result.append(self.group_filter(bucket[0], positive))
+                continue
+            if len(bucket) == 1:
+                query = bucket[0]
+            elif role == "must":
+                query = BoolFilter(must=bucket)
+            else:
+                # ✅ `should` and `must_not` both reduce to "any of these matches" inside the nested object
+                query = BoolFilter(should=bucket, minimum_should_match=1)
+            result.append(self._wrap(path, query, positive))
+        return result
+
+    def group_filter(self, node, positive=True):
+        """Returns a bool filter with the nested clauses of each clause list grouped; other filters are unchanged."""
+        if not isinstance(node, BoolFilter):
+            return node
+        return BoolFilter(
+            must=self._group(node.must, "must", positive),
+            must_not=self._group(node.must_not, "must_not", positive),
+            # ✅ Merging `should` clauses would change how `minimum_should_match` counts them
+            should=self._group(node.should, "should", positive, merge=node.minimum_should_match in (None, 1)),
+            minimum_should_match=node.minimum_should_match
+        )
+
+    def group_filters(self, filters):
+        """Groups a top-level (AND) filter list."""
+        self._inner_hits_names = set()
+        return self._group(filters, "must", True)
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # ✅ Not on Windows; concurrent writers of one panel may then reuse a version number
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class StalePanelError(LookupError):
+    """Raised when a panel has no stored result young enough to serve."""
+
+    def __init__(self, name, age=None):
+        self.name = name
+        self.age = age
+        detail = "has never been computed" if age is None else f"is {age:.1f}s old"
+        super().__init__(f"Panel '{name}' {detail}")
+
+
+class PanelResult:
+    def __init__(self, name, version, computed_at, result):
+        """
+        A versioned, precomputed panel response.
+
+        :param name: Registered panel name.
+        :param version: Monotonic version, incremented on every store.
+        :param computed_at: Wall-clock time (epoch seconds) the result was produced.
+        :param result: The Elasticsearch response body.
+        """
+        self.name = name
+        self.version = version
+        self.computed_at = computed_at
+        self.result = result
+
+    def age(self, now):
+        return now - self.computed_at
+
+    def to_json(self):
+        return {"name": self.name, "version": self.version, "computed_at": self.computed_at, "result": self.result}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["name"], data["version"], data["computed_at"], data["result"])
+
+
+class PanelStore:
+    def __init__(self, directory=None, clock=time.time):
+        """
+        Thread-safe store of precomputed panel results.
+
+        :param directory: (Optional) Directory where each panel is persisted as `<name>.json`, so results
+                          survive restarts and are shared between workers (processes) using the same
+                          directory: `get` rereads a file another worker replaced, and versions continue
+                          from the file's.
+        :param clock: Time source, injectable for tests.
+        """
+        self.directory = directory
+        self.clock = clock
+        self._results = {}
+        # ✅ name → (inode, mtime) of the file the cached result came from; every rename gives a new inode
+        self._stamps = {}
+        self._lock = threading.Lock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for file_name in os.listdir(directory):
+                if file_name.endswith(".json"):
+                    self._reload(file_name[:-len(".json")])
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _stamp(self, name):
+        stat = os.stat(self._path(name))
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _reload(self, name):
+        """Rereads a panel's file if it changed since it was last read or written (call with the lock held)."""
+        try:
+            stamp = self._stamp(name)
+            if self._stamps.get(name) == stamp:
+                return
+            with open(self._path(name)) as panel_file:
+                entry = PanelResult.from_json(json.load(panel_file))
+        except (OSError, ValueError) as e:  # ✅ Keep serving the cached result
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("Could not read panel '%s': %s", name, e)
+            return
+        self._results[entry.name] = entry
+        self._stamps[entry.name] = stamp
+
+    def _write(self, name, result):
+        self._reload(name)  # ✅ Another worker may have stored a newer version
+        previous = self._results.get(name)
+        entry = PanelResult(name, previous.version + 1 if previous else 1, self.clock(), result)
+        # ✅ Write-then-rename so readers never observe a partial file; the temp name is unique per writer
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, prefix=f".{name}.", suffix=".tmp",
+                                         delete=False) as panel_file:
+            json.dump(entry.to_json(), panel_file)
+        os.replace(panel_file.name, self._path(name))
+        self._results[name] = entry
+        self._stamps[name] = self._stamp(name)
+        return entry
+
+    def put(self, name, result):
+        """Stores a new version of a panel and returns it."""
+        with self._lock:
+            if not self.directory:
+                previous = self._results.get(name)
+                entry = PanelResult(name, previous.version + 1 if previous else 1, self.clock(), result)
+                self._results[name] = entry
+                return entry
+            if fcntl is None:
+                return self._write(name, result)
+            # ✅ Serializes writers of one panel across processes, so each version number is used once
+            with open(os.path.join(self.directory, f".{name}.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                return self._write(name, result)
+
+    def get(self, name, max_staleness=None):
+        """Returns the stored result, or None if missing or older than `max_staleness` seconds."""
+        with self._lock:
+            if self.directory:
+                self._reload(name)
+            entry = self._results.get(name)
+        if entry is None:
+            return None
+        if max_staleness is not None and entry.age(self.clock()) > max_staleness:
+            return None
+        return entry
+
+
+class PanelScheduler:
+    def __init__(self, transformer, executor, store, default_interval=60, tick=1.0, planner=None, retry_backoff=5.0):
+        """
+        Periodically executes registered request models and keeps their results in a PanelStore.
+
+        :param transformer: Transformer used to build each panel query.
+        :param executor: QueryExecutor used to run them.
+        :param store: PanelStore receiving the results.
+        :param default_interval: Refresh interval in seconds for panels registered without one.
+        :param tick: How often the background thread checks for due panels.
+        :param planner: (Optional) FusionPlanner; panels due together that share their filters are then
+                        refreshed with one search.
+        :param retry_backoff: Seconds before a panel whose refresh failed is retried; doubled after each
+                              consecutive failure, up to the panel's interval.
+        """
+        self.transformer = transformer
+        self.executor = executor
+        self.store = store
+        self.default_interval = default_interval
+        self.tick = tick
+        self.planner = planner
+        self.retry_backoff = retry_backoff
+        self.panels = {}
+        self._uploaded = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def register(self, name, request_model, interval=None, max_staleness=None):
+        """
+        Registers a panel by name.
+
+        :param interval: Seconds between refreshes (defaults to `default_interval`).
+        :param max_staleness: Oldest result (seconds) `serve` will return; defaults to twice the interval.
+        """
+        interval = interval or self.default_interval
+        request, query = self._build(request_model)  # ✅ Built once at registration
+        self.panels[name] = {
+            "model": request_model,
+            "request": request,
+            "query": query,
+            "interval": interval,
+            "max_staleness": max_staleness if max_staleness is not None else 2 * interval,
+            "failures": 0,
+            "retry_at": 0,
+        }
+
+    def _build(self, request_model):
+        request = self.transformer.compile(request_model)
+        query = self.transformer.transform_stored(request)  # ✅ A stored template when one was uploaded
+        if isinstance(query, dict):
+            query = self.transformer.transform_to_bytes(request)  # ✅ Encoded once, sent on every refresh
+        return request, query
+
+    def upload_templates(self):
+        """
+        Startup hook: stores the registered panels as search templates on the transformer's registry (once;
+        a no-op without a registry) and rebuilds their queries, so refreshes send only a template id and its
+        values. `start` runs it in the scheduler thread, so nothing waits on the cluster at import time.
+        """
+        if self.transformer.registry is None or self._uploaded:
+            return
+        self._uploaded = True
+        try:
+            self.transformer.registry.upload(self.transformer, [panel["model"] for panel in self.panels.values()])
+        except Exception as e:  # ✅ Inline bodies return the same results
+            logger.warning("Could not store the panel templates, sending inline bodies: %s", e)
+            return
+        for panel in self.panels.values():
+            panel["request"], panel["query"] = self._build(panel["model"])
+
+    def refresh(self, name):
+        """Executes one panel and stores the result."""
+        panel = self.panels[name]
+        response = panel["request"].reshape_response(self.executor.execute_query(panel["query"]))
+        return self.store.put(name, getattr(response, "body", response))
+
+    def refresh_fused(self, names):
+        """Executes several panels with as few searches as the planner can fuse them into, and stores the results."""
+        requests = [self.panels[name]["request"] for name in names]
+        responses = self.planner.execute(self.executor, requests)
+        for name, request, response in zip(names, requests, responses):
+            response = request.reshape_response(response)
+            self.store.put(name, getattr(response, "body", response))
+
+    def _succeeded(self, name):
+        self.panels[name].update(failures=0, retry_at=0)
+
+    def _failed(self, name):
+        panel = self.panels[name]
+        panel["failures"] += 1
+        delay = min(self.retry_backoff * 2 ** (panel["failures"] - 1), panel["interval"])
+        panel["retry_at"] = self.store.clock() + delay
+
+    def refresh_due(self):
+        """Refreshes every panel whose stored result is older than its interval, unless it is backing off."""
+        now = self.store.clock()
+        due = [name for name, panel in self.panels.items()
+               if panel["retry_at"] <= now and self.store.get(name, max_staleness=panel["interval"]) is None]
+        if self.planner is not None and len(due) > 1:
+            try:
+                self.refresh_fused(due)
+                for name in due:
+                    self._succeeded(name)
+                return
+            except Exception:
+                # ✅ One failing panel must not fail the others; fall back to one search per panel
+                logger.exception("Failed to refresh panels %s together", due)
+        for name in due:
+            try:
+                self.refresh(name)
+                self._succeeded(name)
+            except Exception:
+                # ✅ Keep serving the last good version; retry after a growing delay, not on every tick
+                self._failed(name)
+                logger.exception("Failed to refresh panel '%s' (retry in %.0fs)", name,
+                                 self.panels[name]["retry_at"] - now)
+
+    def serve(self, name):
+        """Returns the stored result for a registered panel within its staleness bound."""
+        panel = self.panels[name]  # ✅ KeyError for unknown panels
+        entry = self.store.get(name, max_staleness=panel["max_staleness"])
+        if entry is None:
+            stored = self.store.get(name)
+            raise StalePanelError(name, stored.age(self.store.clock()) if stored else None)
+        return entry
+
+    def _run(self):
+        self.upload_templates()
+        while not self._stop.is_set():
+            self.refresh_due()
+            self._stop.wait(self.tick)
+
+    def start(self):
+        with self._start_lock:  # ✅ Concurrent first requests start one thread
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="panel-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,135 @@
+import re
+
+from transformer.aggregation import HIGH_CARDINALITY_FIELD_TYPES
+from transformer.filter import BoolFilter, IpFilter, PrefixFilter, TermFilter, WildcardFilter
+
+LEADING_WILDCARD_POLICIES = {"reject", "allow"}
+WILDCARD_CHARACTERS = {"*", "?"}
+IPV4_OCTET_PREFIX = re.compile(r"^((?:\d{1,3}\.){1,3})\*$")
+
+
+class PatternPolicyError(ValueError):
+    """Raised when a pattern would scan every term of a field and the policy forbids it."""
+
+    def __init__(self, field, pattern):
+        self.field = field
+        self.pattern = pattern
+        super().__init__(
+            f"Leading wildcard pattern '{pattern}' on field '{field}' scans every term; "
+            f"map a `wildcard` field for it or anchor the pattern"
+        )
+
+
+def analyze_pattern(pattern):
+    """
+    Classifies a wildcard pattern.
+
+    :return: `(shape, literal)`, where shape is `exact` (no wildcards), `prefix` (one trailing `*` only),
+             `leading` (starts with a wildcard) or `wildcard` (anything else). `literal` is the unescaped text
+             for `exact` and `prefix`, otherwise None.
+    """
+    literal = []
+    wildcards = []  # ✅ Positions (in the unescaped text) of unescaped `*`/`?`
+    escaped = False
+    for char in pattern:
+        if escaped:
+            literal.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in WILDCARD_CHARACTERS:
+            wildcards.append((len(literal), char))
+            literal.append(char)
+        else:
+            literal.append(char)
+
+    if not wildcards:
+        return "exact", "".join(literal)
+    if wildcards[0][0] == 0:
+        return "leading", None
+    if all(char == "*" for _, char in wildcards) and wildcards[0][0] == len(literal) - len(wildcards):
+        return "prefix", "".join(literal[:wildcards[0][0]])
+    return "wildcard", None
+
+
+def ip_pattern_network(pattern):
+    """Returns the CIDR block matched by an octet-prefix pattern such as `10.1.*`, or None."""
+    match = IPV4_OCTET_PREFIX.match(pattern)
+    if not match:
+        return None
+    octets = match.group(1).rstrip(".").split(".")
+    if any(int(octet) > 255 for octet in octets):
+        return None
+    return ".".join(octets + ["0"] * (4 - len(octets))) + f"/{8 * len(octets)}"
+
+
+class PatternRewriter:
+    def __init__(self, mappings=None, leading_wildcard="reject", rewrite=None):
+        """
+        Rewrites wildcard filters into the cheapest equivalent query.
+
+        :param mappings: (Optional) FieldMappings used to find field types and `wildcard`-typed fields.
+        :param leading_wildcard: What to do with a leading wildcard on a mapped field with no `wildcard`-typed
+                                 field to route it to: `reject` (raise PatternPolicyError) or `allow`.
+        :param rewrite: (Optional) Rewrite method set on multi-term queries over high-cardinality fields,
+                        unless the filter sets its own. By default Elasticsearch's own is kept, which is
+                        already constant-score in filter context.
+        """
+        if leading_wildcard not in LEADING_WILDCARD_POLICIES:
+            raise ValueError(f"Invalid leading_wildcard policy '{leading_wildcard}'. Allowed: {LEADING_WILDCARD_POLICIES}")
+        self.mappings = mappings
+        self.leading_wildcard = leading_wildcard
+        self.rewrite = rewrite
+
+    def _rewrite_method(self, node, field):
+        if node.rewrite or not self.rewrite or not self.mappings:
+            return node.rewrite
+        field_type = self.mappings.field_type(field)
+        # ✅ `wildcard` fields match patterns with their own n-gram index and ignore `rewrite`
+        if field_type in HIGH_CARDINALITY_FIELD_TYPES and field_type != "wildcard":
+            return self.rewrite
+        return None
+
+    def rewrite_wildcard(self, node):
+        """Returns the cheapest filter equivalent to a WildcardFilter."""
+        if self.mappings and self.mappings.field_type(node.field) == "ip":
+            # ✅ `10.1.*` on an ip field is a CIDR block, answered from the points index
+            network = ip_pattern_network(node.value)
+            if network:
+                return IpFilter(node.field, [network])
+
+        shape, literal = analyze_pattern(node.value)
+
+        if shape == "exact":
+            return TermFilter(node.field, literal, boost=node.boost, case_insensitive=node.case_insensitive)
+
+        if shape == "prefix":
+            return PrefixFilter(node.field, literal, boost=node.boost, case_insensitive=node.case_insensitive,
+                                rewrite=self._rewrite_method(node, node.field))
+
+        field = node.field
+        if shape == "leading" and self.mappings and self.mappings.has_field(field):
+            field = self.mappings.wildcard_field(field)
+            if field is None:
+                if self.leading_wildcard == "reject":
+                    raise PatternPolicyError(node.field, node.value)
+                field = node.field
+
+        return WildcardFilter(field, node.value, boost=node.boost, case_insensitive=node.case_insensitive,
+                              rewrite=self._rewrite_method(node, field))
+
+    def rewrite_filter(self, node):
+        """Rewrites every WildcardFilter in a filter tree; other filters are returned unchanged."""
+        if isinstance(node, WildcardFilter):
+            return self.rewrite_wildcard(node)
+        if isinstance(node, BoolFilter):
+            return BoolFilter(
+                must=[self.rewrite_filter(child) for child in node.must],
+                must_not=[self.rewrite_filter(child) for child in node.must_not],
+                should=[self.rewrite_filter(child) for child in node.should],
+                minimum_should_match=node.minimum_should_match
+            )
+        return node
+
+    def rewrite_filters(self, filters):
+        return [self.rewrite_filter(node) for node in filters]
@@ -1,21 +1,287 @@
-from elasticsearch import Elasticsearch
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from elasticsearch import ConnectionTimeout, Elasticsearch
+
+from transformer.cancellation import SearchCancelledError, SearchTracker
+from transformer.nodes import mentions
+from transformer.resilience import AdaptiveTimeout, ExecutorMetrics, LatencyTracker
+from transformer.stored import TemplateRequest
+
+SHARD_FILTER_PATHS = ["_shards.failed", "_shards.failures"]
+FIELDS_OPTIONS = ("fields", "docvalue_fields", "script_fields", "stored_fields")
+
+
+def hit_filter_paths(query):
+    """Returns the `hits.hits.*` paths the hits of a query (a body or a body summary) can carry."""
+    paths = ["hits.hits._id", "hits.hits._index"]  # ✅ Ids are only unique per index, and patterns span several
+    if query.get("_source", True) is not False:
+        paths.append("hits.hits._source")
+    if any(option in query for option in FIELDS_OPTIONS):
+        paths.append("hits.hits.fields")
+    sort = query.get("sort")
+    if sort:
+        paths.append("hits.hits.sort")
+    if not sort or query.get("track_scores") or mentions(sort, "_score") or "_score" in sort:
+        paths.append("hits.hits._score")
+    if query.get("highlight"):
+        paths.append("hits.hits.highlight")
+    if query.get("inner_hits") is True or mentions(query.get("query"), "inner_hits") or mentions(query.get("collapse"), "inner_hits"):
+        paths.append("hits.hits.inner_hits")
+    return paths
+
+
+def filter_path_for_query(query):
+    """Returns the `filter_path` that keeps only the response sections the query can produce."""
+    query = getattr(query, "summary", query)  # ✅ Pre-encoded bodies describe themselves
+    filter_path = ["timed_out", *SHARD_FILTER_PATHS]  # ✅ Failed shards mean partial results; never hide them
+    if query.get("size", 10) != 0:
+        filter_path.extend(hit_filter_paths(query))
+    if query.get("track_total_hits", True) is not False:
+        filter_path.append("hits.total")
+    if query.get("aggs") or query.get("aggregations"):
+        filter_path.append("aggregations")
+    if "terminate_after" in query:
+        filter_path.append("terminated_early")
+    return filter_path
+
+
+def is_cacheable_query(query):
+    """Whether the shard request cache can serve the query: only `size: 0` searches are cached."""
+    query = getattr(query, "summary", query)
+    return query.get("size") == 0
 
-from elasticsearch import Elasticsearch
 
 class QueryExecutor:
-    def __init__(self, index_name="my-events", es_host="http://localhost:9200", username="elastic", password="5ZdBs31Y"):
-        """Initialize Elasticsearch connection with authentication."""
-        self.es = Elasticsearch(
-            hosts=[es_host],
-            basic_auth=(username, password)  # ✅ Pass credentials
+    def __init__(self, index_name="my-events", es_host="http://localhost:9200", username="elastic", password="5ZdBs31Y",
+                 trim_response=True, client=None, request_cache=True, catalog=None, routing=None,
+                 request_timeout=None, retry=None, hedging=None, limiter=None, priority="interactive", tracker=None):
+        """
+        Initialize Elasticsearch connection with authentication.
+
+        :param trim_response: Apply an automatic `filter_path` so unused response sections are never sent.
+        :param client: (Optional) Pre-built Elasticsearch client; connection arguments are ignored when given.
+        :param request_cache: Ask for the shard request cache on `size: 0` aggregation searches.
+        :param catalog: (Optional) IndexCatalog; searches then go only to the indices the request's time
+                        range can reach instead of `index_name`.
+        :param routing: (Optional) RoutingPolicy; searches pinned to a few routing values go only to their shards.
+        :param request_timeout: (Optional) Seconds before a search is abandoned, or an AdaptiveTimeout.
+        :param retry: (Optional) RetryPolicy for searches failing on transport errors.
+        :param hedging: (Optional) HedgePolicy; slow searches are duplicated and the first response wins. The
+                        loser is cancelled on the cluster through the tracker (a private one when none is
+                        given), and each duplicate takes its own limiter slot or is not sent.
+        :param limiter: (Optional) ConcurrencyLimiter, shared between executors; searches beyond its limit
+                        wait or fail with OverloadedError.
+        :param priority: Default limiter priority of this executor's searches (`interactive` or `batch`).
+        :param tracker: (Optional) SearchTracker, shared between executors; searches are registered by opaque
+                        id so they can be cancelled on the cluster, and are cancelled when they time out.
+        """
+        client_options = {"max_retries": 0} if retry is not None else {}  # ✅ Retried once, by the policy
+        self.es = client or Elasticsearch(
+            hosts=es_host if isinstance(es_host, list) else [es_host],
+            basic_auth=(username, password),  # ✅ Pass credentials
+            **client_options
         )
         self.index = index_name
+        self.trim_response = trim_response
+        self.request_cache = request_cache
+        self.catalog = catalog
+        self.routing = routing
+        self.request_timeout = request_timeout
+        self.retry = retry
+        self.hedging = hedging
+        self.limiter = limiter
+        self.priority = priority
+        if hedging is not None and tracker is None:
+            tracker = SearchTracker()  # ✅ Losing duplicates are only stopped on the cluster by opaque id
+        self.tracker = tracker
+        self.metrics = ExecutorMetrics()
+        self.latencies = LatencyTracker()
+        self._pool = ThreadPoolExecutor(max_workers=hedging.max_workers) if hedging is not None else None
+
+    def _timeout(self, timeout):
+        timeout = self.request_timeout if timeout is None else timeout
+        if isinstance(timeout, AdaptiveTimeout):
+            return timeout.timeout(self.latencies)
+        return timeout
 
-    def execute_query(self, query):
-        """Executes a search query against Elasticsearch."""
-        response = self.es.search(index=self.index, body=query)  # ✅ Remove size from parameters
+    def _send(self, method, params, timeout, opaque_id=None):
+        if opaque_id is not None and self.tracker is not None:
+            reason = self.tracker.cancelled(opaque_id)
+            if reason:
+                raise SearchCancelledError(opaque_id, reason)  # ✅ Cancelled before its task existed
+        options = {}
+        if timeout is not None:
+            options["request_timeout"] = timeout
+        if opaque_id is not None:
+            options["opaque_id"] = opaque_id  # ✅ Sent as `X-Opaque-Id`, which tags the search's cluster tasks
+        client = self.es.options(**options) if options else self.es
+        for name in method.split("."):
+            client = getattr(client, name)  # ✅ e.g. `async_search.submit`
+        start = time.monotonic()
+        try:
+            response = client(**params)
+        except ConnectionTimeout:
+            self.metrics.increment("timeouts")
+            if opaque_id is not None and self.tracker is not None:
+                self.tracker.cancel(opaque_id, "deadline")  # ✅ Nobody waits for it; stop it on the cluster too
+            raise
+        self.latencies.record(time.monotonic() - start)
         return response
 
-# Usage Example:
-query_executor = QueryExecutor(username="elastic", password="yourpassword")
+    def send(self, method, params, timeout=None, opaque_id=None, priority=None):
+        """
+        Sends one client call (e.g. `async_search.get`) as is: no retries or hedging. Given a `priority`, the
+        call counts as a search: it takes a limiter slot and is registered with the tracker.
+        """
+        if priority is None:
+            return self._send(method, params, timeout, opaque_id)
+        return self._search(method, params, timeout, priority, opaque_id, once=True)
+
+    def _send_hedge(self, method, params, timeout, opaque_id, priority):
+        if self.limiter is None:
+            return self._send(method, params, timeout, opaque_id)
+        with self.limiter.slot(priority, acquired=True):
+            return self._send(method, params, timeout, opaque_id)
+
+    def _hedged(self, method, params, timeout, opaque_id=None, priority=None):
+        """
+        Sends the search, and a duplicate once it is slower than the hedging delay; the first success wins and
+        the other is cancelled on the cluster. The duplicate is only sent if the limiter has a free slot for it.
+        """
+        primary = self._pool.submit(self._send, method, params, timeout, opaque_id)
+        done, _ = wait([primary], timeout=self.hedging.delay(self.latencies))
+        if done:
+            return primary.result()
+
+        priority = priority or self.priority
+        if self.limiter is not None and not self.limiter.try_acquire(priority):
+            self.metrics.increment("hedges_skipped")  # ✅ A duplicate would only add load to a saturated cluster
+            return primary.result()
+        self.metrics.increment("hedges_fired")
+        hedge_id = f"{opaque_id}/hedge"
+        hedge = self._pool.submit(self._send_hedge, method, params, timeout, hedge_id, priority)
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.metrics.increment("hedges_won")
+                    if pending:
+                        self.tracker.cancel(opaque_id if future is hedge else hedge_id, "hedge_lost")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _search(self, method, params, timeout=None, priority=None, opaque_id=None, cancel_key=None, owner=None,
+                once=False):
+        """
+        Runs one search call with the executor's concurrency limit, timeout, hedging and retry policies.
+
+        :param once: Send the call exactly once, without retries or hedging.
+        """
+        if self.tracker is None:
+            return self._limited(method, params, timeout, priority, opaque_id, once)
+        opaque_id = self.tracker.begin(self.es, opaque_id, cancel_key, owner)
+        try:
+            return self._limited(method, params, timeout, priority, opaque_id, once)
+        except Exception as e:
+            reason = self.tracker.cancelled(opaque_id)
+            if reason and not isinstance(e, SearchCancelledError):
+                raise SearchCancelledError(opaque_id, reason) from e
+            raise
+        finally:
+            self.tracker.end(opaque_id)
+
+    def _limited(self, method, params, timeout, priority, opaque_id, once=False):
+        if self.limiter is None:
+            return self._attempts(method, params, timeout, opaque_id, priority, once)
+        with self.limiter.slot(priority or self.priority):
+            return self._attempts(method, params, timeout, opaque_id, priority, once)
+
+    def _attempts(self, method, params, timeout, opaque_id, priority=None, once=False):
+        self.metrics.increment("searches")
+        timeout = self._timeout(timeout)
+        if once:
+            return self._send(method, params, timeout, opaque_id)
+        attempt = 0
+        while True:
+            try:
+                if self.hedging is not None:
+                    return self._hedged(method, params, timeout, opaque_id, priority)
+                return self._send(method, params, timeout, opaque_id)
+            except SearchCancelledError:
+                raise
+            except Exception as e:
+                if self.retry is None or not self.retry.should_retry(e, attempt):
+                    raise
+                if opaque_id is not None and self.tracker is not None and self.tracker.cancelled(opaque_id):
+                    raise
+            self.metrics.increment("retries")
+            self.retry.wait(attempt)
+            attempt += 1
+
+    def search_request(self, query, filter_path=None, session=None, index=None):
+        """
+        Returns the client method (`search` or `search_template`) and parameters that run a query. An explicit
+        `index` is searched as given; only the default one is pruned by the catalog.
+        """
+        prune = self.catalog is not None and not index
+        index = index or self.index
+        if filter_path is None and self.trim_response:
+            filter_path = filter_path_for_query(query)
+        preference = self.routing.preference_for(session) if self.routing is not None else None
+
+        if isinstance(query, TemplateRequest):
+            # ✅ Only the template id and values are sent; the cluster renders its stored body
+            if prune:
+                index = self.catalog.pattern  # ✅ The body is only rendered by the cluster, so nothing can be pruned
+            search_params = {"index": index, "id": query.id, "params": query.params}
+            routing = self.routing.routing_for({"query": query.query or {}}) if self.routing is not None else None
+            if routing:
+                search_params["routing"] = routing
+            if preference:
+                search_params["preference"] = preference
+            if filter_path:
+                search_params["filter_path"] = filter_path
+            # ✅ The search template API takes no `request_cache`; `size: 0` templates are cached by the index default
+            return "search_template", search_params
+
+        search_params = {"index": index, "body": query}  # ✅ Remove size from parameters
+        if prune or self.routing is not None:
+            body = getattr(query, "summary", query)  # ✅ Pre-encoded bodies carry their query, so none is decoded
+            if isinstance(body, (bytes, bytearray)):
+                body = json.loads(body)
+            if prune:
+                search_params["index"] = self.catalog.resolve(body)
+                if isinstance(search_params["index"], list):
+                    search_params["ignore_unavailable"] = True  # ✅ An index may be deleted before the next refresh
+            if self.routing is not None:
+                routing = self.routing.routing_for(body)
+                if routing:
+                    search_params["routing"] = routing
+        if preference:
+            search_params["preference"] = preference
+        if filter_path:
+            search_params["filter_path"] = filter_path
+        if self.request_cache and is_cacheable_query(query):
+            search_params["request_cache"] = True
+        return "search", search_params
+
+    def execute_query(self, query, filter_path=None, session=None, timeout=None, priority=None, opaque_id=None,
+                      cancel_key=None, index=None, owner=None):
+        """
+        Executes a search query (a body dict, pre-encoded JSON bytes or a TemplateRequest) against Elasticsearch.
 
+        :param session: (Optional) Id of the user session issuing the search, used for shard `preference`.
+        :param timeout: (Optional) Seconds before this search is abandoned; overrides `request_timeout`.
+        :param priority: (Optional) Limiter priority of this search; overrides the executor's.
+        :param opaque_id: (Optional) `X-Opaque-Id` of the search, used to cancel it through the tracker.
+        :param cancel_key: (Optional) Key (e.g. a user's panel) whose previous search this one supersedes.
+        :param index: (Optional) Index to search instead of `index_name`.
+        :param owner: (Optional) Owner (e.g. a session id) allowed to cancel this search through the tracker.
+        """
+        method, search_params = self.search_request(query, filter_path, session, index)
+        return self._search(method, search_params, timeout, priority, opaque_id, cancel_key, owner)
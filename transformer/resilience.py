@@ -0,0 +1,149 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from elastic_transport import ApiError, ConnectionError, ConnectionTimeout
+
+RETRY_ON_STATUS = {502, 503, 504}
+DEFAULT_LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        """
+        Sliding window of recent search latencies (seconds).
+
+        :param window: Number of most recent samples kept.
+        """
+        self.window = window
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, percentile):
+        """The given percentile of the window, or None when it is empty."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = math.ceil(percentile / 100 * len(ordered)) - 1  # ✅ Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, rank))]
+
+
+class ExecutorMetrics:
+    """Thread-safe counters of what the executor did to keep searches fast and successful."""
+
+    FIELDS = ("searches", "retries", "hedges_fired", "hedges_won", "hedges_skipped", "timeouts")
+
+    def __init__(self):
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def __getattr__(self, name):
+        if name in self.FIELDS:
+            with self._lock:
+                return self._counts[name]
+        raise AttributeError(name)
+
+    def to_json(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=2, backoff=0.1, max_backoff=2.0, retry_on_status=RETRY_ON_STATUS,
+                 retry_on_timeout=True, random=random.random, sleep=time.sleep):
+        """
+        Retries searches (which are idempotent) on transport errors, with full-jitter exponential backoff.
+
+        :param max_retries: Retries after the first attempt.
+        :param backoff: Base delay in seconds; attempt `n` sleeps a random time up to `backoff * 2 ** n`.
+        :param max_backoff: Cap on a single delay.
+        :param retry_on_status: HTTP statuses that are retried (the node, not the request, is at fault).
+        :param retry_on_timeout: Retry requests that timed out.
+        :param random: Source of jitter in [0, 1), injectable for tests.
+        :param sleep: Sleep function, injectable for tests.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on_status = set(retry_on_status)
+        self.retry_on_timeout = retry_on_timeout
+        self.random = random
+        self.sleep = sleep
+
+    def should_retry(self, error, attempt):
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, ConnectionTimeout):
+            return self.retry_on_timeout
+        if isinstance(error, ConnectionError):
+            return True
+        return isinstance(error, ApiError) and error.meta.status in self.retry_on_status
+
+    def delay(self, attempt):
+        # ✅ Full jitter spreads the retries of many clients hit by the same failure
+        return self.random() * min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def wait(self, attempt):
+        self.sleep(self.delay(attempt))
+
+
+class HedgePolicy:
+    def __init__(self, percentile=95, initial_delay=0.5, min_delay=0.01, max_delay=5.0, min_samples=20,
+                 max_workers=16):
+        """
+        Sends a duplicate of a search that is slower than usual and keeps whichever response arrives first.
+
+        The duplicate goes through the client's node pool, which hands it to the next node, so one slow
+        replica no longer sets the latency of the request.
+
+        :param percentile: Latency percentile after which the duplicate is sent.
+        :param initial_delay: Delay used until `min_samples` latencies have been recorded.
+        :param min_delay: Lower bound on the delay, so fast clusters are not flooded with duplicates.
+        :param max_delay: Upper bound on the delay.
+        :param max_workers: Threads running searches; abandoned duplicates hold one until they finish.
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+
+    def delay(self, latencies):
+        if latencies.count() < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, latencies.percentile(self.percentile)))
+
+
+class AdaptiveTimeout:
+    def __init__(self, multiplier=4.0, percentile=99, min_timeout=1.0, max_timeout=30.0, min_samples=20):
+        """
+        Per-request timeout derived from recent latencies: a multiple of a high percentile, within bounds.
+
+        :param min_samples: Until this many latencies are recorded, `max_timeout` is used.
+        """
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+
+    def timeout(self, latencies):
+        if latencies.count() < self.min_samples:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.multiplier * latencies.percentile(self.percentile)))
@@ -0,0 +1,77 @@
+from transformer.filter import bool_clauses
+
+DEFAULT_MAX_ROUTING_VALUES = 64
+
+
+def _term_values(clause, field):
+    """The values a term/terms clause on `field` accepts, or None for any other clause."""
+    if "term" in clause and field in clause["term"]:
+        value = clause["term"][field]
+        return {value["value"] if isinstance(value, dict) else value}
+    if "terms" in clause and isinstance(clause["terms"].get(field), list):
+        return set(clause["terms"][field])  # ✅ Terms lookups (a dict) are resolved on the cluster; skip them
+    return None
+
+
+def routing_values(query, field):
+    """
+    Returns the set of `field` values every matching document must have, or None when the query does not
+    pin the field. Term clauses under `must`/`filter` intersect; required `should` clauses union.
+    """
+    values = _term_values(query, field)
+    if values is not None:
+        return values
+    bool_query = query.get("bool")
+    if not isinstance(bool_query, dict):
+        return None
+
+    for clause in bool_clauses(bool_query, "must") + bool_clauses(bool_query, "filter"):
+        clause_values = routing_values(clause, field)
+        if clause_values is not None:
+            values = clause_values if values is None else values & clause_values
+
+    should = bool_clauses(bool_query, "should")
+    minimum_should_match = bool_query.get("minimum_should_match")
+    if minimum_should_match is None:
+        minimum_should_match = 0 if bool_query.get("must") or bool_query.get("filter") else 1
+    if should and minimum_should_match == 1:
+        alternatives = [routing_values(clause, field) for clause in should]
+        if all(a is not None for a in alternatives):
+            union = set().union(*alternatives)
+            values = union if values is None else values & union
+    return values
+
+
+class RoutingPolicy:
+    def __init__(self, field="client_id", max_values=DEFAULT_MAX_ROUTING_VALUES, session_preference=True):
+        """
+        Routes searches that filter on one tenant's documents to the shards holding them.
+
+        Only use it when documents are indexed with `routing` set to the same field's value; otherwise routed
+        searches miss documents.
+
+        :param field: The field documents are routed by.
+        :param max_values: Requests pinning more values than this go to all shards (they would hit most anyway).
+        :param session_preference: Send the caller's session id as `preference`, so one user's repeated
+                                   searches go to the same shard copies and reuse their caches.
+        """
+        self.field = field
+        self.max_values = max_values
+        self.session_preference = session_preference
+
+    def routing_for(self, body):
+        """The `routing` parameter for a search body (comma-separated values), or None to search all shards."""
+        values = routing_values(body.get("query", {}), self.field)
+        if not values or len(values) > self.max_values:
+            return None  # ✅ An empty intersection matches nothing; let the cluster answer it normally
+        routing = sorted(str(value).lower() if isinstance(value, bool) else str(value) for value in values)
+        if any("," in value for value in routing):
+            return None  # ✅ `routing` is comma-separated, so such values cannot be expressed
+        return ",".join(routing)
+
+    def preference_for(self, session):
+        """The `preference` parameter for a session id, or None."""
+        if not self.session_preference or session is None:
+            return None
+        session = str(session)
+        return f"session-{session}" if session.startswith("_") else session  # ✅ `_`-prefixed values are reserved
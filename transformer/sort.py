@@ -1,7 +1,7 @@
 class Sort:
     def __init__(self, field, order="asc", mode=None, format=None, numeric_type=None,
                  nested_path=None, nested_filter=None, missing=None, unmapped_type=None,
-                 script=None, lang="painless", params=None, type=None):
+                 script=None, lang="painless", params=None, type=None, stored_script=None):
         self.field = field
         self.order = order
         self.mode = mode
@@ -15,18 +15,18 @@ class Sort:
         self.lang = lang if lang else "painless"  # ✅ Ensure lang is not `null`
         self.params = params
         self.type = type
+        self.stored_script = stored_script  # ✅ Id of a stored script, sent instead of the inline `script`
 
     def to_elasticsearch(self):
         """Converts the Sort object to an Elasticsearch-compatible dictionary."""
         
         # ✅ FIX: Handle `_script` sorting properly
-        if self.script:
+        if self.script or self.stored_script:
+            # ✅ Stored scripts are referenced by id; their language was fixed when they were stored
+            script = {"id": self.stored_script} if self.stored_script else {"source": self.script, "lang": self.lang}
             script_obj = {
                 "_script": {
-                    "script": {
-                        "source": self.script,
-                        "lang": self.lang
-                    },
+                    "script": script,
                     "order": self.order
                 }
             }
@@ -86,6 +86,12 @@ class Sort:
                 json_data["params"] = self.params
             if self.type:
                 json_data["type"] = self.type
+        if self.stored_script:
+            json_data["stored_script"] = self.stored_script
+            if self.params:
+                json_data["params"] = self.params
+            if self.type:
+                json_data["type"] = self.type
         return json_data
 
     @classmethod
@@ -103,7 +109,8 @@ class Sort:
             script=data.get("script"),
             lang=data.get("lang", "painless"),
             params=data.get("params"),
-            type=data.get("type")
+            type=data.get("type"),
+            stored_script=data.get("stored_script")
         )
 
 def create_sort_object(data):
@@ -120,5 +127,6 @@ def create_sort_object(data):
         script=data.get("script"),
         lang=data.get("lang"),
         params=data.get("params"),
-        type=data.get("type")
+        type=data.get("type"),
+        stored_script=data.get("stored_script")
     )
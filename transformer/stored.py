@@ -0,0 +1,153 @@
+import copy
+import hashlib
+import json
+import re
+import threading
+
+from transformer.nodes import mentions
+
+STORED_PREFIX = "transformer"
+PARAM_MARKER = "__transformer_param_{}__"
+PARAM_MARKER_PATTERN = re.compile(r'"__transformer_param_(p\d+)__"')
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def _is_leaf(value):
+    """Scalars and lists of scalars become template parameters; everything else is query shape."""
+    if isinstance(value, list):
+        return all(not isinstance(v, (dict, list)) for v in value)
+    return not isinstance(value, dict)
+
+
+def parameterize(body):
+    """
+    Splits a search body into its shape and its values.
+
+    :return: `(skeleton, params)`: the body with every scalar (and list of scalars) replaced by a marker
+             string, and `{"p0": value, ...}` in the order the markers appear.
+    """
+    params = {}
+
+    def walk(value):
+        if _is_leaf(value):
+            name = f"p{len(params)}"
+            params[name] = value
+            return PARAM_MARKER.format(name)
+        if isinstance(value, dict):
+            return {key: walk(child) for key, child in value.items()}
+        return [walk(child) for child in value]
+
+    return walk(body), params
+
+
+def template_source(skeleton):
+    """Renders a skeleton as mustache source; `toJson` writes each parameter back with its JSON type."""
+    return PARAM_MARKER_PATTERN.sub(r"{{#toJson}}\1{{/toJson}}", json.dumps(skeleton, separators=(",", ":")))
+
+
+class TemplateRequest:
+    """
+    A search sent as a stored search template: the template id plus the values of the request.
+
+    `summary` describes the rendered body like `EncodedBody.summary` does (top-level settings, the sort, and
+    whether aggregations and inner hits are present), so a `filter_path` can still be derived from it. `query` is the
+    rendered body's query, kept (not sent) so the search can still be routed.
+    """
+
+    def __init__(self, id, params, summary, query=None):
+        self.id = id
+        self.params = params
+        self.summary = summary
+        self.query = query
+
+    def to_json(self):
+        return {"id": self.id, "params": self.params}
+
+
+class StoredScriptRegistry:
+    def __init__(self, client, prefix=STORED_PREFIX):
+        """
+        Stores script sorts as stored scripts and hot query shapes as stored search templates, so requests
+        reference them by id instead of shipping (and making the cluster parse and compile) them every time.
+
+        :param client: Elasticsearch client the scripts and templates are stored on.
+        :param prefix: Prefix of every stored script and template id.
+        """
+        self.client = client
+        self.prefix = prefix
+        self.scripts = {}  # (lang, source) → id
+        self.templates = {}  # skeleton digest → id
+        self._lock = threading.Lock()
+
+    def register_script(self, source, lang="painless"):
+        """Stores a script once and returns its id."""
+        key = (lang, source)
+        with self._lock:
+            if key in self.scripts:
+                return self.scripts[key]
+        script_id = f"{self.prefix}-script-{_digest(lang + ':' + source)}"
+        self.client.put_script(id=script_id, script={"lang": lang, "source": source})
+        with self._lock:
+            self.scripts[key] = script_id
+        return script_id
+
+    def register_template(self, body):
+        """Stores the shape of a search body as a mustache search template and returns its id."""
+        skeleton, params = parameterize(body)
+        source = template_source(skeleton)
+        digest = _digest(source)
+        with self._lock:
+            if digest in self.templates:
+                return self.templates[digest]
+        template_id = f"{self.prefix}-template-{digest}"
+        self.client.put_script(id=template_id, script={"lang": "mustache", "source": source})
+        with self._lock:
+            self.templates[digest] = template_id
+        return template_id
+
+    def rewrite_sort(self, node):
+        """Returns a copy of a script Sort referencing its stored script, if that script was registered."""
+        if not node.script:
+            return node
+        script_id = self.scripts.get((node.lang, node.script))
+        if script_id is None:
+            return node
+        stored = copy.copy(node)
+        stored.script, stored.stored_script = None, script_id
+        return stored
+
+    def rewrite_sorts(self, sorts):
+        return [self.rewrite_sort(node) for node in sorts]
+
+    def template_request(self, body):
+        """Returns a TemplateRequest for a body whose shape was registered, otherwise None."""
+        skeleton, params = parameterize(body)
+        template_id = self.templates.get(_digest(template_source(skeleton)))
+        if template_id is None:
+            return None
+        summary = {key: value for key, value in body.items() if key not in ("query", "aggs")}
+        if body.get("aggs"):
+            summary["aggs"] = True
+        if mentions(body.get("query"), "inner_hits"):
+            summary["inner_hits"] = True
+        return TemplateRequest(template_id, params, summary, body.get("query"))
+
+    def upload(self, transformer, request_models):
+        """
+        Startup hook: stores the script sorts of each request model, then its query shape as a template
+        that references those stored scripts.
+
+        :param transformer: Transformer whose registry is this one.
+        :param request_models: The hot request models (e.g. registered dashboard panels).
+        :return: The template ids, one per request model.
+        """
+        template_ids = []
+        for data in request_models:
+            for sort_data in data.get("sorts", []):
+                if sort_data.get("script"):
+                    self.register_script(sort_data["script"], sort_data.get("lang") or "painless")
+            template_ids.append(self.register_template(transformer.transform(data)))
+        return template_ids
@@ -1,80 +1,77 @@
-from transformer import filter
-from transformer import sort
 from transformer import aggregation
+from transformer import dates
+from transformer import ir
+from transformer import patterns
+from transformer import writer
 
 class Transformer:
-    
-    def __init__(self, index):
+
+    def __init__(self, index, mappings=None, leading_wildcard="reject", registry=None, date_rounding=None,
+                 fuse_metrics=False):
+        """
+        :param index: The index the generated queries target.
+        :param mappings: (Optional) FieldMappings used to pick per-field-type defaults.
+        :param leading_wildcard: Policy for leading-wildcard patterns that cannot be routed to a `wildcard`
+                                 field (`reject` or `allow`); see PatternRewriter.
+        :param registry: (Optional) StoredScriptRegistry whose stored scripts and search templates are
+                         referenced instead of inline scripts and bodies.
+        :param date_rounding: (Optional) DateRounder, or a rounding unit such as `m`, applied to date ranges
+                              so repeated requests are served from the shard request cache.
+        :param fuse_metrics: Fuse sibling metric aggregations over one field into a single stats or percentiles
+                             aggregation. Their results then come back under fused names, so enable it only
+                             when every response goes through `CompiledRequest.reshape_response`.
+        """
         self.index = index
-    
+        self.mappings = mappings
+        self.rewriter = patterns.PatternRewriter(mappings, leading_wildcard=leading_wildcard)
+        self.registry = registry
+        if isinstance(date_rounding, str):
+            date_rounding = dates.DateRounder(date_rounding, mappings=mappings)
+        self.rounder = date_rounding
+        self.fuse_metrics = fuse_metrics
+
+    def compile(self, data):
+        """Compiles the request model into an immutable CompiledRequest."""
+        return ir.compile_request(data, self.mappings, self.rewriter, self.registry, self.rounder, self.fuse_metrics)
+
+    def transform_stored(self, data):
+        """
+        Transforms the data (a request model or a CompiledRequest) into a TemplateRequest (stored template
+        id + params) when the registry holds a template for its shape, otherwise into the plain body.
+        QueryExecutor runs either.
+        """
+        body = data.body() if isinstance(data, ir.CompiledRequest) else self.transform(data)
+        template = self.registry.template_request(body) if self.registry is not None else None
+        return template or body
+
     def transform(self, data):
         """Transforms the data based on the provided transformation steps."""
-        return self.process_data(data.get("filters", []), data.get("sorts", []), data.get("aggs", {}), data.get("size", 20))
-
-    def process_data(self, filters, sorts, aggs, size):
-        """Adds a filter to the transformation steps and ensures a valid query."""
-
-        filters_list = []
-
-        # ✅ Handle both dictionary (OR) and list (AND)
-        if isinstance(filters, dict):  # OR condition (should)
-            created_filter = filter.create_filter_object(filters)
-            if created_filter:
-                filters_list.append(created_filter)
-
-        elif isinstance(filters, list):  # AND condition (must)
-            for filter_data in filters:
-                created_filter = filter.create_filter_object(filter_data)
-                if created_filter:
-                    filters_list.append(created_filter)
-
-        sort_list = []
-        for sort_data in sorts:
-            sort_list.append(sort.create_sort_object(sort_data))
+        return self.compile(data).body()
+
+    def transform_to_bytes(self, data):
+        """
+        Transforms the data (a request model or a CompiledRequest) straight to a JSON-encoded body that
+        QueryExecutor sends as-is. This only pays off for a CompiledRequest sent many times, whose nodes
+        already cache their bytes; a request sent once is cheaper as the `transform` dict.
+        """
+        request = data if isinstance(data, ir.CompiledRequest) else self.compile(data)
+        return writer.JsonBytesWriter().emit(request)
+
+    def apply_response_options(self, query_body, data):
+        """Restricts what each hit returns and how totals are tracked, based on the request model."""
+        query_body.update(ir.compile_response_options(data))
+        return query_body
 
-        return self.build_elasticsearch_query(filters_list, sort_list, aggs, size)
-    
     def process_data(self, filters, sorts, aggs, size):
         """Processes filters, sorts, and aggregations into a valid Elasticsearch query."""
-        
-        filters_list = []
-
-        # ✅ Handle both dictionary (OR) and list (AND)
-        if isinstance(filters, dict):  # OR condition (should)
-            created_filter = filter.create_filter_object(filters)
-            if created_filter:
-                filters_list.append(created_filter)
-
-        elif isinstance(filters, list):  # AND condition (must)
-            for filter_data in filters:
-                created_filter = filter.create_filter_object(filter_data)
-                if created_filter:
-                    filters_list.append(created_filter)
-        sort_list = [sort.create_sort_object(s) for s in sorts] if sorts else []
-        
-        aggs_query = aggregation.build_aggregation_query_class(aggs) if aggs else {}
-
-        query = self.build_elasticsearch_query(filters_list, sort_list, aggs_query, size)
-        return query
-
+        return self.transform({"filters": filters, "sorts": sorts or [], "aggs": aggs, "size": size})
 
     def build_elasticsearch_query(self, filters_list, sort_list, aggs, size):
-        query_body = {}
-
-        # ✅ Apply filters if they exist
-        if filters_list:
-            query_body["query"] = filter.BoolFilter(must=filters_list).to_elasticsearch()
-        elif aggs:  
-            query_body["size"] = 0  # ✅ Force size=0 if only aggregations exist
-        else:
-            query_body["query"] = {"match_all": {}}  # ✅ Ensure valid query
-
-        # ✅ Apply sorting if present
-        if sort_list:
-            query_body["sort"] = [sort_obj.to_elasticsearch() for sort_obj in sort_list]
-
-        # ✅ Apply aggregations if present
-        if aggs:
-            query_body["aggs"] = aggregation.build_aggregation_query_class(aggs)
-
-        return query_body
+        """Builds the query body from already-created filter and sort objects and an aggregation model."""
+        request = ir.CompiledRequest(
+            filters=filters_list,
+            sorts=sort_list,
+            aggs=aggregation.plan_aggregations(aggregation.create_aggregation_tree(aggs, self.mappings), self.fuse_metrics),
+            size=size
+        )
+        return request.body()
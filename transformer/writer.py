@@ -0,0 +1,62 @@
+import json
+
+from transformer.ir import ElasticsearchEmitter
+from transformer.nodes import FrozenNode, encode_json
+
+
+class EncodedBody(bytes):
+    """
+    A request body already encoded as JSON bytes. The Elasticsearch client forwards bytes bodies
+    untouched, so nothing is re-serialized.
+
+    `summary` holds the top-level settings that were written (`size`, `track_total_hits`, `_source`, ...),
+    the sort and the query, plus whether aggregations and inner hits are present, so callers can inspect
+    the body without decoding it. Its query is shared with the compiled nodes and must not be modified.
+    """
+
+    def __new__(cls, data, summary):
+        body = super().__new__(cls, data)
+        body.summary = summary
+        return body
+
+
+class JsonBytesWriter(ElasticsearchEmitter):
+    """Writes a CompiledRequest straight to JSON bytes, reusing each node's cached encoded fragment."""
+
+    def visit_filter(self, node):
+        return node  # ✅ Kept as a node, so `assemble` can put both its bytes and its query in the summary
+
+    def visit_sort(self, node):
+        return node.to_json_bytes()
+
+    def visit_aggregation(self, name, node):
+        return node.to_json_bytes()[1:-1]  # ✅ `"name":{...}` member, spliced into the `aggs` object
+
+    def assemble(self, sections):
+        buffer = bytearray(b"{")
+        summary = {}
+        for i, (key, value) in enumerate(sections):
+            if i:
+                buffer += b","
+            buffer += encode_json(key) + b":"
+            if key == "query":
+                if isinstance(value, FrozenNode):
+                    summary["query"] = value._es_value()
+                    value = value.to_json_bytes()
+                else:
+                    summary["query"] = value
+                    value = encode_json(value)
+                buffer += value
+                if b'"inner_hits"' in value:
+                    summary["inner_hits"] = True
+            elif key == "sort":
+                buffer += b"[" + b",".join(value) + b"]"
+                summary["sort"] = [json.loads(clause) for clause in value]  # ✅ A few small clauses
+            elif key == "aggs":
+                buffer += b"{" + b",".join(value) + b"}"
+                summary["aggs"] = True
+            else:
+                buffer += encode_json(value)
+                summary[key] = value
+        buffer += b"}"
+        return EncodedBody(bytes(buffer), summary)
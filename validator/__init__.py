@@ -1 +1,4 @@
 # This file makes 'validator' a package.
+from validator.validate import RequestValidationError, RequestValidator, ValidationError
+
+__all__ = ["RequestValidator", "RequestValidationError", "ValidationError"]
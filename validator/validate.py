@@ -1,3 +1,380 @@
+import numbers
 
-def validator_function():
-    return "Hello from validator module!"
\ No newline at end of file
+from transformer.aggregation import (METRIC_SHORTHANDS, SAMPLER_CLASSES, TERMS_MODEL_OPTIONS, VALID_COLLECT_MODES,
+                                     BaseAggregation)
+from transformer.filter import VALID_OPERATORS, collapse_ip_values
+from transformer.ir import RESPONSE_FETCH_MODES, RESPONSE_MODES
+
+MAX_RESULT_WINDOW = 10000  # ✅ ES `index.max_result_window` default; deeper pages are rejected with a 400
+
+FIELD_CATEGORIES = {
+    "long": "numeric", "integer": "numeric", "short": "numeric", "byte": "numeric", "double": "numeric",
+    "float": "numeric", "half_float": "numeric", "scaled_float": "numeric", "unsigned_long": "numeric",
+    "date": "date", "date_nanos": "date",
+    "keyword": "keyword", "constant_keyword": "keyword", "wildcard": "keyword",
+    "text": "text", "match_only_text": "text",
+    "ip": "ip",
+    "boolean": "boolean",
+    "object": "object", "nested": "object", "flattened": "object",
+}
+
+RANGE_OPERATORS = {"gt", "lt", "gte", "lte"}
+FILTER_OPTIONS = {"ip", "wildcard", "case_insensitive", "boost"}
+SORT_KEYS = {"field", "order", "mode", "format", "numeric_type", "nested_path", "nested_filter", "missing",
+             "unmapped_type", "script", "lang", "params", "type", "stored_script"}
+SORT_ORDERS = {"asc", "desc"}
+SORT_MODES = {"min", "max", "sum", "avg", "median"}
+TERMS_MODEL_KEYS = {"terms", "size", "order", "aggs", "sampler", *TERMS_MODEL_OPTIONS}
+TERMS_KEYS = {"field", "size", "order", *TERMS_MODEL_OPTIONS}
+EXECUTION_HINTS = {"map", "global_ordinals"}
+METRIC_OPTIONS = {"percentiles": {"percents", "compression", "hdr_significant_digits"}, "extended_stats": {"sigma"}}
+WILDCARD_CATEGORIES = {"keyword", "text", "ip", None}  # ✅ ip only for octet prefixes, which become CIDR blocks
+METRIC_CATEGORIES = {"numeric", "date", "boolean", None}
+BOOLEAN_STRINGS = {"true", "false"}
+
+
+class ValidationError:
+    """One problem found in a request model, located by a dotted path such as `filters[0].amount`."""
+
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+
+    def __eq__(self, other):
+        return isinstance(other, ValidationError) and (self.path, self.message) == (other.path, other.message)
+
+    def __repr__(self):
+        return f"ValidationError({self.path!r}, {self.message!r})"
+
+    def __str__(self):
+        return f"{self.path}: {self.message}"
+
+    def to_json(self):
+        return {"path": self.path, "message": self.message}
+
+
+class RequestValidationError(ValueError):
+    """Raised by `RequestValidator.check` with every error found in the request model."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(str(error) for error in errors))
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+class RequestValidator:
+    def __init__(self, mappings=None):
+        """
+        Validates request models before they are compiled, reporting every error at once.
+
+        Field types are resolved into categories once, here, so validating a request is a handful of dict
+        lookups per field.
+
+        :param mappings: (Optional) FieldMappings used to check that fields exist and suit how they are used.
+                         Without mappings only the structure of the model is checked.
+        """
+        self.mappings = mappings
+        self._categories = {}
+        if mappings is not None:
+            self._categories = {field: FIELD_CATEGORIES.get(field_type, "other")
+                                for field, field_type in mappings.field_types.items()}
+        self._sections = {
+            "filters": self._validate_filters,
+            "sorts": self._validate_sorts,
+            "aggs": self._validate_aggs,
+            "size": self._validate_window,
+            "from": self._validate_window,
+            "fields": self._validate_field_list,
+            "exclude_fields": self._validate_field_list,
+            "fetch": self._validate_fetch,
+            "track_total_hits": self._validate_track_total_hits,
+            "inner_hits": self._validate_inner_hits,
+            "response_mode": self._validate_response_mode,
+        }
+
+    def validate(self, data):
+        """Returns the list of ValidationErrors in a request model (empty when it is valid)."""
+        errors = []
+        if not isinstance(data, dict):
+            errors.append(ValidationError("", "Request model must be a dictionary"))
+            return errors
+        for key, value in data.items():
+            section = self._sections.get(key)
+            if section is None:
+                errors.append(ValidationError(key, f"Unknown request key. Allowed: {sorted(self._sections)}"))
+            else:
+                section(value, key, errors, data)
+        return errors
+
+    def check(self, data):
+        """Returns the request model unchanged, or raises RequestValidationError listing every error."""
+        errors = self.validate(data)
+        if errors:
+            raise RequestValidationError(errors)
+        return data
+
+    def _field(self, field, path, errors):
+        """Checks that a field can match documents and returns its category (None when unknown)."""
+        if not isinstance(field, str) or not field:
+            errors.append(ValidationError(path, "Field name must be a non-empty string"))
+            return None
+        category = self._categories.get(field)
+        if category is None and self.mappings is not None and not self.mappings.accepts_unmapped(field):
+            errors.append(ValidationError(path, f"Field '{field}' is not mapped and its mapping is not dynamic, so it matches nothing"))
+        return category
+
+    # Filters
+
+    def _validate_filters(self, filters, path, errors, data=None):
+        if isinstance(filters, dict):
+            self._validate_filter(filters, path, errors)
+        elif isinstance(filters, list):
+            for i, filter_data in enumerate(filters):
+                self._validate_filter(filter_data, f"{path}[{i}]", errors)
+        else:
+            errors.append(ValidationError(path, "Filters must be a list (AND) or a dictionary"))
+
+    def _validate_filter(self, filter_data, path, errors):
+        if isinstance(filter_data, list):
+            self._validate_filters(filter_data, path, errors)
+            return
+        if not isinstance(filter_data, dict) or not filter_data:
+            errors.append(ValidationError(path, "Filter must be a non-empty dictionary or a list"))
+            return
+        if len(filter_data) > 1:
+            # ✅ Only the first field of a filter dict is compiled; the rest would be silently dropped
+            errors.append(ValidationError(path, f"Filter must hold exactly one field, got {sorted(filter_data)}"))
+            return
+
+        field, value = next(iter(filter_data.items()))
+        path = f"{path}.{field}"
+        if field == "ids":
+            values = value if isinstance(value, list) else [value]
+            if not values or not all(isinstance(v, (str, int)) and not isinstance(v, bool) for v in values):
+                errors.append(ValidationError(path, "ids must be a non-empty list of strings or integers"))
+            return
+
+        category = self._field(field, path, errors)
+        if category == "object":
+            errors.append(ValidationError(path, f"Field '{field}' is an object; filter on one of its sub-fields"))
+        elif isinstance(value, list):
+            self._validate_list_filter(value, category, path, errors)
+        elif isinstance(value, dict):
+            self._validate_operator_filter(field, value, category, path, errors)
+        else:
+            self._validate_term_value(value, category, path, errors)
+
+    def _validate_term_value(self, value, category, path, errors):
+        if not isinstance(value, (str, numbers.Number)):
+            errors.append(ValidationError(path, f"Unsupported filter value {value!r}"))
+        elif category == "numeric" and not _is_number(value):
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                errors.append(ValidationError(path, f"Numeric field cannot match {value!r}"))
+        elif category == "boolean" and not (isinstance(value, bool) or value in BOOLEAN_STRINGS):
+            errors.append(ValidationError(path, f"Boolean field cannot match {value!r}"))
+        elif category == "ip":
+            self._validate_ip_values([value], path, errors)
+
+    def _validate_list_filter(self, values, category, path, errors):
+        if not values:
+            errors.append(ValidationError(path, "Value list is empty, so the filter matches nothing"))
+        elif all(isinstance(v, dict) and "match" in v for v in values):
+            return
+        elif all(isinstance(v, (str, int, float)) for v in values):
+            if category == "ip":
+                self._validate_ip_values(values, path, errors)
+            elif category in ("numeric", "boolean"):
+                for i, v in enumerate(values):
+                    self._validate_term_value(v, category, f"{path}[{i}]", errors)
+        else:
+            errors.append(ValidationError(path, "List values must all be strings/numbers or all be {\"match\": ...} objects"))
+
+    def _validate_operator_filter(self, field, value, category, path, errors):
+        unknown = [k for k in value if k not in VALID_OPERATORS and k not in FILTER_OPTIONS]
+        if unknown:
+            errors.append(ValidationError(path, f"Unknown operators {unknown}. Allowed: {sorted(VALID_OPERATORS | FILTER_OPTIONS)}"))
+            return
+
+        if "match" in value:
+            if not isinstance(value["match"], (str, numbers.Number)):
+                errors.append(ValidationError(path, "match value must be a string or number"))
+        elif RANGE_OPERATORS.intersection(value):
+            for operator in RANGE_OPERATORS.intersection(value):
+                bound = value[operator]
+                if category == "ip":
+                    self._validate_ip_values([bound], f"{path}.{operator}", errors)
+                elif category in ("numeric", "date") and not isinstance(bound, (str, numbers.Number)):
+                    errors.append(ValidationError(f"{path}.{operator}", f"Invalid range bound {bound!r}"))
+                elif category == "numeric" and not _is_number(bound):
+                    self._validate_term_value(bound, category, f"{path}.{operator}", errors)
+        elif "ip" in value:
+            if category not in ("ip", None):
+                errors.append(ValidationError(path, f"ip filters need an ip field; '{field}' is {self.mappings.field_type(field)}"))
+            self._validate_ip_values(value["ip"] if isinstance(value["ip"], list) else [value["ip"]], f"{path}.ip", errors)
+        elif "wildcard" in value:
+            if not isinstance(value["wildcard"], str):
+                errors.append(ValidationError(f"{path}.wildcard", "wildcard pattern must be a string"))
+            elif category not in WILDCARD_CATEGORIES:
+                errors.append(ValidationError(path, f"wildcard filters need a keyword, text or wildcard field; '{field}' is {self.mappings.field_type(field)}"))
+        else:
+            errors.append(ValidationError(path, f"Unsupported filter operators {sorted(value)}"))
+
+    def _validate_ip_values(self, values, path, errors):
+        try:
+            collapse_ip_values(values)
+        except ValueError as e:
+            errors.append(ValidationError(path, f"Invalid IP value: {e}"))
+
+    # Sorts
+
+    def _validate_sorts(self, sorts, path, errors, data=None):
+        if not isinstance(sorts, list):
+            errors.append(ValidationError(path, "Sorts must be a list"))
+            return
+        for i, sort_data in enumerate(sorts):
+            sort_path = f"{path}[{i}]"
+            if not isinstance(sort_data, dict):
+                errors.append(ValidationError(sort_path, "Sort must be a dictionary"))
+                continue
+            unknown = [k for k in sort_data if k not in SORT_KEYS]
+            if unknown:
+                errors.append(ValidationError(sort_path, f"Unknown sort keys {unknown}. Allowed: {sorted(SORT_KEYS)}"))
+            if sort_data.get("order", "asc") not in SORT_ORDERS:
+                errors.append(ValidationError(f"{sort_path}.order", f"Sort order must be one of {sorted(SORT_ORDERS)}"))
+            if sort_data.get("mode") is not None and sort_data["mode"] not in SORT_MODES:
+                errors.append(ValidationError(f"{sort_path}.mode", f"Sort mode must be one of {sorted(SORT_MODES)}"))
+            if sort_data.get("script") or sort_data.get("stored_script"):
+                continue
+            if "field" not in sort_data:
+                errors.append(ValidationError(sort_path, "Sort needs a field or a script"))
+                continue
+            category = self._field(sort_data["field"], f"{sort_path}.field", errors)
+            if category in ("text", "object"):
+                errors.append(ValidationError(f"{sort_path}.field", f"Cannot sort on {category} field '{sort_data['field']}'"))
+
+    # Aggregations
+
+    def _validate_aggs(self, aggs, path, errors, data=None):
+        if not isinstance(aggs, dict):
+            errors.append(ValidationError(path, "Aggregations must be a dictionary"))
+            return
+        for name, agg_def in aggs.items():
+            agg_path = f"{path}.{name}"
+            if isinstance(agg_def, BaseAggregation):
+                continue
+            if isinstance(agg_def, list):
+                self._validate_agg_shorthand(name, agg_def, agg_path, errors)
+            elif isinstance(agg_def, dict):
+                self._validate_terms_model(name, agg_def, agg_path, errors)
+            else:
+                errors.append(ValidationError(agg_path, "Aggregation must be a list shorthand or a dictionary"))
+
+    def _validate_bucket_field(self, field, path, errors):
+        category = self._field(field, path, errors)
+        if category in ("text", "object"):
+            errors.append(ValidationError(path, f"Cannot aggregate on {category} field '{field}'"))
+
+    def _validate_agg_shorthand(self, name, agg_def, path, errors):
+        agg_type = agg_def[0] if agg_def else None
+        if agg_type == "terms":
+            if len(agg_def) != 2 or not _is_int(agg_def[1]) or agg_def[1] < 1:
+                errors.append(ValidationError(path, "Terms shorthand is [\"terms\", size] with a positive integer size"))
+            self._validate_bucket_field(name, path, errors)
+        elif agg_type in METRIC_SHORTHANDS:
+            if len(agg_def) not in (2, 3):
+                errors.append(ValidationError(path, f"Metric shorthand is [\"{agg_type}\", field] or [\"{agg_type}\", field, {{options}}]"))
+                return
+            category = self._field(agg_def[1], f"{path}[1]", errors)
+            if category not in METRIC_CATEGORIES:
+                errors.append(ValidationError(f"{path}[1]", f"{agg_type} needs a numeric or date field; '{agg_def[1]}' is {self.mappings.field_type(agg_def[1])}"))
+            options = agg_def[2] if len(agg_def) == 3 else {}
+            if not isinstance(options, dict):
+                errors.append(ValidationError(f"{path}[2]", "Metric options must be a dictionary"))
+                return
+            allowed = METRIC_OPTIONS.get(agg_type, set())
+            unknown = [k for k in options if k not in allowed]
+            if unknown:
+                errors.append(ValidationError(f"{path}[2]", f"Unknown {agg_type} options {unknown}. Allowed: {sorted(allowed)}"))
+            if "compression" in options and "hdr_significant_digits" in options:
+                errors.append(ValidationError(f"{path}[2]", "Use either compression or hdr_significant_digits, not both"))
+            percents = options.get("percents", [])
+            if not isinstance(percents, list) or not all(_is_number(p) and 0 <= p <= 100 for p in percents):
+                errors.append(ValidationError(f"{path}[2].percents", "percents must be a list of numbers between 0 and 100"))
+        else:
+            errors.append(ValidationError(path, f"Unknown aggregation shorthand {agg_type!r}. Allowed: {sorted(METRIC_SHORTHANDS | {'terms'})}"))
+
+    def _validate_terms_options(self, options, path, errors):
+        if "size" in options and not (_is_int(options["size"]) and options["size"] > 0):
+            errors.append(ValidationError(f"{path}.size", "size must be a positive integer"))
+        if "order" in options and not isinstance(options["order"], dict):
+            errors.append(ValidationError(f"{path}.order", "order must be a dictionary such as {\"_count\": \"desc\"}"))
+        if "collect_mode" in options and options["collect_mode"] not in VALID_COLLECT_MODES:
+            errors.append(ValidationError(f"{path}.collect_mode", f"collect_mode must be one of {sorted(VALID_COLLECT_MODES)}"))
+        if "execution_hint" in options and options["execution_hint"] not in EXECUTION_HINTS:
+            errors.append(ValidationError(f"{path}.execution_hint", f"execution_hint must be one of {sorted(EXECUTION_HINTS)}"))
+
+    def _validate_terms_model(self, name, agg_def, path, errors):
+        unknown = [k for k in agg_def if k not in TERMS_MODEL_KEYS]
+        if unknown:
+            errors.append(ValidationError(path, f"Unknown aggregation keys {unknown}. Allowed: {sorted(TERMS_MODEL_KEYS)}"))
+        self._validate_bucket_field(name, path, errors)
+        self._validate_terms_options(agg_def, path, errors)
+        terms_def = agg_def.get("terms")
+        if isinstance(terms_def, dict):
+            unknown = [k for k in terms_def if k not in TERMS_KEYS]
+            if unknown:
+                errors.append(ValidationError(f"{path}.terms", f"Unknown terms keys {unknown}. Allowed: {sorted(TERMS_KEYS)}"))
+            if terms_def.get("field", name) != name:
+                # ✅ The aggregation name is the field; a different `terms.field` would be ignored
+                errors.append(ValidationError(f"{path}.terms.field", f"terms.field must match the aggregation name '{name}'"))
+            self._validate_terms_options(terms_def, f"{path}.terms", errors)
+        elif terms_def is not None and not (_is_int(terms_def) and terms_def > 0):
+            errors.append(ValidationError(f"{path}.terms", "terms must be an options dictionary or a positive size"))
+        sampler = agg_def.get("sampler")
+        if sampler is not None and not (isinstance(sampler, dict) and sampler.get("type", "sampler") in SAMPLER_CLASSES):
+            errors.append(ValidationError(f"{path}.sampler", f"sampler must be a dictionary with a type in {sorted(SAMPLER_CLASSES)}"))
+        if "aggs" in agg_def:
+            self._validate_aggs(agg_def["aggs"], f"{path}.aggs", errors)
+
+    # Response options
+
+    def _validate_window(self, value, path, errors, data):
+        if not _is_int(value) or value < 0:
+            errors.append(ValidationError(path, f"{path} must be a non-negative integer"))
+            return
+        # ✅ Reported once, on `size`, when both are given
+        if path == "size" or "size" not in data:
+            from_, size = data.get("from") or 0, data.get("size", 20)
+            if _is_int(from_) and _is_int(size) and from_ + size > MAX_RESULT_WINDOW:
+                errors.append(ValidationError(path, f"from + size must not exceed {MAX_RESULT_WINDOW} (index.max_result_window)"))
+
+    def _validate_field_list(self, fields, path, errors, data=None):
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            errors.append(ValidationError(path, f"{path} must be a list of field names"))
+
+    def _validate_fetch(self, fetch, path, errors, data=None):
+        if fetch not in RESPONSE_FETCH_MODES:
+            errors.append(ValidationError(path, f"fetch must be one of {sorted(RESPONSE_FETCH_MODES)}"))
+
+    def _validate_track_total_hits(self, value, path, errors, data=None):
+        if not isinstance(value, bool) and not (_is_int(value) and value >= 0):
+            errors.append(ValidationError(path, "track_total_hits must be a boolean or a non-negative integer"))
+
+    def _validate_response_mode(self, mode, path, errors, data):
+        if mode not in RESPONSE_MODES:
+            errors.append(ValidationError(path, f"response_mode must be one of {sorted(RESPONSE_MODES)}"))
+        elif mode in ("count", "exists") and data.get("aggs"):
+            errors.append(ValidationError(path, f"response_mode '{mode}' does not return aggregations"))
+
+    def _validate_inner_hits(self, value, path, errors, data=None):
+        if not isinstance(value, (bool, dict)):
+            errors.append(ValidationError(path, "inner_hits must be a boolean or an inner_hits options dictionary"))